@@ -50,6 +50,14 @@ def cache_diagnostics(request):
     # 4. Check for delete_pattern support (standard in django-redis)
     has_delete_pattern = hasattr(cache, 'delete_pattern') or 'RedisCache' in str(type(cache)) or 'ConnectionProxy' in backend_class
 
+    # 5. Distinct URLs vs cache keys per query-keyed endpoint today (Redis HyperLogLogs)
+    from core.cache_keys import key_cardinality
+    try:
+        cardinality = key_cardinality(tenant.id)
+    except Exception as e:
+        cardinality = {}
+        details = details or str(e)
+
     return Response({
         'backend': backend_class,
         'has_redis_config': has_redis_config,
@@ -57,6 +65,7 @@ def cache_diagnostics(request):
         'latency_ms': round(latency, 2) if latency > 0 else -1,
         'has_delete_pattern': has_delete_pattern,
         'error_details': details,
+        'key_cardinality': cardinality,
         'cache_prefix': getattr(settings, 'CACHES', {}).get('default', {}).get('KEY_PREFIX', ''),
         'is_redis': 'redis' in backend_class.lower() or 'ConnectionProxy' in backend_class
     })
@@ -68,12 +77,10 @@ def clear_tenant_cache(request):
     Manually clear all cache for the current tenant.
     """
     tenant = request.tenant
-    from core.cache_utils import invalidate_product_cache, invalidate_category_cache, invalidate_tenant_cache
+    from core.cache_registry import invalidate_all
     
     try:
-        invalidate_product_cache(tenant.id)
-        invalidate_category_cache(tenant.id)
-        invalidate_tenant_cache(tenant.id)
+        invalidate_all(tenant.id)
         return Response({'message': 'Cache cleared successfully for your tenant'})
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -106,3 +106,8 @@ class AdminOrderStatusUpdateSerializer(serializers.Serializer):
         ('Refunded', 'Refunded'),
     ])
     notes = serializers.CharField(required=False, allow_blank=True)
+
+
+class AdminOrderBulkStatusSerializer(AdminOrderStatusUpdateSerializer):
+    """Serializer for changing the status of many orders at once"""
+    order_ids = serializers.ListField(child=serializers.UUIDField(), min_length=1, max_length=1000)
@@ -3,13 +3,18 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from .admin_user_views import IsTenantAdmin
 from rest_framework.response import Response
-from django.utils import timezone
-from django.db.models import Q, Count
+from django.db import transaction
+from django.db.models import Q, Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from orders.models import Order, OrderItem
+from orders.state_machine import InvalidTransition, bulk_transition, transition
+from orders.stats import get_order_stats
+from core.pagination import KeysetPagination
 from .admin_order_serializers import (
     AdminOrderListSerializer,
     AdminOrderDetailSerializer,
-    AdminOrderStatusUpdateSerializer
+    AdminOrderStatusUpdateSerializer,
+    AdminOrderBulkStatusSerializer
 )
 
 
@@ -26,7 +31,10 @@ def order_list(request):
         tenant=tenant,
         deleted_at__isnull=True
     ).select_related('customer').annotate(
-        annotated_items_count=Count('items')
+        # Correlated count: evaluated only for the rows of the current page (no GROUP BY)
+        annotated_items_count=Coalesce(Subquery(
+            OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order').annotate(c=Count('id')).values('c')[:1]
+        ), 0)
     )
     
     # Apply filters
@@ -58,10 +66,8 @@ def order_list(request):
     # Order by created_at desc
     orders = orders.order_by('-created_at')
     
-    # Manual Pagination
-    from rest_framework.pagination import PageNumberPagination
-    paginator = PageNumberPagination()
-    paginator.page_size = 50
+    # Keyset pagination on (created_at, id); ?page= keeps page-number mode
+    paginator = KeysetPagination(page_size=50)
     result_page = paginator.paginate_queryset(orders, request)
     
     serializer = AdminOrderListSerializer(result_page, many=True)
@@ -110,6 +116,7 @@ def order_detail(request, pk):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsTenantAdmin])
+@transaction.atomic
 def order_update_status(request, pk):
     """
     POST: Update order status
@@ -135,28 +142,12 @@ def order_update_status(request, pk):
     new_status = serializer.validated_data['status']
     notes = serializer.validated_data.get('notes', '')
     
-    # Update status
-    order.status = new_status
-    
-    # Update timestamps based on status
-    now = timezone.now()
-    if new_status == 'Paid' and not order.paid_at:
-        order.paid_at = now
-    elif new_status == 'Shipped' and not order.shipped_at:
-        order.shipped_at = now
-    elif new_status == 'Delivered' and not order.delivered_at:
-        order.delivered_at = now
-    elif new_status == 'Cancelled' and not order.cancelled_at:
-        order.cancelled_at = now
-    
-    # Add notes to internal notes
-    if notes:
-        if order.internal_notes:
-            order.internal_notes += f"\n\n[{now.strftime('%Y-%m-%d %H:%M')}] Status changed to {new_status}: {notes}"
-        else:
-            order.internal_notes = f"[{now.strftime('%Y-%m-%d %H:%M')}] Status changed to {new_status}: {notes}"
-    
-    order.save()
+    # Validates the transition, stamps paid_at/shipped_at/... and keeps
+    # inventory in step with the new status
+    try:
+        transition(order, new_status, note=f"Status changed to {new_status}: {notes}" if notes else None)
+    except InvalidTransition as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
     detail_serializer = AdminOrderDetailSerializer(order)
     return Response(detail_serializer.data)
@@ -164,6 +155,31 @@ def order_update_status(request, pk):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsTenantAdmin])
+@transaction.atomic
+def order_bulk_status(request):
+    """
+    POST: Change the status of many orders at once
+    Body: {"order_ids": [...], "status": "Shipped", "notes": "..."}
+    Orders that cannot move to the status are skipped and reported.
+    """
+    serializer = AdminOrderBulkStatusSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    new_status = serializer.validated_data['status']
+    notes = serializer.validated_data.get('notes', '')
+    result = bulk_transition(
+        request.tenant,
+        serializer.validated_data['order_ids'],
+        new_status,
+        note=f"Status changed to {new_status}: {notes}" if notes else None,
+    )
+    return Response(result)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsTenantAdmin])
+@transaction.atomic
 def order_cancel(request, pk):
     """
     POST: Cancel an order
@@ -189,18 +205,9 @@ def order_cancel(request, pk):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Cancel the order
-    order.status = 'Cancelled'
-    order.cancelled_at = timezone.now()
-    
-    # Add cancellation note
+    # Cancel the order and give its reserved stock back
     reason = request.data.get('reason', 'No reason provided')
-    if order.internal_notes:
-        order.internal_notes += f"\n\n[{timezone.now().strftime('%Y-%m-%d %H:%M')}] Order cancelled: {reason}"
-    else:
-        order.internal_notes = f"[{timezone.now().strftime('%Y-%m-%d %H:%M')}] Order cancelled: {reason}"
-    
-    order.save()
+    transition(order, 'Cancelled', note=f"Order cancelled: {reason}")
     
     detail_serializer = AdminOrderDetailSerializer(order)
     return Response(detail_serializer.data)
@@ -234,30 +241,8 @@ def order_stats(request):
                 }
             })
         
-        # Get counts by status
-        stats = {
-            'total': Order.objects.filter(tenant=tenant, deleted_at__isnull=True).count(),
-            'by_status': {},
-            'by_type': {}
-        }
-        
-        # Count by status - use exact values from PostgreSQL enum
-        for status_value in ['Draft', 'PendingPayment', 'Paid', 'QuoteRequested', 'QuoteSent', 'QuoteApproved', 'Processing', 'Shipped', 'Delivered', 'Cancelled', 'Refunded']:
-            count = Order.objects.filter(
-                tenant=tenant,
-                status=status_value,
-                deleted_at__isnull=True
-            ).count()
-            stats['by_status'][status_value] = count
-        
-        # Count by order type
-        for order_type in ['Sale', 'Quote']:
-            count = Order.objects.filter(
-                tenant=tenant,
-                order_type=order_type,
-                deleted_at__isnull=True
-            ).count()
-            stats['by_type'][order_type] = count
+        # One indexed read of the per-status counters, cached until an order changes
+        stats = get_order_stats(tenant.id)
         
         return Response(stats)
     
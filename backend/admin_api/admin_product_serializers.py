@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from products.models import Category, Product, ProductVariant, ProductImage, ProductFeature
+from products.listing import deferred_summary_refresh, sync_product_summaries
 
 
 class CategoryListSerializer(serializers.ModelSerializer):
@@ -263,41 +264,44 @@ class ProductDetailAdminSerializer(serializers.ModelSerializer):
         # Create product
         product = super().create(validated_data)
         
-        # Create images from Supabase URLs
-        for img_data in images_data:
-            ProductImage.objects.create(
-                product=product,
-                tenant_id=tenant.id,
-                url=img_data.get('url'),
-                alt_text=img_data.get('alt_text', ''),
-                sort_order=img_data.get('sort_order', 0),
-                is_primary=img_data.get('is_primary', False),
-                created_by=request.user.id
-            )
+        # One summary refresh for all images/variants created below
+        with deferred_summary_refresh():
+            # Create images from Supabase URLs
+            for img_data in images_data:
+                ProductImage.objects.create(
+                    product=product,
+                    tenant_id=tenant.id,
+                    url=img_data.get('url'),
+                    alt_text=img_data.get('alt_text', ''),
+                    sort_order=img_data.get('sort_order', 0),
+                    is_primary=img_data.get('is_primary', False),
+                    created_by=request.user.id
+                )
             
-        # Create variants
-        for v_data in variants_data:
-            # Skip empty SKUs
-            if not v_data.get('sku'):
-                continue
+            # Create variants
+            for v_data in variants_data:
+                # Skip empty SKUs
+                if not v_data.get('sku'):
+                    continue
                 
-            ProductVariant.objects.create(
-                product=product,
-                tenant_id=tenant.id,
-                sku=v_data.get('sku'),
-                name=v_data.get('name', ''),
-                price=v_data.get('price'),
-                stock_quantity=v_data.get('stock_quantity', 0),
-                is_active=v_data.get('is_active', True),
-                is_default=v_data.get('is_default', False),
-                attributes=v_data.get('attributes', {}),
-                created_by=request.user.id
-            )
+                ProductVariant.objects.create(
+                    product=product,
+                    tenant_id=tenant.id,
+                    sku=v_data.get('sku'),
+                    name=v_data.get('name', ''),
+                    price=v_data.get('price'),
+                    stock_quantity=v_data.get('stock_quantity', 0),
+                    is_active=v_data.get('is_active', True),
+                    is_default=v_data.get('is_default', False),
+                    attributes=v_data.get('attributes', {}),
+                    created_by=request.user.id
+                )
         
         return product
     
     def update(self, instance, validated_data):
         from django.db import transaction
+        from django.utils import timezone
         
         # Track who updated
         request = self.context.get('request')
@@ -383,7 +387,6 @@ class ProductDetailAdminSerializer(serializers.ModelSerializer):
                 ]
                 if ids_to_delete:
                     # Soft delete in bulk
-                    from django.utils import timezone
                     ProductImage.objects.filter(
                         id__in=ids_to_delete, 
                         product=product
@@ -477,5 +480,9 @@ class ProductDetailAdminSerializer(serializers.ModelSerializer):
                         id__in=v_ids_to_delete,
                         product=product
                     ).update(deleted_at=timezone.now())
+            
+            # Bulk operations above bypass model signals; refresh the listing summary explicitly
+            if images_data is not None or variants_data is not None:
+                sync_product_summaries({product.id: product.tenant_id})
         
         return product
@@ -9,10 +9,11 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from .admin_user_views import IsTenantAdmin
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
-from django.db.models import Q, Count, OuterRef, Subquery, Min, Max, Sum
+from django.db.models import Q, Count, F
 from django.conf import settings
 
 from products.models import Product, Category, ProductVariant, ProductImage
+from products.search import filter_by_search
 from .admin_product_serializers import (
     ProductListAdminSerializer,
     ProductDetailAdminSerializer,
@@ -22,6 +23,7 @@ from .admin_product_serializers import (
     ProductImageAdminSerializer
 )
 from core.profiling import profile_block
+from core.pagination import KeysetPagination
 
 
 # ============================================================================
@@ -43,90 +45,63 @@ def product_list_create(request):
         status_filter = request.GET.get('status', '')
         category_id = request.GET.get('category', '')
         is_featured = request.GET.get('is_featured', '')
-        page = request.GET.get('page', '1')
+        page = request.GET.get('page', '')
         
-        # Generate cache key based on filters and CURRENT VERSION
-        from django.core.cache import cache
+        # Cache key based on filters (versioned through core/cache_registry.py)
         from urllib.parse import urlencode
-        from core.cache_utils import get_versioned_cache_key
+        from core.cache_registry import ADMIN_PRODUCTS_LIST
         
         filter_params = {
             'search': search,
             'status': status_filter,
             'category': category_id,
             'is_featured': is_featured,
-            'page': page
+            'page': page,
+            'cursor': request.GET.get('cursor', ''),
+            'page_size': request.GET.get('page_size', ''),
+            'total': request.GET.get('total', ''),
         }
         
-        # Base key: products_list_{tenant_id}_{params}
-        base_key = f"products_list_{tenant.id}_{urlencode(filter_params)}"
-        # Versioned key: products_list_{tenant_id}_{params}:v{N}
-        cache_key = get_versioned_cache_key(base_key, 'products_list', tenant.id)
-        
-        # Try to get from cache (5 min TTL) - fail silently if cache unavailable
-        try:
-            cached_data = cache.get(cache_key)
-            if cached_data:
-                return Response(cached_data)
-        except Exception:
-            pass  # Cache not available, continue without it
-        
-        # Subquery for primary image
-        primary_image_subquery = ProductImage.objects.filter(
-            product=OuterRef('pk'),
-            deleted_at__isnull=True
-        ).order_by('-is_primary', 'sort_order')
-        
-        # Base queryset with annotations to avoid N+1 in serializer
-        products = Product.objects.filter(
-            tenant=tenant,
-            deleted_at__isnull=True
-        ).select_related('category').annotate(
-            annotated_primary_image=Subquery(primary_image_subquery.values('url')[:1]),
-            annotated_min_price=Min('variants__price', filter=Q(variants__is_active=True, variants__deleted_at__isnull=True)),
-            annotated_max_price=Max('variants__price', filter=Q(variants__is_active=True, variants__deleted_at__isnull=True)),
-            annotated_variants_count=Count('variants', filter=Q(variants__is_active=True, variants__deleted_at__isnull=True)),
-            annotated_total_stock=Sum('variants__stock_quantity', filter=Q(variants__is_active=True, variants__deleted_at__isnull=True)),
-            annotated_total_available=Sum('variants__stock_quantity', filter=Q(variants__is_active=True, variants__deleted_at__isnull=True)) - 
-                                      Sum('variants__reserved_quantity', filter=Q(variants__is_active=True, variants__deleted_at__isnull=True)),
-            annotated_total_reserved=Sum('variants__reserved_quantity', filter=Q(variants__is_active=True, variants__deleted_at__isnull=True)),
-        )
-        
-        # Apply filters
-        if search:
-            products = products.filter(
-                Q(name__icontains=search) |
-                Q(sku__icontains=search) |
-                Q(description__icontains=search)
+        def build_page():
+            # Base queryset; listing figures come from ProductSummary (see products/listing.py)
+            products = Product.objects.filter(
+                tenant=tenant,
+                deleted_at__isnull=True
+            ).select_related('category').annotate(
+                annotated_primary_image=F('summary__primary_image_url'),
+                annotated_min_price=F('summary__min_price'),
+                annotated_max_price=F('summary__max_price'),
+                annotated_variants_count=F('summary__variants_count'),
+                annotated_total_stock=F('summary__total_stock'),
+                annotated_total_available=F('summary__total_stock') - F('summary__total_reserved'),
+                annotated_total_reserved=F('summary__total_reserved'),
             )
         
-        if status_filter:
-            products = products.filter(status=status_filter)
+            # Apply filters
+            if search:
+                # Full-text search (GIN index) instead of ILIKE scans
+                products = filter_by_search(products, search)
         
-        if category_id:
-            products = products.filter(category_id=category_id)
+            if status_filter:
+                products = products.filter(status=status_filter)
         
-        if is_featured:
-            products = products.filter(is_featured=is_featured.lower() == 'true')
+            if category_id:
+                products = products.filter(category_id=category_id)
         
-        # Order by creation date (newest first)
-        products = products.order_by('-created_at')
+            if is_featured:
+                products = products.filter(is_featured=is_featured.lower() == 'true')
         
-        # Manual Pagination
-        from rest_framework.pagination import PageNumberPagination
-        paginator = PageNumberPagination()
-        paginator.page_size = 50 # Admin preference
-        result_page = paginator.paginate_queryset(products, request)
+            # Order by creation date (newest first)
+            products = products.order_by('-created_at')
         
-        serializer = ProductListAdminSerializer(result_page, many=True)
-        response_data = paginator.get_paginated_response(serializer.data).data
+            # Keyset pagination on (created_at, id); ?page= keeps page-number mode
+            paginator = KeysetPagination(page_size=50) # Admin preference
+            result_page = paginator.paginate_queryset(products, request)
         
-        # Cache the result for 5 minutes
-        try:
-            cache.set(cache_key, response_data, 300)
-        except Exception:
-            pass
+            serializer = ProductListAdminSerializer(result_page, many=True)
+            return paginator.get_paginated_data(serializer.data)
         
+        response_data = ADMIN_PRODUCTS_LIST.get_or_set(build_page, tenant.id, params=urlencode(filter_params))
         return Response(response_data)
     
     elif request.method == 'POST':
@@ -134,9 +109,7 @@ def product_list_create(request):
         if serializer.is_valid():
             serializer.save()
             
-            # Invalidate product list cache
-            from core.cache_utils import invalidate_product_cache
-            invalidate_product_cache(tenant.id)
+            # Cached listings are invalidated by the product signals (core/cache_registry.py)
             
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -190,10 +163,7 @@ def product_detail(request, product_id):
             with profile_block("Serializer Save (Transaction + Bulk Update)"):
                 serializer.save()
             
-            # Invalidate product list cache
-            with profile_block("Cache Invalidation"):
-                from core.cache_utils import invalidate_product_cache
-                invalidate_product_cache(tenant.id)
+            # Cached listings are invalidated by the product signals (core/cache_registry.py)
             
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -203,9 +173,7 @@ def product_detail(request, product_id):
         product.deleted_at = timezone.now()
         product.save()
         
-        # Invalidate product list cache
-        from core.cache_utils import invalidate_product_cache
-        invalidate_product_cache(tenant.id)
+        # Cached listings are invalidated by the product signals (core/cache_registry.py)
         
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -275,42 +243,26 @@ def category_list_create(request):
     tenant = request.tenant
     
     if request.method == 'GET':
-        # Try to get from cache
-        from django.core.cache import cache
-        cache_key = f"categories_{tenant.id}"
+        from core.cache_registry import ADMIN_CATEGORIES
         
-        try:
-            cached_data = cache.get(cache_key)
-            if cached_data:
-                return Response(cached_data)
-        except Exception:
-            pass
-        
-        categories = Category.objects.filter(
-            tenant=tenant,
-            deleted_at__isnull=True
-        ).annotate(
-            annotated_products_count=Count('products', filter=Q(products__deleted_at__isnull=True))
-        ).prefetch_related('children').order_by('sort_order', 'name')
-        
-        serializer = CategoryListSerializer(categories, many=True)
-        
-        # Cache for 10 minutes
-        try:
-            cache.set(cache_key, serializer.data, 600)
-        except Exception:
-            pass
+        def build_categories():
+            categories = Category.objects.filter(
+                tenant=tenant,
+                deleted_at__isnull=True
+            ).annotate(
+                annotated_products_count=Count('products', filter=Q(products__deleted_at__isnull=True))
+            ).prefetch_related('children').order_by('sort_order', 'name')
+            return CategoryListSerializer(categories, many=True).data
         
-        return Response(serializer.data)
+        data = ADMIN_CATEGORIES.get_or_set(build_categories, tenant.id)
+        return Response(data)
     
     elif request.method == 'POST':
         serializer = CategoryDetailSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             serializer.save()
             
-            # Invalidate category cache
-            from core.cache_utils import invalidate_category_cache
-            invalidate_category_cache(tenant.id)
+            # Cached categories are invalidated by the category signals (core/cache_registry.py)
             
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -352,9 +304,7 @@ def category_detail(request, category_id):
         if serializer.is_valid():
             serializer.save()
             
-            # Invalidate category cache
-            from core.cache_utils import invalidate_category_cache
-            invalidate_category_cache(tenant.id)
+            # Cached categories are invalidated by the category signals (core/cache_registry.py)
             
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -379,9 +329,7 @@ def category_detail(request, category_id):
         category.deleted_at = timezone.now()
         category.save()
         
-        # Invalidate category cache
-        from core.cache_utils import invalidate_category_cache
-        invalidate_category_cache(tenant.id)
+        # Cached categories are invalidated by the category signals (core/cache_registry.py)
         
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -4,7 +4,6 @@ from django.utils import timezone
 from tenants.models import Tenant
 from .admin_tenant_serializers import AdminTenantSerializer
 
-from django.core.cache import cache
 
 class IsSuperUser(permissions.BasePermission):
     """
@@ -26,18 +25,9 @@ class AdminTenantViewSet(viewsets.ModelViewSet):
     ordering = ['-created_at']
 
     def perform_update(self, serializer):
-        tenant = serializer.save()
-        # Invalidate storefront caches
-        cache_keys = [
-            f"storefront_common_data_{tenant.id}",
-            f"storefront_home_data_{tenant.id}",
-        ]
-        # Products and Category pages are also cached by tenant ID
-        # For simplicity, we can clear common ones or use a more holistic approach
-        # Category views use parameters in the key, so it's harder to list them all
-        # but common_data and home_data are the most critical for immediate branding visibility
-        cache.delete_many(cache_keys)
-        return tenant
+        # Storefront caches are invalidated by the Tenant post_save signal
+        # (invalidate_tenant_cache, computed from core/cache_registry.py)
+        return serializer.save()
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
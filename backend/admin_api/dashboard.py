@@ -0,0 +1,296 @@
+"""
+Admin dashboard statistics.
+
+Both dashboard endpoints (AdminDashboardViewSet.stats and the older
+views.dashboard_stats) are built from one bundle of metrics:
+
+    get_dashboard_metrics(tenant_id)      cached bundle (stale-while-revalidate)
+    compute_metrics(tenant_id, names)     fresh values for some or all metrics
+
+A metric is a function registered with @metric(name, *sources). It only
+shapes data; the reads are done by the sources it names, registered with
+@source(name). compute_metrics runs each source needed by the requested
+metrics exactly once, so the whole dashboard costs one query per source
+(six) however many metrics read from it. Sales figures come from the
+rollup tables (orders/rollups.py); a sale is an order of type Sale in
+orders.rollups.SALE_STATUSES for every metric.
+
+The bundle is cached per tenant as core.cache_registry.ADMIN_DASHBOARD:
+fresh for a minute, after that the stale bundle is still returned, for up
+to 15 minutes, while one background thread recomputes it.
+"""
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from core.cache_registry import ADMIN_DASHBOARD
+from orders.models import (
+    CustomerSalesRollup, Order, OrderStatus, ProductSalesDailyRollup, SalesDailyRollup, SalesHourlyRollup
+)
+
+CHART_DAYS = 30
+CHART_MONTHS = 6
+
+SOURCES = {}
+METRICS = {}
+
+
+def source(name):
+    """Register fn(ctx) as the data source ``name``."""
+    def register(fn):
+        SOURCES[name] = fn
+        return fn
+    return register
+
+
+def metric(name, *sources):
+    """Register fn(ctx, *source_results) as the metric ``name``."""
+    def register(fn):
+        METRICS[name] = (sources, fn)
+        return fn
+    return register
+
+
+class DashboardContext:
+    """Tenant and the local day boundaries shared by every source and metric."""
+
+    def __init__(self, tenant_id, now=None):
+        self.tenant_id = tenant_id
+        self.now = timezone.localtime(now)
+        self.today_start = self.now.replace(hour=0, minute=0, second=0, microsecond=0)
+        self.today = self.today_start.date()
+        self.chart_start = self.today - timedelta(days=CHART_DAYS)
+        self.months = _last_months(self.today, CHART_MONTHS)
+
+
+def _last_months(today, count):
+    """First day of each of the last ``count`` months, oldest first."""
+    months = [today.replace(day=1)]
+    for _ in range(count - 1):
+        months.append((months[-1] - timedelta(days=1)).replace(day=1))
+    return months[::-1]
+
+
+# Sources
+# -------
+
+SCALARS_SQL = """
+SELECT s.revenue, s.cost, s.orders, p.published, c.customers, o.orders
+FROM (
+    SELECT COALESCE(SUM(revenue), 0) AS revenue, COALESCE(SUM(cost), 0) AS cost,
+           COALESCE(SUM(orders_count), 0) AS orders
+    FROM sales_daily_rollups WHERE tenant_id = %(tenant_id)s
+) s
+CROSS JOIN (
+    SELECT COUNT(*) AS published FROM products WHERE tenant_id = %(tenant_id)s AND status = 'Published'
+) p
+CROSS JOIN (
+    SELECT COUNT(DISTINCT customer_email) AS customers FROM orders WHERE tenant_id = %(tenant_id)s
+) c
+CROSS JOIN (
+    SELECT COALESCE(SUM(count), 0) AS orders FROM order_status_counters
+    WHERE tenant_id = %(tenant_id)s AND status <> %(draft)s
+) o
+"""
+
+
+@source('scalars')
+def scalars_source(ctx):
+    """Every single-value KPI in one round-trip."""
+    with connection.cursor() as cursor:
+        cursor.execute(SCALARS_SQL, {'tenant_id': str(ctx.tenant_id), 'draft': OrderStatus.DRAFT})
+        revenue, cost, orders, products, customers, placed = cursor.fetchone()
+    return {
+        'revenue': revenue,
+        'cost': cost,
+        'orders': orders,
+        'published_products': products,
+        'customers': customers,
+        'placed_orders': placed,
+    }
+
+
+@source('daily')
+def daily_source(ctx):
+    """Daily sales since the first charted month (covers the 30 day chart too)."""
+    since = min(ctx.months[0], ctx.chart_start)
+    return list(
+        SalesDailyRollup.objects.filter(tenant_id=ctx.tenant_id, day__gte=since, orders_count__gt=0)
+        .order_by('day')
+        .values_list('day', 'revenue')
+    )
+
+
+@source('hourly')
+def hourly_source(ctx):
+    return list(
+        SalesHourlyRollup.objects.filter(tenant_id=ctx.tenant_id, hour__gte=ctx.today_start, orders_count__gt=0)
+        .order_by('hour')
+        .values_list('hour', 'revenue')
+    )
+
+
+@source('recent_orders')
+def recent_orders_source(ctx):
+    return list(
+        Order.objects.filter(tenant_id=ctx.tenant_id)
+        .exclude(status=OrderStatus.DRAFT)
+        .select_related('customer')
+        .order_by('-created_at')[:5]
+    )
+
+
+@source('top_products')
+def top_products_source(ctx):
+    return list(
+        ProductSalesDailyRollup.objects.filter(tenant_id=ctx.tenant_id)
+        .values('product_name', 'sku')
+        .annotate(total_qty=Sum('quantity'), total_revenue=Sum('revenue'))
+        .filter(total_qty__gt=0)
+        .order_by('-total_qty')[:5]
+    )
+
+
+@source('top_customers')
+def top_customers_source(ctx):
+    return list(
+        CustomerSalesRollup.objects.filter(tenant_id=ctx.tenant_id, orders_count__gt=0)
+        .values('customer_email', 'ltv', 'orders_count')
+        .order_by('-ltv')[:5]
+    )
+
+
+# Metrics
+# -------
+
+@metric('total_revenue', 'scalars')
+def total_revenue(ctx, scalars):
+    return float(scalars['revenue'])
+
+
+@metric('order_count', 'scalars')
+def order_count(ctx, scalars):
+    return scalars['orders']
+
+
+@metric('total_profit', 'scalars')
+def total_profit(ctx, scalars):
+    return float(scalars['revenue']) - float(scalars['cost'])
+
+
+@metric('margin_percentage', 'scalars')
+def margin_percentage(ctx, scalars):
+    revenue = float(scalars['revenue'])
+    if revenue <= 0:
+        return 0
+    return round((revenue - float(scalars['cost'])) / revenue * 100, 2)
+
+
+@metric('avg_ticket', 'scalars')
+def avg_ticket(ctx, scalars):
+    if not scalars['orders']:
+        return 0
+    return round(scalars['revenue'] / scalars['orders'], 2)
+
+
+@metric('total_products', 'scalars')
+def total_products(ctx, scalars):
+    return scalars['published_products']
+
+
+@metric('total_customers', 'scalars')
+def total_customers(ctx, scalars):
+    return scalars['customers']
+
+
+@metric('placed_orders', 'scalars')
+def placed_orders(ctx, scalars):
+    """Orders past the cart (every status but Draft)."""
+    return scalars['placed_orders']
+
+
+@metric('daily_sales_chart', 'daily')
+def daily_sales_chart(ctx, daily):
+    return [
+        {'name': day.strftime('%d %b'), 'total': float(revenue)}
+        for day, revenue in daily if day >= ctx.chart_start
+    ]
+
+
+@metric('monthly_sales_chart', 'daily')
+def monthly_sales_chart(ctx, daily):
+    """The last CHART_MONTHS months, empty months included."""
+    totals = {month: 0 for month in ctx.months}
+    for day, revenue in daily:
+        month = day.replace(day=1)
+        if month in totals:
+            totals[month] += float(revenue)
+    return [{'name': month.strftime('%b'), 'total': total} for month, total in totals.items()]
+
+
+@metric('hourly_sales_chart', 'hourly')
+def hourly_sales_chart(ctx, hourly):
+    return [
+        {'name': timezone.localtime(hour).strftime('%H:%M'), 'total': float(revenue)}
+        for hour, revenue in hourly
+    ]
+
+
+@metric('recent_orders', 'recent_orders')
+def recent_orders(ctx, orders):
+    rows = []
+    for order in orders:
+        customer_name = "Unknown"
+        if order.customer:
+            if order.customer.first_name:
+                customer_name = f"{order.customer.first_name} {order.customer.last_name or ''}".strip()
+            elif order.customer.company_name:
+                customer_name = order.customer.company_name
+
+        rows.append({
+            'id': str(order.id),
+            'customer_name': customer_name,
+            'customer_email': order.customer_email,
+            'amount': float(order.total),
+            'status': order.status,
+            'created_at': order.created_at
+        })
+    return rows
+
+
+@metric('top_products', 'top_products')
+def top_products(ctx, rows):
+    return rows
+
+
+@metric('top_customers', 'top_customers')
+def top_customers(ctx, rows):
+    return rows
+
+
+# Computing and caching
+# ---------------------
+
+def compute_metrics(tenant_id, names=None, now=None):
+    """Compute the named metrics (all by default), reading each source once."""
+    names = list(METRICS) if names is None else names
+    ctx = DashboardContext(tenant_id, now)
+    results = {}
+    metrics = {}
+    for name in names:
+        sources, fn = METRICS[name]
+        for source_name in sources:
+            if source_name not in results:
+                results[source_name] = SOURCES[source_name](ctx)
+        metrics[name] = fn(ctx, *(results[source_name] for source_name in sources))
+    return metrics
+
+
+def get_dashboard_metrics(tenant_id):
+    """
+    All dashboard metrics for a tenant. A stale bundle is served as is while a
+    background thread refreshes it; only a cold cache computes in the request.
+    """
+    return ADMIN_DASHBOARD.get_or_set(lambda: compute_metrics(tenant_id), tenant_id)
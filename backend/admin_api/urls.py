@@ -29,6 +29,7 @@ from .admin_order_views import (
     order_list,
     order_detail,
     order_update_status,
+    order_bulk_status,
     order_cancel,
     order_stats,
     respond_quote,
@@ -103,6 +104,7 @@ urlpatterns = [
     # Orders
     path('orders/', order_list, name='order_list'),
     path('orders/stats/', order_stats, name='order_stats'),
+    path('orders/bulk-status/', order_bulk_status, name='order_bulk_status'),
     path('orders/<uuid:pk>/', order_detail, name='order_detail'),
     path('orders/<uuid:pk>/status/', order_update_status, name='order_update_status'),
     path('orders/<uuid:pk>/cancel/', order_cancel, name='order_cancel'),
@@ -159,27 +159,11 @@ def tenant_settings(request):
         }, status=status.HTTP_404_NOT_FOUND)
 
     if request.method == 'GET':
-        # Try to get from cache
-        from django.core.cache import cache
-        cache_key = f"tenant_settings_{tenant.id}"
-        
-        try:
-            cached_data = cache.get(cache_key)
-            if cached_data:
-                return Response(cached_data)
-        except Exception:
-            pass
-        
+        # Cached for 10 minutes (core/cache_registry.py)
+        from core.cache_registry import ADMIN_TENANT_SETTINGS
         from tenants.serializers import TenantSerializer
-        serializer = TenantSerializer(tenant)
-        
-        # Cache for 10 minutes
-        try:
-            cache.set(cache_key, serializer.data, 600)
-        except Exception:
-            pass
-        
-        return Response(serializer.data)
+        data = ADMIN_TENANT_SETTINGS.get_or_set(lambda: TenantSerializer(tenant).data, tenant.id)
+        return Response(data)
     
     elif request.method == 'PATCH':
         logger.info(f"Updating tenant settings for {tenant.slug}. Data: {request.data}")
@@ -210,123 +194,19 @@ def dashboard_stats(request):
         if not tenant:
             return Response({'error': 'Tenant not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        # Try to get from cache (2 minutes for fresh stats)
-        from django.core.cache import cache
-        cache_key = f"dashboard_stats_{tenant.id}"
-        
-        try:
-            cached_data = cache.get(cache_key)
-            if cached_data:
-                return Response(cached_data)
-        except Exception:
-            pass
-
-        from orders.models import Order, OrderStatus, Customer
-        from products.models import Product
-        from django.db.models import Sum, Count
-        from django.db.models.functions import TruncMonth
-        from django.utils import timezone
-        import datetime
-
-        # 1. Total Sales (Paid/Completed orders)
-        # Considering PAID, SHIPPED, DELIVERED as "Sales"
-        sales_statuses = [OrderStatus.PAID, OrderStatus.SHIPPED, OrderStatus.DELIVERED]
-        
-        total_sales_agg = Order.objects.filter(
-            tenant=tenant, 
-            status__in=sales_statuses
-        ).aggregate(total=Sum('total'))
-        
-        total_sales = total_sales_agg['total'] or 0
-
-        # 2. Total Orders (All non-draft, non-cancelled maybe? Or just count all?)
-        # Let's count "valid" orders (not draft)
-        total_orders = Order.objects.filter(
-            tenant=tenant
-        ).exclude(status=OrderStatus.DRAFT).count()
-
-        # 3. Total Products
-        total_products = Product.objects.filter(
-            tenant=tenant,
-            status='Published'
-        ).count()
-
-        # 4. Total Customers (Unique emails in orders or Customer model)
-        total_customers = Customer.objects.filter(
-            tenant=tenant,
-            is_active=True
-        ).count()
-
-        # 5. Sales Chart Data (Last 6 months)
-        six_months_ago = timezone.now() - datetime.timedelta(days=180)
-        
-        sales_by_month = Order.objects.filter(
-            tenant=tenant,
-            status__in=sales_statuses,
-            created_at__gte=six_months_ago
-        ).annotate(
-            month=TruncMonth('created_at')
-        ).values('month').annotate(
-            total=Sum('total')
-        ).order_by('month')
-
-        chart_data = []
-        for entry in sales_by_month:
-            chart_data.append({
-                'name': entry['month'].strftime('%b'), # Jan, Feb, etc.
-                'total': float(entry['total'] or 0)
-            })
-
-        # If no data, provide empty structure for UI stability
-        if not chart_data:
-            # Generate last 6 months empty
-            for i in range(5, -1, -1):
-                date = timezone.now() - datetime.timedelta(days=30*i)
-                chart_data.append({
-                    'name': date.strftime('%b'),
-                    'total': 0
-                })
-
-        # 6. Recent Orders
-        recent_orders_qs = Order.objects.filter(
-            tenant=tenant
-        ).exclude(status=OrderStatus.DRAFT).order_by('-created_at')[:5]
-
-        recent_orders = []
-        for order in recent_orders_qs:
-            # Try to get customer name
-            customer_name = "Unknown"
-            customer_email = order.customer_email
-            if order.customer:
-                 if order.customer.first_name:
-                     customer_name = f"{order.customer.first_name} {order.customer.last_name or ''}".strip()
-                 elif order.customer.company_name:
-                     customer_name = order.customer.company_name
-
-            recent_orders.append({
-                'id': str(order.id),
-                'customer_name': customer_name,
-                'customer_email': customer_email,
-                'amount': float(order.total),
-                'status': order.status,
-                'created_at': order.created_at
-            })
+        # Same cached metrics bundle as AdminDashboardViewSet.stats
+        from .dashboard import get_dashboard_metrics
+        metrics = get_dashboard_metrics(tenant.id)
 
         result = {
-            'total_sales': float(total_sales),
-            'total_orders': total_orders,
-            'total_products': total_products,
-            'total_customers': total_customers,
-            'sales_chart': chart_data,
-            'recent_orders': recent_orders
+            'total_sales': metrics['total_revenue'],
+            'total_orders': metrics['placed_orders'],
+            'total_products': metrics['total_products'],
+            'total_customers': metrics['total_customers'],
+            'sales_chart': metrics['monthly_sales_chart'],
+            'recent_orders': metrics['recent_orders']
         }
         
-        # Cache for 2 minutes
-        try:
-            cache.set(cache_key, result, 120)
-        except Exception:
-            pass
-        
         return Response(result)
     except Exception as e:
         import traceback
@@ -0,0 +1,182 @@
+"""
+Canonical cache keys for endpoints cached per query string.
+
+A QueryKey lists the query parameters that change an endpoint's response,
+each with a normaliser. Anything else (utm_*, fbclid, gclid, the ``tenant``
+selector, junk) is left out of the key, and equivalent spellings of a value
+share one key: parameter order, ``10.0`` vs ``10``, ``featured=yes`` (treated
+as absent by the view anyway), search text case and spacing.
+
+    PRODUCT_LIST_KEY = QueryKey('storefront_products_list', min_price=number, featured=flag)
+    params = PRODUCT_LIST_KEY.build(request.query_params, tenant.id)
+
+Normalisers take the raw value and return its canonical string, or None
+when the value cannot change the response (the parameter is dropped; the
+views treat empty values as absent). A value they do not understand is kept
+verbatim so it cannot share a key with a valid one. Keys longer than
+MAX_PARAMS_LENGTH are replaced by a digest.
+
+Key cardinality
+---------------
+On Redis, build() also adds the raw and the canonical query string to two
+HyperLogLogs per endpoint, tenant and day (one pipelined round trip), so
+key_cardinality() can report how many distinct URLs an endpoint saw and how
+many cache keys they collapsed to (admin cache diagnostics).
+"""
+import hashlib
+import logging
+import time
+import uuid
+from decimal import Decimal, InvalidOperation
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from django.core.cache import cache
+
+from core.cache_utils import _redis_client
+
+logger = logging.getLogger(__name__)
+
+MAX_PARAMS_LENGTH = 200
+# Select the tenant (core.tenant_resolver): not part of keys already scoped by tenant
+TENANT_PARAMS = ('tenant', 'slug', 'domain')
+CARDINALITY_TTL = 2 * 24 * 60 * 60
+
+QUERY_KEYS = {}
+
+
+# Normalisers
+# -----------
+
+def text(value):
+    """Used verbatim; empty means absent."""
+    return value or None
+
+
+def number(value):
+    """Decimal value without trailing zeros: 10, 10.0 and 010 are one key."""
+    if not value:
+        return None
+    try:
+        parsed = Decimal(value.strip())
+    except InvalidOperation:
+        return value
+    if not parsed.is_finite() or abs(parsed.adjusted()) > 20:
+        return value
+    return format(parsed.normalize(), 'f')
+
+
+def integer(value):
+    if not value:
+        return None
+    try:
+        return str(int(value))
+    except ValueError:
+        return value
+
+
+def flag(value):
+    """Boolean filters the views only apply for the exact value 'true'."""
+    return 'true' if value == 'true' else None
+
+
+def uuid_value(value):
+    if not value:
+        return None
+    try:
+        return str(uuid.UUID(value.strip()))
+    except ValueError:
+        return value
+
+
+def choice(*values):
+    """Only ``values`` change the response; anything else is ignored by the view."""
+    allowed = frozenset(values)
+
+    def normalise(value):
+        return value if value in allowed else None
+    return normalise
+
+
+class QueryKey:
+    """The query parameters of one endpoint that go into its cache key."""
+
+    def __init__(self, endpoint, **params):
+        self.endpoint = endpoint
+        self.params = params
+        QUERY_KEYS[endpoint] = self
+
+    def __repr__(self):
+        return f"<QueryKey {self.endpoint}>"
+
+    def canonical(self, query_params):
+        """Sorted, normalised, whitelisted query string."""
+        items = []
+        for name in sorted(self.params):
+            value = query_params.get(name)
+            if value is None:
+                continue
+            value = self.params[name](value)
+            if value is not None:
+                items.append((name, value))
+        params = urlencode(items)
+        if len(params) > MAX_PARAMS_LENGTH:
+            params = hashlib.sha1(params.encode()).hexdigest()
+        return params
+
+    def clean_url(self, url):
+        """Drop the parameters outside the key from a URL stored in a cached payload (page links)."""
+        if not url:
+            return url
+        parts = urlsplit(url)
+        query = [
+            (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+            if name in self.params or name in TENANT_PARAMS
+        ]
+        return parts._replace(query=urlencode(query)).geturl()
+
+    def build(self, query_params, tenant_id):
+        """Canonical params for the cache key; records the key cardinality."""
+        params = self.canonical(query_params)
+        record_cardinality(self.endpoint, tenant_id, query_params.urlencode(), params)
+        return params
+
+
+# Cardinality
+# -----------
+
+def _cardinality_keys(endpoint, tenant_id, day=None):
+    day = day or time.strftime('%Y%m%d', time.gmtime())
+    base = cache.make_key(f"cache_cardinality_{endpoint}_{tenant_id}_{day}")
+    return f"{base}:raw", f"{base}:keys"
+
+
+def record_cardinality(endpoint, tenant_id, raw, params):
+    client = _redis_client()
+    if client is None:
+        return
+    raw_key, params_key = _cardinality_keys(endpoint, tenant_id)
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.pfadd(raw_key, raw)
+        pipe.pfadd(params_key, params)
+        pipe.expire(raw_key, CARDINALITY_TTL)
+        pipe.expire(params_key, CARDINALITY_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Cache key cardinality not recorded for {endpoint}: {e}")
+
+
+def key_cardinality(tenant_id):
+    """
+    Today's approximate distinct query strings and cache keys per endpoint:
+    {endpoint: {'urls': n, 'keys': n}}. Empty when the cache is not Redis.
+    """
+    client = _redis_client()
+    if client is None:
+        return {}
+    pipe = client.pipeline(transaction=False)
+    for endpoint in QUERY_KEYS:
+        for key in _cardinality_keys(endpoint, tenant_id):
+            pipe.pfcount(key)
+    counts = iter(pipe.execute())
+    return {endpoint: {'urls': next(counts), 'keys': next(counts)} for endpoint in QUERY_KEYS}
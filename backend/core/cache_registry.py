@@ -0,0 +1,185 @@
+"""
+Registry of every cached API payload.
+
+Each payload is declared once, here, with its key, TTL and what it depends
+on. Views read through the entry and writes report what changed; which
+caches that invalidates is computed from the declarations, so a new cached
+view cannot be forgotten by a hand-maintained invalidation list.
+
+    STOREFRONT_PRODUCT.get_or_set(compute, tenant_id, slug=slug)
+    invalidate(tenant_id, product_tag(product.id))     # one product changed
+    invalidate(tenant_id, PRODUCT)                     # any product may have changed
+
+Dependencies are tag kinds (core.cache_utils: PRODUCT, CATEGORY, CATALOG,
+TENANT). An entry's ``tagged`` kinds are recorded on its payloads with
+cache_tags(), so a change to one product only marks the payloads that
+contain it. For the other kinds in ``depends_on``, and for bare kinds with
+no id, the entry's own version is bumped (per tenant, or globally for
+entries not keyed by tenant).
+
+Entries with ``swr`` are served stale while one request refreshes them
+(core.cache_utils.get_or_refresh); the others are plain versioned keys, for
+admin screens that must show a write right away.
+"""
+import logging
+
+from django.core.cache import cache
+
+from core.cache_utils import (
+    CATALOG, CATEGORY, PRODUCT, SWR_STALE_TIMEOUT, TENANT,
+    bump_cache_version, get_or_refresh, get_versioned, invalidate_tags,
+)
+from core.singleflight import single_flight
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = {}
+
+STOREFRONT = (PRODUCT, CATEGORY, CATALOG, TENANT)
+
+
+class CacheEntry:
+    """A cached payload: key template, TTL and invalidation dependencies."""
+
+    def __init__(self, name, key, ttl, depends_on=(), tagged=(), swr=True,
+                 stale_ttl=SWR_STALE_TIMEOUT, background=False, per_tenant=True):
+        self.name = name
+        self.key = key
+        self.ttl = ttl
+        self.depends_on = frozenset(depends_on)
+        self.tagged = frozenset(tagged)
+        self.swr = swr
+        self.stale_ttl = stale_ttl
+        self.background = background
+        self.per_tenant = per_tenant
+
+    def __repr__(self):
+        return f"<CacheEntry {self.name}>"
+
+    def make_key(self, tenant_id=None, **params):
+        return self.key.format(tenant_id=tenant_id, **params)
+
+    def version_scope(self, tenant_id=None):
+        return (f"cache_{self.name}", tenant_id if self.per_tenant else 'global')
+
+    def get_or_set(self, compute, tenant_id=None, **params):
+        """Cached ``compute()``; None results are returned but not cached."""
+        key = self.make_key(tenant_id, **params)
+        if self.swr:
+            return get_or_refresh(
+                key, compute, self.ttl, version_scope=self.version_scope(tenant_id),
+                stale_timeout=self.stale_ttl, background=self.background
+            )
+
+        try:
+            key, value = get_versioned(key, *self.version_scope(tenant_id))
+        except Exception as e:
+            logger.warning(f"Cache unavailable for {key}, computing uncached: {e}")
+            return compute()
+        if value is None:
+            # Concurrent misses wait for one computation (core/singleflight.py)
+            value = single_flight(key, lambda: self._compute_and_set(key, compute))
+        return value
+
+    def _compute_and_set(self, key, compute):
+        value = compute()
+        if value is not None:
+            try:
+                cache.set(key, value, self.ttl)
+            except Exception:
+                pass
+        return value
+
+    def invalidate(self, tenant_id=None):
+        bump_cache_version(*self.version_scope(tenant_id))
+
+    def needs_bump(self, tag):
+        """Whether ``tag`` (kind or kind:id) can only reach this entry through its version."""
+        kind, _, tag_id = tag.partition(':')
+        return kind in self.depends_on and (kind not in self.tagged or not tag_id)
+
+
+def register(name, key, ttl, **options):
+    entry = CacheEntry(name, key, ttl, **options)
+    REGISTRY[name] = entry
+    return entry
+
+
+def invalidate(tenant_id, *tags):
+    """
+    Invalidate what depends on ``tags``: payloads recording one of them, and
+    the versions of entries that depend on their kind without recording it.
+    """
+    invalidate_tags(tag for tag in tags if ':' in tag)
+    for entry in REGISTRY.values():
+        if any(entry.needs_bump(tag) for tag in tags):
+            entry.invalidate(tenant_id)
+
+
+def invalidate_all(tenant_id):
+    """Invalidate every registered payload of a tenant."""
+    for entry in REGISTRY.values():
+        entry.invalidate(tenant_id)
+
+
+# Storefront
+# ----------
+
+STOREFRONT_COMMON_DATA = register(
+    'storefront_common_data', 'storefront_common_data_{tenant_id}', 6 * 60 * 60,
+    depends_on=(CATEGORY, TENANT), tagged=(CATEGORY, TENANT),
+)
+STOREFRONT_HOME = register(
+    'storefront_home_data', 'storefront_home_data_{tenant_id}', 60 * 60,
+    depends_on=STOREFRONT, tagged=STOREFRONT,
+)
+STOREFRONT_CATEGORY_PAGE = register(
+    'storefront_category_data', 'storefront_category_data_{tenant_id}_{category_slug}_{params}', 60 * 60,
+    depends_on=STOREFRONT, tagged=STOREFRONT,
+)
+STOREFRONT_PRODUCT = register(
+    'storefront_product', 'storefront_product_{tenant_id}_{slug}', 60 * 60,
+    depends_on=STOREFRONT, tagged=STOREFRONT,
+)
+# Menu with product counts: counts move when products enter or leave a category
+STOREFRONT_CATEGORIES = register(
+    'storefront_categories', 'storefront_categories_{tenant_id}', 6 * 60 * 60,
+    depends_on=(CATEGORY,),
+)
+STOREFRONT_PRODUCTS_LIST = register(
+    'storefront_products_list', 'storefront_products_list_{tenant_id}_{params}', 60 * 60,
+    depends_on=STOREFRONT, tagged=(PRODUCT, CATALOG),
+)
+STOREFRONT_SUGGEST = register(
+    'storefront_suggest', 'storefront_suggest_{tenant_id}_{limit}_{prefix}', 60,
+    depends_on=(PRODUCT, CATALOG),
+)
+# Looked up by slug or domain before the tenant is known: one global version
+TENANT_LOOKUP = register(
+    'api_tenant_list', 'api_tenant_list_{lookup}', 6 * 60 * 60,
+    depends_on=(TENANT,), per_tenant=False,
+)
+
+
+# Admin
+# -----
+
+ADMIN_PRODUCTS_LIST = register(
+    'admin_products_list', 'products_list_{tenant_id}_{params}', 5 * 60,
+    depends_on=(PRODUCT, CATEGORY, CATALOG), swr=False,
+)
+ADMIN_CATEGORIES = register(
+    'admin_categories', 'categories_{tenant_id}', 10 * 60,
+    depends_on=(CATEGORY, CATALOG), swr=False,
+)
+ADMIN_TENANT_SETTINGS = register(
+    'tenant_settings', 'tenant_settings_{tenant_id}', 10 * 60,
+    depends_on=(TENANT,), swr=False,
+)
+# Invalidated by the order counters on every status change (orders/stats.py)
+ADMIN_ORDER_STATS = register('order_stats', 'order_stats_{tenant_id}', 5 * 60, swr=False)
+# Sales figures move with every order: kept fresh by its short TTL
+ADMIN_DASHBOARD = register(
+    'dashboard_stats', 'dashboard_stats_{tenant_id}', 60,
+    depends_on=(TENANT,), stale_ttl=15 * 60, background=True,
+)
@@ -1,7 +1,17 @@
 """
 Cache utilities for handling cache operations across different backends.
 """
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
 from django.core.cache import cache
+from django.db import connections
+
+from core.singleflight import single_flight
+
+logger = logging.getLogger(__name__)
 
 
 def delete_pattern(pattern):
@@ -28,30 +38,23 @@ def delete_pattern(pattern):
 
 def invalidate_product_cache(tenant_id):
     """
-    Invalidate all product-related cache for a tenant by bumping the version.
-    Replaces slow delete_pattern.
+    Invalidate every cached payload that depends on a tenant's products
+    (core/cache_registry.py). Product writes go through the signals, which
+    only invalidate the payloads containing the product.
     """
-    # Bump version for 'products_list' scope for this tenant
-    # This invalidates all product lists that rely on this version
-    bump_cache_version('products_list', tenant_id)
-    
-    # Also bump 'categories' scope as products affect category lists
-    bump_cache_version('categories', tenant_id)
+    from core.cache_registry import invalidate
+    invalidate(tenant_id, PRODUCT)
 
 
 def invalidate_category_cache(tenant_id):
     """
-    Invalidate category cache for a tenant.
-    Also invalidates product cache since products depend on categories.
+    Invalidate every cached payload that depends on a tenant's categories.
     
     Args:
         tenant_id: UUID of the tenant
     """
-    try:
-        cache.delete(f"categories_{tenant_id}")
-    except Exception:
-        pass
-    invalidate_product_cache(tenant_id)
+    from core.cache_registry import invalidate
+    invalidate(tenant_id, CATEGORY)
 
 
     # Invalidate old product pattern for backward compatibility if needed, 
@@ -70,33 +73,88 @@ def invalidate_tenant_cache(tenant_id):
     Invalidate all tenant-related cache when tenant settings change.
     """
     try:
-        # Direct key invalidation for non-versioned keys
-        cache.delete(f"tenant_settings_{tenant_id}")
-        cache.delete(f"storefront_common_data_{tenant_id}")
-        # dashboard_stats might need versioning later, but delete for now
-        cache.delete(f"dashboard_stats_{tenant_id}")
-        
-        # Bump versions for versioned scopes
-        # Tenant settings affect everything (Home, Categories, Products)
-        bump_cache_version('home_data', tenant_id)
-        bump_cache_version('categories', tenant_id)
-        bump_cache_version('products_list', tenant_id)
-        
+        # Storefront pages embed the tenant data (tagged); the rest are
+        # version bumps computed from the cache registry
+        from core.cache_registry import invalidate
+        invalidate(tenant_id, tenant_tag(tenant_id))
     except Exception:
         pass
 
 
+# Scope versions
+# --------------
+# A version is an integer under "version_{scope}_{scope_id}" that versioned
+# keys embed (or SWR entries record); bumping it invalidates them. Versions
+# are read in batches: get_cache_versions() resolves several scopes with one
+# get_many, and get_or_refresh reads its versions together with the entry.
+# Within a request (CacheVersionMemoMiddleware) each version is read once and
+# remembered; a bump made by the request itself drops the remembered value.
+
+_versions_local = threading.local()
+
+
+def _version_key(scope, scope_id):
+    return f"version_{scope}_{scope_id}"
+
+
+@contextmanager
+def version_memo():
+    """Remember the scope versions read inside the block (one request)."""
+    previous = getattr(_versions_local, 'memo', None)
+    _versions_local.memo = {}
+    try:
+        yield
+    finally:
+        _versions_local.memo = previous
+
+
+def _memo():
+    return getattr(_versions_local, 'memo', None)
+
+
+def _remember_versions(versions):
+    memo = _memo()
+    if memo is not None:
+        memo.update(versions)
+
+
+def _get_many_with_versions(keys, scopes):
+    """
+    ``cache.get_many(keys)`` plus the versions of ``scopes``, in one round trip.
+    Returns (found, {(scope, scope_id): version}).
+    """
+    memo = _memo() or {}
+    versions = {scope: memo[_version_key(*scope)] for scope in scopes if _version_key(*scope) in memo}
+    missing = {_version_key(*scope): scope for scope in scopes if scope not in versions}
+    keys = list(keys) + list(missing)
+    # Everything known already: no round trip
+    found = cache.get_many(keys) if keys else {}
+
+    for version_key, scope in missing.items():
+        version = found.pop(version_key, None)
+        if version is None:
+            # First use of the scope; add() so a concurrent bump is not overwritten
+            version = 1
+            cache.add(version_key, version, timeout=None)
+        versions[scope] = version
+    _remember_versions({_version_key(*scope): versions[scope] for scope in missing.values()})
+    return found, versions
+
+
+def get_cache_versions(*scopes):
+    """
+    Current versions of several (scope, scope_id) pairs with one get_many.
+    Returns {(scope, scope_id): version}; unknown scopes start at 1.
+    """
+    return _get_many_with_versions((), scopes)[1]
+
+
 def get_cache_version(scope, scope_id):
     """
     Get the current version for a specific cache scope (e.g. 'category', 'product_list').
     Returns an integer version number (defaults to 1).
     """
-    version_key = f"version_{scope}_{scope_id}"
-    version = cache.get(version_key)
-    if version is None:
-        version = 1
-        cache.set(version_key, version, timeout=None) # Optimize: No timeout, or long timeout
-    return version
+    return get_cache_versions((scope, scope_id))[(scope, scope_id)]
 
 
 def bump_cache_version(scope, scope_id):
@@ -104,7 +162,10 @@ def bump_cache_version(scope, scope_id):
     Increment the version for a specific cache scope.
     This effectively invalidates all keys depending on this version.
     """
-    version_key = f"version_{scope}_{scope_id}"
+    version_key = _version_key(scope, scope_id)
+    memo = _memo()
+    if memo is not None:
+        memo.pop(version_key, None)
     try:
         # Atomic increment in Redis
         if hasattr(cache, 'incr'):
@@ -125,3 +186,295 @@ def get_versioned_cache_key(base_key, scope, scope_id):
     version = get_cache_version(scope, scope_id)
     return f"{base_key}:v{version}"
 
+
+# Reads the scope version (creating it at 1) and then the payload stored
+# under "<base_key>:v<version>", in one call. ARGV[1] is the full Redis key of
+# "<base_key>:v" (django-redis key function: prefix:version:key), so appending
+# the version gives the payload key.
+VERSIONED_GET_LUA = """
+local version = redis.call('GET', KEYS[1])
+if not version then
+    redis.call('SET', KEYS[1], 1, 'NX')
+    version = redis.call('GET', KEYS[1])
+end
+return {version, redis.call('GET', ARGV[1] .. version)}
+"""
+
+_versioned_get_script = None
+
+
+def _versioned_get_redis(client, base_key, scope, scope_id):
+    global _versioned_get_script
+    if _versioned_get_script is None:
+        _versioned_get_script = client.register_script(VERSIONED_GET_LUA)
+    raw_version, raw_value = _versioned_get_script(
+        keys=[cache.make_key(_version_key(scope, scope_id))],
+        args=[cache.make_key(f"{base_key}:v")],
+        client=client,
+    )
+    version = int(raw_version)
+    value = None if raw_value is None else cache.client.decode(raw_value)
+    return version, value
+
+
+def get_versioned(base_key, scope, scope_id):
+    """
+    Versioned read in one round trip: returns (versioned_key, value or None).
+
+    On Redis a Lua script resolves the scope version and reads the payload
+    under it in the same call; elsewhere, or when the version is already
+    known in this request, it is a plain get of the versioned key.
+    """
+    version_key = _version_key(scope, scope_id)
+    version = (_memo() or {}).get(version_key)
+    client = _redis_client() if version is None else None
+    if client is not None:
+        try:
+            version, value = _versioned_get_redis(client, base_key, scope, scope_id)
+            _remember_versions({version_key: version})
+            return f"{base_key}:v{version}", value
+        except Exception as e:
+            # e.g. scripting disabled: fall back to two round trips
+            logger.warning(f"Versioned get script failed for {base_key}: {e}")
+
+    key = get_versioned_cache_key(base_key, scope, scope_id)
+    return key, cache.get(key)
+
+
+# Stale-while-revalidate
+# ----------------------
+# get_or_refresh stores {'value', 'fresh_until', 'version', 'gen', 'tags'}
+# under a stable key. Past its soft expiry, once its version scope was bumped
+# or once one of its tags was invalidated (new generation), the entry is
+# stale: the first caller to take the refresh lock recomputes it, everybody
+# else is served the stale value meanwhile. Entries are dropped for good after
+# stale_timeout, and only a cold key is computed by every concurrent caller.
+#
+# Dependency tags
+# ---------------
+# While a value is computed, cache_tags() records what it contains
+# (product_tag(id), category_tag(id), ...). Cached values read during the
+# computation pass their tags up, so a page embedding the common data carries
+# the common data's tags too. Each tag is a set of cache keys (a Redis set
+# expiring with the entries); invalidate_tags() gives every key in the sets a
+# new generation, marking exactly the payloads that contain the changed rows.
+
+SWR_STALE_TIMEOUT = 24 * 60 * 60
+SWR_LOCK_TIMEOUT = 30
+
+_tags_local = threading.local()
+
+
+# Tag kinds; a tag is "<kind>:<id>" (see core/cache_registry.py)
+PRODUCT = 'product'
+CATEGORY = 'category'
+CATALOG = 'catalog'
+TENANT = 'tenant'
+
+
+def product_tag(product_id):
+    return f"{PRODUCT}:{product_id}"
+
+
+def category_tag(category_id):
+    """A category's own data and which products it holds."""
+    return f"{CATEGORY}:{category_id}"
+
+
+def catalog_tag(tenant_id):
+    """Which products a tenant publishes or features (home page selection)."""
+    return f"{CATALOG}:{tenant_id}"
+
+
+def tenant_tag(tenant_id):
+    """Tenant settings, embedded in every storefront page."""
+    return f"{TENANT}:{tenant_id}"
+
+
+def cache_tags(*tags):
+    """Record tags for every get_or_refresh value being computed on this thread."""
+    for collected in getattr(_tags_local, 'stack', ()):
+        collected.update(tags)
+
+
+def _compute_tagged(compute):
+    """Run compute() collecting its tags; returns (value, tags) and passes the tags up."""
+    stack = _tags_local.__dict__.setdefault('stack', [])
+    stack.append(set())
+    try:
+        value = compute()
+    finally:
+        tags = stack.pop()
+    cache_tags(*tags)
+    return value, tags
+
+
+def _tag_set_key(tag):
+    return f"cache_tag_{tag}"
+
+
+def _redis_client():
+    """Raw Redis client when the cache is django-redis, else None."""
+    if not hasattr(cache, 'delete_pattern'):
+        return None
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except Exception:
+        return None
+
+
+def _tag_entry(key, tags, timeout):
+    """Add ``key`` to the set of each tag."""
+    client = _redis_client()
+    if client is not None:
+        pipe = client.pipeline(transaction=False)
+        for tag in tags:
+            set_key = cache.make_key(_tag_set_key(tag))
+            pipe.sadd(set_key, key)
+            pipe.expire(set_key, timeout)
+        pipe.execute()
+        return
+
+    # Other backends (LocMemCache in development): read-modify-write of a Python set
+    for tag in tags:
+        keys = cache.get(_tag_set_key(tag)) or set()
+        keys.add(key)
+        cache.set(_tag_set_key(tag), keys, timeout)
+
+
+def invalidate_tags(tags):
+    """
+    Mark stale every cached payload recorded under any of ``tags``.
+    The sets are emptied: payloads join them again when they are recomputed.
+    """
+    tags = set(tags)
+    if not tags:
+        return
+    try:
+        client = _redis_client()
+        if client is not None:
+            set_keys = [cache.make_key(_tag_set_key(tag)) for tag in tags]
+            pipe = client.pipeline()
+            for set_key in set_keys:
+                pipe.smembers(set_key)
+            pipe.delete(*set_keys)
+            *members, _ = pipe.execute()
+            keys = {key.decode() if isinstance(key, bytes) else key for group in members for key in group}
+        else:
+            found = cache.get_many([_tag_set_key(tag) for tag in tags])
+            cache.delete_many(list(found))
+            keys = set().union(*found.values())
+
+        if keys:
+            generation = time.time_ns()
+            cache.set_many({f"{key}:gen": generation for key in keys}, SWR_STALE_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Cache tag invalidation failed for {tags}: {e}")
+
+
+def _swr_store(key, value, timeout, stale_timeout, version, generation, tags):
+    try:
+        if value is None:
+            # Nothing to serve any more (e.g. the object is gone)
+            cache.delete(key)
+            return
+        cache.set(key, {
+            'value': value,
+            'fresh_until': time.time() + timeout,
+            'version': version,
+            'gen': generation,
+            'tags': tags,
+        }, stale_timeout)
+        if tags:
+            _tag_entry(key, tags, stale_timeout)
+    except Exception as e:
+        logger.warning(f"Cache set failed for {key}: {e}")
+
+
+def _swr_refresh(key, compute, timeout, stale_timeout, version_scope, close_connections=False):
+    lock_key = f"{key}:refreshing"
+    try:
+        # Read version and generation before computing: an invalidation during
+        # the refresh leaves the stored entry stale
+        scopes = (version_scope,) if version_scope else ()
+        found, versions = _get_many_with_versions([f"{key}:gen"], scopes)
+        version, generation = versions.get(version_scope), found.get(f"{key}:gen")
+        value, tags = _compute_tagged(compute)
+        _swr_store(key, value, timeout, stale_timeout, version, generation, tags)
+        return value
+    finally:
+        try:
+            cache.delete(lock_key)
+        except Exception:
+            pass
+        if close_connections:
+            connections.close_all()
+
+
+def _swr_refresh_in_background(*args):
+    try:
+        _swr_refresh(*args, close_connections=True)
+    except Exception:
+        logger.exception(f"Background cache refresh failed for {args[0]}")
+
+
+def get_or_refresh(key, compute, timeout, version_scope=None, stale_timeout=SWR_STALE_TIMEOUT, background=False):
+    """
+    Cached value of ``compute()`` with stale-while-revalidate.
+
+    Args:
+        key: Stable cache key (no version suffix)
+        compute: Callable building the value; None is returned as is and not cached.
+                 It may call cache_tags() to record what the value contains.
+        timeout: Seconds the value is fresh
+        version_scope: Optional (scope, scope_id) whose bump marks the value stale
+        stale_timeout: Seconds a stale value may still be served
+        background: Refresh stale values in a thread instead of in the caller
+                    that took the lock (for callers not tied to a request)
+
+    If the cache is unreachable the value is computed and returned uncached.
+    """
+    gen_key = f"{key}:gen"
+    try:
+        scopes = (version_scope,) if version_scope else ()
+        found, versions = _get_many_with_versions([key, gen_key], scopes)
+        version = versions.get(version_scope)
+    except Exception as e:
+        logger.warning(f"Cache unavailable for {key}, computing uncached: {e}")
+        return compute()
+
+    entry, generation = found.get(key), found.get(gen_key)
+    if entry is None:
+        # Cold key: one caller computes, concurrent ones wait for its result
+        def compute_and_store():
+            value, tags = _compute_tagged(compute)
+            _swr_store(key, value, timeout, stale_timeout, version, generation, tags)
+            return value, tags
+
+        value, tags = single_flight(key, compute_and_store)
+        # A waiter did not run compute(): pass the leader's tags up
+        cache_tags(*tags)
+        return value
+
+    cache_tags(*entry.get('tags', ()))
+    if (entry['version'] == version and entry.get('gen') == generation
+            and entry['fresh_until'] > time.time()):
+        return entry['value']
+
+    try:
+        refreshing = not cache.add(f"{key}:refreshing", 1, SWR_LOCK_TIMEOUT)
+    except Exception:
+        refreshing = True
+    if refreshing:
+        return entry['value']
+
+    args = (key, compute, timeout, stale_timeout, version_scope)
+    if background:
+        threading.Thread(target=_swr_refresh_in_background, args=args, daemon=True).start()
+        return entry['value']
+    try:
+        return _swr_refresh(*args)
+    except Exception:
+        logger.exception(f"Cache refresh failed for {key}, serving stale value")
+        return entry['value']
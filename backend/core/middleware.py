@@ -1,8 +1,8 @@
 from django.http import JsonResponse, HttpResponsePermanentRedirect
 from django.utils.deprecation import MiddlewareMixin
-from django.db.models import Q
-from django.core.cache import cache
-from tenants.models import Tenant, Redirect
+from tenants.models import Redirect
+from core.cache_utils import version_memo
+from core.tenant_resolver import get_request_identifiers, resolve_tenant
 import logging
 
 logger = logging.getLogger(__name__)
@@ -28,92 +28,16 @@ class TenantMiddleware(MiddlewareMixin):
                 return None
 
             # 1. Identify Tenant (Priority Header -> Query Param -> Host)
-            # This logic must be consistent between Middleware and Views
-            header_tenant = request.headers.get('X-Tenant')
-            slug_param = request.GET.get('tenant') or request.GET.get('slug')
-            domain_param = request.GET.get('domain')
-            host = request.get_host().split(':')[0].lower()
-            
-            identifier = header_tenant or slug_param or domain_param
-            
-            # Use specific cache key if identifier is present, otherwise use host
-            if identifier:
-                cache_key = f"resolved_tenant_v2_id_{identifier}"
-            else:
-                cache_key = f"resolved_tenant_v2_host_{host}"
-
-            # 2. Try Cache First (Redis)
-            cached_tenant = cache.get(cache_key)
-            if cached_tenant == "NOT_FOUND":
-                # Only return 404 for storefront APIs, others might be global
-                if request.path.startswith('/api/storefront/'):
-                    return JsonResponse({'error': 'Tenant not found', 'detail': f'Negative cache hit for {identifier or host}'}, status=404)
-                request.tenant = None
-                return None
-            elif cached_tenant:
-                request.tenant = cached_tenant
-                return None
-
-            # 3. Resolution Logic (Database Fallback)
-            tenant = None
-            sensitive_fields = [
-                'transbank_api_key', 'transbank_commerce_code',
-                'mercadopago_access_token', 'mercadopago_public_key',
-                'khipu_receiver_id', 'khipu_secret_key',
-                'smtp_username', 'smtp_password', 'smtp_host'
-            ]
-            
-            # Case A: Identifier provided (Header or Param)
-            if identifier:
-                tenant = Tenant.objects.filter(
-                    Q(slug=identifier) | Q(custom_domain=identifier),
-                    status__in=['Active', 'Trial'],
-                    deleted_at__isnull=True
-                ).defer(*sensitive_fields).first()
-            
-            # Case B: No identifier, use Host resolution
-            if not tenant and not identifier:
-                # B1: Custom Domain
-                clean_host = host[4:] if host.startswith('www.') else host
-                tenant = Tenant.objects.filter(
-                    Q(custom_domain=host) | Q(custom_domain=clean_host),
-                    status__in=['Active', 'Trial'],
-                    deleted_at__isnull=True
-                ).defer(*sensitive_fields).first()
-                
-                # B2: Platform Subdomain (slug.onrender.com)
-                if not tenant:
-                    parts = host.split('.')
-                    platform_domains = ['localhost', 'onrender.com', 'vercel.app', 'railway.app']
-                    is_platform = any(d in host for d in platform_domains)
-                    if is_platform and len(parts) >= 2:
-                        platform_slug = parts[0]
-                        if platform_slug not in ['www', 'api', 'admin', 'localhost']:
-                            tenant = Tenant.objects.filter(
-                                slug=platform_slug,
-                                status__in=['Active', 'Trial'],
-                                deleted_at__isnull=True
-                            ).defer(*sensitive_fields).first()
-                
-                # B3: SaaS Fallback (host is slug)
-                if not tenant and not is_platform:
-                    tenant = Tenant.objects.filter(
-                        slug=clean_host,
-                        status__in=['Active', 'Trial'],
-                        deleted_at__isnull=True
-                    ).defer(*sensitive_fields).first()
+            # Shared with StorefrontBaseView.resolve_tenant via core.tenant_resolver
+            identifier, host = get_request_identifiers(request)
 
-            # 4. Handle Result & Cache
+            # 2. Resolve through in-process LRU -> Redis -> Database
+            tenant = resolve_tenant(identifier, host)
             if tenant:
                 request.tenant = tenant
-                # Cache for 1 hour
-                cache.set(cache_key, tenant, timeout=3600)
                 return None
-            
-            # Negative Caching
-            cache.set(cache_key, "NOT_FOUND", timeout=60)
-            
-            # Fallback for storefront API (allow specific global endpoints)
+
+            # 3. Fallback for storefront API (allow specific global endpoints)
             global_storefront_paths = ['/api/storefront/communes/', '/api/storefront/home-data/']
             is_global_storefront = any(request.path.startswith(p) for p in global_storefront_paths)
             
@@ -180,3 +104,17 @@ class DisableCSRFForAdminAPIMiddleware(MiddlewareMixin):
         if request.path.startswith('/api/admin/'):
             setattr(request, '_dont_enforce_csrf_checks', True)
         return None
+
+
+class CacheVersionMemoMiddleware:
+    """
+    Read each cache scope version at most once per request
+    (core.cache_utils.version_memo); a request rendering several cached
+    payloads of the same scope then skips the repeated version lookups.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with version_memo():
+            return self.get_response(request)
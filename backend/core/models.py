@@ -5,6 +5,68 @@ import uuid
 from django.db import models
 
 
+class TrackedFieldsMixin:
+    """
+    Remembers the database values of ``tracked_fields`` when an instance is
+    loaded, so save hooks can see what changed without re-reading the row.
+
+        class Order(TrackedFieldsMixin, models.Model):
+            tracked_fields = ('status',)
+
+        order.has_changed('status')        # in-memory value differs from the DB
+        order.previous_value('status')     # value as loaded (None for new rows)
+        order.get_dirty_fields()           # {field: previous value}
+
+    The snapshot is taken in from_db/refresh_from_db and moved forward after
+    save() returns, so pre_save and post_save receivers still see the values
+    from before the save. Fields deferred at load time are snapshotted when
+    first accessed (Django loads them through refresh_from_db). Changes made
+    with QuerySet.update() are not seen.
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {}
+        instance._snapshot_tracked_fields()
+        return instance
+
+    def _snapshot_tracked_fields(self, fields=None):
+        deferred = self.get_deferred_fields()
+        loaded = self.__dict__.setdefault('_loaded_values', {})
+        for name in self.tracked_fields:
+            attname = self._meta.get_field(name).attname
+            if (fields is None or name in fields or attname in fields) and attname not in deferred:
+                loaded[name] = getattr(self, attname)
+
+    def previous_value(self, field):
+        """Value of ``field`` when loaded from the database; None for unsaved or unloaded fields."""
+        return self.__dict__.get('_loaded_values', {}).get(field)
+
+    def has_changed(self, field):
+        loaded = self.__dict__.get('_loaded_values', {})
+        if field not in loaded:
+            return self._state.adding
+        return getattr(self, self._meta.get_field(field).attname) != loaded[field]
+
+    def get_dirty_fields(self):
+        """Tracked fields that differ from the loaded values, mapped to their previous value."""
+        return {
+            name: self.previous_value(name)
+            for name in self.tracked_fields
+            if self.has_changed(name)
+        }
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._snapshot_tracked_fields(kwargs.get('update_fields'))
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._snapshot_tracked_fields(fields)
+
+
 class Commune(models.Model):
     """
     Chilean communes catalog (346 communes)
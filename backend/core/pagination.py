@@ -0,0 +1,187 @@
+"""
+Keyset (cursor) pagination on (created_at, id).
+
+Unlike PageNumberPagination this never issues COUNT(*) or OFFSET: each page is
+an index range scan starting after the last row of the previous page, so page
+1000 costs the same as page 1.
+
+Query parameters:
+    cursor     Opaque cursor from a previous response's next/previous link
+    page_size  Rows per page (capped at max_page_size)
+    total      Opt-in total: "estimate" (planner row estimate, derived from
+               pg_class.reltuples statistics) or "exact" (cached COUNT)
+
+Requests that pass ``page``, or querysets with a custom ordering (price,
+search rank), keep the legacy PageNumberPagination behaviour.
+Responses always contain next/previous/results; count is only present when
+a total was requested.
+"""
+import base64
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import datetime
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    total_query_param = 'total'
+    exact_count_timeout = 60
+
+    def __init__(self, page_size=None):
+        if page_size:
+            self.page_size = page_size
+        self.legacy_paginator = None
+        self.count = None
+        self.count_is_estimate = False
+
+    # ------------------------------------------------------------------
+    # Cursor encoding
+    # ------------------------------------------------------------------
+    def encode_cursor(self, row, reverse):
+        payload = {'c': row.created_at.isoformat(), 'i': str(row.pk), 'r': int(reverse)}
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            return datetime.fromisoformat(payload['c']), payload['i'], bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound('Invalid cursor')
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            size = self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    # ------------------------------------------------------------------
+    # Totals
+    # ------------------------------------------------------------------
+    def estimate_count(self, queryset):
+        """Planner row estimate for the filtered query (no table scan)."""
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def exact_count(self, queryset):
+        """COUNT(*) cached briefly per distinct query."""
+        sql, params = queryset.order_by().query.sql_with_params()
+        digest = hashlib.md5(f"{sql}|{params}".encode()).hexdigest()
+        cache_key = f"keyset_count_{queryset.model._meta.db_table}_{digest}"
+        count = cache.get(cache_key)
+        if count is None:
+            count = queryset.order_by().count()
+            cache.set(cache_key, count, self.exact_count_timeout)
+        return count
+
+    # ------------------------------------------------------------------
+    # Pagination
+    # ------------------------------------------------------------------
+    def is_keyset_ordering(self, queryset):
+        """Keyset only applies to newest-first listings; ranked/price orderings page by number."""
+        return tuple(queryset.query.order_by) in ((), ('-created_at',), ('-created_at', '-id'))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+
+        if request.query_params.get('page') or not self.is_keyset_ordering(queryset):
+            # Backwards compatible page-number mode (explicit page, or a custom ordering)
+            self.legacy_paginator = PageNumberPagination()
+            self.legacy_paginator.page_size = self.page_size
+            return self.legacy_paginator.paginate_queryset(queryset, request, view)
+
+        total = request.query_params.get(self.total_query_param)
+        if total == 'estimate':
+            self.count = self.estimate_count(queryset)
+            self.count_is_estimate = True
+        elif total == 'exact':
+            self.count = self.exact_count(queryset)
+
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverse = False
+
+        if cursor:
+            created_at, pk, reverse = cursor
+            if reverse:
+                # Previous page: rows newer than the cursor, nearest first
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+                )
+
+        ordering = ('created_at', 'pk') if reverse else ('-created_at', '-pk')
+        rows = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        # Forward pages: more rows means a next page; any cursor means a previous page.
+        # Backward pages: the reverse.
+        if reverse:
+            self.has_next, self.has_previous = bool(rows), has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.first_row = rows[0] if rows else None
+        self.last_row = rows[-1] if rows else None
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or self.last_row is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last_row, reverse=False))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.first_row is None:
+            return remove_query_param(url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.first_row, reverse=True))
+
+    def get_paginated_data(self, data):
+        if self.legacy_paginator is not None:
+            return self.legacy_paginator.get_paginated_response(data).data
+
+        payload = OrderedDict()
+        if self.count is not None:
+            payload['count'] = self.count
+            payload['count_is_estimate'] = self.count_is_estimate
+        payload['next'] = self.get_next_link()
+        payload['previous'] = self.get_previous_link()
+        payload['results'] = data
+        return payload
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+
+class StorefrontKeysetPagination(KeysetPagination):
+    """Storefront product list (same page size as the REST_FRAMEWORK default)."""
+    page_size = 48
@@ -0,0 +1,117 @@
+"""
+Request coalescing (single flight) across workers.
+
+When a cached value is missing, every concurrent request would compute it.
+single_flight() lets one caller per key compute while the others wait for
+its result instead of running the same queries:
+
+    value = single_flight(f"category_page_{tenant_id}_{slug}", compute)
+
+    @coalesced(lambda tenant_id: f"order_export_{tenant_id}")
+    def build_export(tenant_id): ...
+
+The first caller takes ``<key>:flight`` with cache.add (SET NX on Redis),
+holding a token that names where its result goes. Waiters poll for that
+result with a short backoff. They compute the value themselves when the
+leader fails, when the lock was taken over by another flight, or after
+``wait`` seconds, so a slow or failed leader costs time but never the
+response. Results must be picklable and are kept only briefly:
+single_flight does not cache, the caller does.
+
+If the cache is unreachable the value is simply computed.
+"""
+import functools
+import logging
+import time
+import uuid
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_WAIT = 5
+SINGLE_FLIGHT_LOCK_TIMEOUT = 30
+POLL_INTERVAL = 0.02
+MAX_POLL_INTERVAL = 0.2
+
+
+def _lock_key(key):
+    return f"{key}:flight"
+
+
+def _result_key(key, token):
+    return f"{key}:flight:{token}"
+
+
+def _lead(key, token, compute, wait):
+    try:
+        value = compute()
+        try:
+            # Wrapped so a None result is told apart from "not there yet"
+            cache.set(_result_key(key, token), {'value': value}, max(wait, 1) * 2)
+        except Exception as e:
+            logger.warning(f"Single flight result not shared for {key}: {e}")
+        return value
+    finally:
+        try:
+            if cache.get(_lock_key(key)) == token:
+                cache.delete(_lock_key(key))
+        except Exception:
+            pass
+
+
+def _wait_for(key, token, wait):
+    """The leader's result as {'value': ...}, or None if it is not coming in time."""
+    deadline = time.monotonic() + wait
+    interval = POLL_INTERVAL
+    result_key = _result_key(key, token)
+    while time.monotonic() < deadline:
+        time.sleep(interval)
+        found = cache.get_many([result_key, _lock_key(key)])
+        if result_key in found:
+            return found[result_key]
+        if found.get(_lock_key(key)) != token:
+            # Leader gone without a result (it failed) or a new flight started
+            return None
+        interval = min(interval * 1.5, MAX_POLL_INTERVAL)
+    return None
+
+
+def single_flight(key, compute, wait=SINGLE_FLIGHT_WAIT, lock_timeout=SINGLE_FLIGHT_LOCK_TIMEOUT):
+    """
+    ``compute()``, run by one caller per ``key`` at a time.
+
+    Args:
+        key: Identifies the computation (usually the cache key being filled)
+        compute: Callable returning a picklable value
+        wait: Seconds a waiter waits for the leader before computing itself
+        lock_timeout: Seconds after which a crashed leader's lock expires
+    """
+    token = uuid.uuid4().hex
+    try:
+        leading = cache.add(_lock_key(key), token, lock_timeout)
+        if not leading:
+            leader = cache.get(_lock_key(key))
+            result = _wait_for(key, leader, wait) if leader else None
+    except Exception as e:
+        logger.warning(f"Single flight unavailable for {key}, computing: {e}")
+        return compute()
+
+    if leading:
+        return _lead(key, token, compute, wait)
+    if result is None:
+        return compute()
+    return result['value']
+
+
+def coalesced(key_func, wait=SINGLE_FLIGHT_WAIT, lock_timeout=SINGLE_FLIGHT_LOCK_TIMEOUT):
+    """Decorator: concurrent calls with the same ``key_func(*args, **kwargs)`` share one run."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return single_flight(
+                key_func(*args, **kwargs), lambda: fn(*args, **kwargs),
+                wait=wait, lock_timeout=lock_timeout
+            )
+        return wrapper
+    return decorator
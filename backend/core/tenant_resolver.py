@@ -0,0 +1,342 @@
+"""
+Tenant resolution shared by TenantMiddleware and the storefront views.
+
+Resolution is cached in two tiers:
+
+1. A per-worker in-process LRU (thread-safe, TTL bound) holding compact
+   immutable ``TenantDescriptor`` tuples.
+2. A per-worker ``TenantRoutingIndex`` (slug, custom domain and platform
+   subdomain maps) built from a single query. The raw rows are shared
+   through Redis under a globally versioned key so cold workers do not all
+   hit the tenants table.
+
+Saving a Tenant bumps the ``tenant_resolution`` version in Redis. Workers poll
+that version every few seconds and drop their local LRU when it changes, so a
+change made in one worker is visible everywhere shortly after.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from core.cache_utils import get_cache_version, bump_cache_version
+
+
+# Credentials are never cached; they are loaded lazily if a view needs them.
+SENSITIVE_FIELDS = (
+    'transbank_api_key', 'transbank_commerce_code',
+    'mercadopago_access_token', 'mercadopago_public_key',
+    'khipu_receiver_id', 'khipu_secret_key',
+    'smtp_username', 'smtp_password', 'smtp_host',
+)
+ACTIVE_STATUSES = ('Active', 'Trial')
+
+NOT_FOUND = "NOT_FOUND"
+
+VERSION_SCOPE = 'tenant_resolution'
+VERSION_SCOPE_ID = 'global'
+
+LOCAL_MAXSIZE = 1024
+LOCAL_TTL = 300           # Upper bound on staleness if a version bump is lost
+LOCAL_NEGATIVE_TTL = 60
+REDIS_TTL = 3600
+VERSION_CHECK_INTERVAL = 5
+
+
+_descriptor_fields = None
+
+
+def get_descriptor_fields():
+    """Attribute names (in concrete field order) stored in a descriptor."""
+    global _descriptor_fields
+    if _descriptor_fields is None:
+        from tenants.models import Tenant
+        _descriptor_fields = tuple(
+            f.attname for f in Tenant._meta.concrete_fields
+            if f.name not in SENSITIVE_FIELDS
+        )
+    return _descriptor_fields
+
+
+class TenantDescriptor(namedtuple('_TenantDescriptorBase', ['field_names', 'values'])):
+    """
+    Immutable snapshot of the non-sensitive Tenant columns.
+    Much cheaper to pickle than a model instance and safe to share between threads.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(get_descriptor_fields(), tuple(row))
+
+    @property
+    def id(self):
+        return self.values[self.field_names.index('id')]
+
+    def to_tenant(self):
+        """
+        Build a fresh Tenant instance. Sensitive fields stay deferred, exactly as
+        with ``.defer(*SENSITIVE_FIELDS)``. Mutable values are copied so callers
+        cannot corrupt the shared descriptor.
+        """
+        from tenants.models import Tenant
+        values = [
+            copy.copy(v) if isinstance(v, (list, dict)) else v
+            for v in self.values
+        ]
+        return Tenant.from_db(DEFAULT_DB_ALIAS, self.field_names, values)
+
+
+class LocalTenantCache:
+    """Small thread-safe LRU with per-entry expiry, scoped to one cache version."""
+
+    def __init__(self, maxsize=LOCAL_MAXSIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked_at = 0.0
+
+    def _sync_version(self):
+        now = time.monotonic()
+        if now - self._version_checked_at < VERSION_CHECK_INTERVAL:
+            return self._version
+        try:
+            version = get_cache_version(VERSION_SCOPE, VERSION_SCOPE_ID)
+        except Exception:
+            # Redis unavailable: keep serving local entries until their TTL expires,
+            # and wait the same interval before trying it again
+            self._version_checked_at = now
+            return self._version
+        with self._lock:
+            self._version_checked_at = now
+            if version != self._version:
+                self._data.clear()
+                self._version = version
+        return version
+
+    def get(self, key):
+        self._sync_version()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._version_checked_at = 0.0
+
+    @property
+    def version(self):
+        return self._sync_version()
+
+
+local_cache = LocalTenantCache()
+
+
+def get_request_identifiers(request):
+    """
+    Extract (identifier, host) from a request.
+    Priority: X-Tenant header -> ?tenant / ?slug -> ?domain. Host is used when none is given.
+    """
+    header_tenant = request.headers.get('X-Tenant')
+    slug_param = request.GET.get('tenant') or request.GET.get('slug')
+    domain_param = request.GET.get('domain')
+    host = request.get_host().split(':')[0].lower()
+    return header_tenant or slug_param or domain_param, host
+
+
+def _active_tenants():
+    from tenants.models import Tenant
+    return Tenant.objects.filter(status__in=ACTIVE_STATUSES, deleted_at__isnull=True)
+
+
+def _normalise_domain(domain):
+    domain = (domain or '').strip().lower()
+    return domain[4:] if domain.startswith('www.') else domain
+
+
+def _build_platform_trie(domains):
+    """Trie over reversed domain labels, e.g. onrender.com -> {'com': {'onrender': {END: True}}}."""
+    trie = {}
+    for domain in domains:
+        node = trie
+        for label in reversed(domain.split('.')):
+            node = node.setdefault(label, {})
+        node[_TRIE_END] = True
+    return trie
+
+
+_TRIE_END = object()
+PLATFORM_DOMAINS = ('localhost', 'onrender.com', 'vercel.app', 'railway.app')
+RESERVED_SUBDOMAINS = frozenset(['www', 'api', 'admin', 'localhost'])
+PLATFORM_TRIE = _build_platform_trie(PLATFORM_DOMAINS)
+
+
+def match_platform_host(host):
+    """
+    Return (is_platform, subdomain_labels) for a host.
+    ``acme.onrender.com`` -> (True, ['acme']); ``shop.cl`` -> (False, None).
+    """
+    labels = host.split('.')
+    node = PLATFORM_TRIE
+    for depth, label in enumerate(reversed(labels), start=1):
+        node = node.get(label)
+        if node is None:
+            return False, None
+        if _TRIE_END in node:
+            return True, labels[:len(labels) - depth]
+    return False, None
+
+
+class TenantRoutingIndex:
+    """
+    Precompiled host/slug/custom-domain routing table for all active tenants.
+
+    Built from one query per worker (or one Redis read) and rebuilt when the
+    tenant_resolution version changes, so resolving a host is a handful of
+    dict lookups with no database access.
+    """
+
+    def __init__(self, descriptors, version=None):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.by_slug = {}
+        self.by_domain = {}             # custom_domain as stored (lowercased)
+        self.by_normalised_domain = {}  # custom_domain without "www."
+
+        fields = get_descriptor_fields()
+        slug_idx = fields.index('slug')
+        domain_idx = fields.index('custom_domain')
+        for descriptor in descriptors:
+            self.by_slug[descriptor.values[slug_idx]] = descriptor
+            custom_domain = descriptor.values[domain_idx]
+            if custom_domain:
+                self.by_domain.setdefault(custom_domain.strip().lower(), descriptor)
+                self.by_normalised_domain.setdefault(_normalise_domain(custom_domain), descriptor)
+
+    def resolve(self, identifier=None, host=None):
+        """Mirrors the historical middleware priority rules."""
+        # Case A: Identifier provided (Header or Param)
+        if identifier:
+            return self.by_slug.get(identifier) or self.by_domain.get(identifier.lower())
+
+        host = host or ''
+        clean_host = _normalise_domain(host)
+
+        # Case B1: Custom Domain (exact, then www-normalised)
+        descriptor = (
+            self.by_domain.get(host)
+            or self.by_domain.get(clean_host)
+            or self.by_normalised_domain.get(clean_host)
+        )
+        if descriptor:
+            return descriptor
+
+        # Case B2: Platform Subdomain (slug.onrender.com)
+        is_platform, subdomain_labels = match_platform_host(host)
+        if is_platform:
+            if subdomain_labels and subdomain_labels[0] not in RESERVED_SUBDOMAINS:
+                return self.by_slug.get(subdomain_labels[0])
+            return None
+
+        # Case B3: SaaS Fallback (host is slug)
+        return self.by_slug.get(clean_host)
+
+
+_routing_index = None
+_routing_index_lock = threading.Lock()
+
+
+def _load_index_descriptors(version):
+    """All active tenant descriptors, shared between workers through Redis."""
+    fields = get_descriptor_fields()
+    rows_key = f"tenant_routing_rows:v{version}"
+    cached = cache.get(rows_key)
+    if cached and cached.get('fields') == fields:
+        return [TenantDescriptor(fields, values) for values in cached['rows']]
+
+    rows = [tuple(row) for row in _active_tenants().values_list(*fields)]
+    cache.set(rows_key, {'fields': fields, 'rows': rows}, timeout=REDIS_TTL)
+    return [TenantDescriptor(fields, values) for values in rows]
+
+
+def get_routing_index():
+    """Return this worker's routing index, rebuilding it if the version changed."""
+    global _routing_index
+    version = local_cache.version
+
+    def is_fresh(index):
+        return (
+            index is not None
+            and index.version == version
+            and time.monotonic() - index.built_at < REDIS_TTL
+        )
+
+    index = _routing_index
+    if is_fresh(index):
+        return index
+
+    with _routing_index_lock:
+        index = _routing_index
+        if not is_fresh(index):
+            index = TenantRoutingIndex(_load_index_descriptors(version), version=version)
+            _routing_index = index
+    return index
+
+
+def resolve_descriptor(identifier=None, host=None):
+    """
+    Resolve a TenantDescriptor (or None) through the local LRU and the routing index.
+    """
+    local_key = ('id', identifier) if identifier else ('host', host or '')
+
+    cached = local_cache.get(local_key)
+    if cached is not None:
+        return None if cached == NOT_FOUND else cached
+
+    descriptor = get_routing_index().resolve(identifier, host)
+    if descriptor:
+        local_cache.set(local_key, descriptor, LOCAL_TTL)
+    else:
+        local_cache.set(local_key, NOT_FOUND, LOCAL_NEGATIVE_TTL)
+    return descriptor
+
+
+def resolve_tenant(identifier=None, host=None):
+    """Resolve a Tenant instance (sensitive fields deferred) or None."""
+    descriptor = resolve_descriptor(identifier, host)
+    return descriptor.to_tenant() if descriptor else None
+
+
+def resolve_tenant_for_request(request):
+    identifier, host = get_request_identifiers(request)
+    return resolve_tenant(identifier, host)
+
+
+def invalidate_tenant_resolution():
+    """
+    Invalidate every cached resolution across all workers.
+    Called from the Tenant post_save signal.
+    """
+    global _routing_index
+    bump_cache_version(VERSION_SCOPE, VERSION_SCOPE_ID)
+    local_cache.clear()
+    _routing_index = None
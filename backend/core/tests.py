@@ -0,0 +1,527 @@
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import QueryDict
+from django.test import SimpleTestCase, override_settings
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.cache_keys import MAX_PARAMS_LENGTH, number
+from core.cache_registry import (
+    ADMIN_ORDER_STATS, ADMIN_TENANT_SETTINGS, STOREFRONT_CATEGORIES, STOREFRONT_PRODUCT, TENANT_LOOKUP,
+    invalidate, invalidate_all,
+)
+from core.cache_utils import (
+    PRODUCT, TENANT, bump_cache_version, cache_tags, category_tag, get_cache_version, get_cache_versions,
+    get_or_refresh, get_versioned, invalidate_tags, product_tag, tenant_tag, version_memo,
+)
+from core.pagination import KeysetPagination
+from core.singleflight import coalesced, single_flight
+from core.tenant_resolver import (
+    LocalTenantCache, TenantDescriptor, TenantRoutingIndex, get_descriptor_fields, match_platform_host,
+)
+from products.models import Product
+from products.views import PRODUCT_LIST_KEY
+
+
+def descriptor(slug, custom_domain=None):
+    fields = get_descriptor_fields()
+    values = [None] * len(fields)
+    values[fields.index('id')] = f"id-{slug}"
+    values[fields.index('slug')] = slug
+    values[fields.index('custom_domain')] = custom_domain
+    return TenantDescriptor(fields, tuple(values))
+
+
+class MatchPlatformHostTests(SimpleTestCase):
+    def test_platform_subdomain(self):
+        self.assertEqual(match_platform_host('acme.onrender.com'), (True, ['acme']))
+        self.assertEqual(match_platform_host('acme.localhost'), (True, ['acme']))
+
+    def test_bare_platform_domain(self):
+        self.assertEqual(match_platform_host('onrender.com'), (True, []))
+        self.assertEqual(match_platform_host('localhost'), (True, []))
+
+    def test_other_hosts(self):
+        self.assertEqual(match_platform_host('shop.cl'), (False, None))
+        # Matched on whole labels, not as a substring of the host
+        self.assertEqual(match_platform_host('evil-onrender.com'), (False, None))
+
+
+class TenantRoutingIndexTests(SimpleTestCase):
+    """The priority rules of the original TenantMiddleware."""
+
+    def setUp(self):
+        self.acme = descriptor('acme', 'www.acme.cl')
+        self.shop = descriptor('shop', 'beta.vercel.app')
+        self.beta = descriptor('beta')
+        self.index = TenantRoutingIndex([self.acme, self.shop, self.beta])
+
+    def test_identifier_matches_slug_or_custom_domain(self):
+        self.assertIs(self.index.resolve('acme'), self.acme)
+        self.assertIs(self.index.resolve('WWW.ACME.CL'), self.acme)
+        self.assertIsNone(self.index.resolve('missing'))
+
+    def test_identifier_wins_over_host(self):
+        self.assertIs(self.index.resolve('beta', 'www.acme.cl'), self.beta)
+        self.assertIsNone(self.index.resolve('missing', 'www.acme.cl'))
+
+    def test_custom_domain_with_or_without_www(self):
+        self.assertIs(self.index.resolve(host='www.acme.cl'), self.acme)
+        self.assertIs(self.index.resolve(host='acme.cl'), self.acme)
+
+    def test_custom_domain_before_platform_subdomain(self):
+        self.assertIs(self.index.resolve(host='beta.vercel.app'), self.shop)
+
+    def test_platform_subdomain(self):
+        self.assertIs(self.index.resolve(host='beta.onrender.com'), self.beta)
+        self.assertIsNone(self.index.resolve(host='missing.onrender.com'))
+
+    def test_reserved_platform_subdomains(self):
+        for host in ('www.onrender.com', 'api.onrender.com', 'admin.vercel.app', 'localhost'):
+            self.assertIsNone(self.index.resolve(host=host), host)
+
+    def test_host_as_slug_fallback(self):
+        self.assertIs(self.index.resolve(host='beta'), self.beta)
+        self.assertIs(self.index.resolve(host='www.beta'), self.beta)
+        self.assertIsNone(self.index.resolve(host='unknown.cl'))
+
+
+class LocalTenantCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.local = LocalTenantCache()
+        self.local.set('acme', 'tenant', 60)
+
+    def test_version_change_clears_entries(self):
+        with mock.patch('core.tenant_resolver.get_cache_version', side_effect=[1, 2]):
+            self.local._sync_version()
+            self.local.set('acme', 'tenant', 60)
+            self.assertEqual(self.local.get('acme'), 'tenant')
+            self.local._version_checked_at = 0.0
+            self.assertIsNone(self.local.get('acme'))
+
+    def test_redis_outage_is_retried_once_per_interval(self):
+        with mock.patch('core.tenant_resolver.get_cache_version', side_effect=ConnectionError('redis down')) as version:
+            for _ in range(3):
+                self.assertEqual(self.local.get('acme'), 'tenant')
+        self.assertEqual(version.call_count, 1)
+
+
+def api_request(**params):
+    return Request(APIRequestFactory().get('/api/items/', params))
+
+
+class KeysetPaginationTests(SimpleTestCase):
+    def setUp(self):
+        self.paginator = KeysetPagination()
+        self.row = SimpleNamespace(
+            created_at=datetime(2024, 5, 1, 12, 30, tzinfo=dt_timezone.utc),
+            pk='0b9e4a52-6c7d-4c1e-9d1a-3f0f6a1c2b3d',
+        )
+
+    def test_cursor_round_trip(self):
+        for reverse in (False, True):
+            cursor = self.paginator.encode_cursor(self.row, reverse)
+            decoded = self.paginator.decode_cursor(api_request(cursor=cursor))
+            self.assertEqual(decoded, (self.row.created_at, self.row.pk, reverse))
+
+    def test_no_cursor(self):
+        self.assertIsNone(self.paginator.decode_cursor(api_request()))
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(NotFound):
+            self.paginator.decode_cursor(api_request(cursor='not-a-cursor'))
+
+    def test_page_size_is_capped(self):
+        self.assertEqual(self.paginator.get_page_size(api_request(page_size='500')), 200)
+        self.assertEqual(self.paginator.get_page_size(api_request(page_size='0')), 1)
+        self.assertEqual(self.paginator.get_page_size(api_request(page_size='x')), 50)
+
+    def test_explicit_page_uses_page_numbers(self):
+        self.paginator.page_size = 2
+        request = api_request(page='2')
+        rows = self.paginator.paginate_queryset(list(range(5)), request)
+
+        self.assertEqual(list(rows), [2, 3])
+        self.assertIsNotNone(self.paginator.legacy_paginator)
+        data = self.paginator.get_paginated_data(rows)
+        self.assertEqual(data['count'], 5)
+        self.assertIn('page=3', data['next'])
+
+    def test_keyset_only_for_newest_first(self):
+        self.assertTrue(self.paginator.is_keyset_ordering(Product.objects.order_by('-created_at')))
+        self.assertFalse(self.paginator.is_keyset_ordering(Product.objects.order_by('name')))
+
+
+def canonical(query):
+    return PRODUCT_LIST_KEY.canonical(QueryDict(query))
+
+
+class QueryKeyTests(SimpleTestCase):
+    def test_tracking_and_unknown_params_dropped(self):
+        self.assertEqual(canonical('utm_source=fb&fbclid=1&gclid=2&tenant=acme&foo=bar'), '')
+        self.assertEqual(canonical('category=sillas&utm_campaign=x'), 'category=sillas')
+
+    def test_order_does_not_matter(self):
+        self.assertEqual(canonical('featured=true&category=sillas'), canonical('category=sillas&featured=true'))
+
+    def test_numbers(self):
+        self.assertEqual(canonical('min_price=10.0'), 'min_price=10')
+        self.assertEqual(canonical('min_price=010'), 'min_price=10')
+        self.assertEqual(canonical('min_price=9.50'), 'min_price=9.5')
+        self.assertEqual(number('1e400'), '1e400')
+        self.assertEqual(canonical('min_price=abc'), 'min_price=abc')
+
+    def test_values_the_view_ignores_are_dropped(self):
+        self.assertEqual(canonical('featured=yes&in_stock=&min_price='), '')
+        self.assertEqual(canonical('ordering=-name&total=maybe'), '')
+        self.assertEqual(canonical('ordering=-price&total=exact'), 'ordering=-price&total=exact')
+
+    def test_case_sensitive_values_kept_verbatim(self):
+        self.assertEqual(canonical('category=Sillas'), 'category=Sillas')
+        self.assertEqual(canonical('featured=True'), '')
+
+    def test_search_reduced_to_terms(self):
+        self.assertEqual(canonical('search=Silla%20%20ROBLE!'), canonical('search=silla+roble'))
+
+    def test_uuid(self):
+        self.assertEqual(
+            canonical('exclude=0B9E4A526C7D4C1E9D1A3F0F6A1C2B3D'),
+            'exclude=0b9e4a52-6c7d-4c1e-9d1a-3f0f6a1c2b3d',
+        )
+        self.assertEqual(canonical('exclude=zz'), 'exclude=zz')
+
+    def test_long_keys_hashed(self):
+        key = canonical('cursor=' + 'x' * MAX_PARAMS_LENGTH)
+        self.assertEqual(len(key), 40)
+        self.assertNotEqual(key, canonical('cursor=' + 'y' * MAX_PARAMS_LENGTH))
+
+    def test_clean_url_keeps_key_and_tenant_params(self):
+        self.assertEqual(
+            PRODUCT_LIST_KEY.clean_url('https://shop.cl/api/products/?cursor=abc&utm_source=fb&tenant=acme'),
+            'https://shop.cl/api/products/?cursor=abc&tenant=acme',
+        )
+        self.assertIsNone(PRODUCT_LIST_KEY.clean_url(None))
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'singleflight-tests',
+}})
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def lead_in_background(self, compute):
+        """Start a leader computing ``compute`` and wait until it holds the lock."""
+        results = []
+        leader = threading.Thread(target=lambda: results.append(single_flight('page', compute)))
+        leader.start()
+        while cache.get('page:flight') is None:
+            time.sleep(0.005)
+        return leader, results
+
+    def test_leader_computes_and_releases_the_lock(self):
+        self.assertEqual(single_flight('page', lambda: 'value'), 'value')
+        self.assertIsNone(cache.get('page:flight'))
+
+    def test_waiter_gets_the_leader_result(self):
+        def slow():
+            time.sleep(0.2)
+            return 'leader'
+        leader, results = self.lead_in_background(slow)
+        compute = mock.Mock(return_value='waiter')
+
+        self.assertEqual(single_flight('page', compute), 'leader')
+        compute.assert_not_called()
+        leader.join()
+        self.assertEqual(results, ['leader'])
+
+    def test_none_result_is_shared(self):
+        def slow():
+            time.sleep(0.2)
+        leader, _ = self.lead_in_background(slow)
+        compute = mock.Mock()
+
+        self.assertIsNone(single_flight('page', compute))
+        compute.assert_not_called()
+        leader.join()
+
+    def test_waiter_computes_when_the_leader_fails(self):
+        def failing():
+            time.sleep(0.2)
+            raise RuntimeError('database down')
+        leader = threading.Thread(target=lambda: self.assertRaises(RuntimeError, single_flight, 'page', failing))
+        leader.start()
+        while cache.get('page:flight') is None:
+            time.sleep(0.005)
+
+        self.assertEqual(single_flight('page', lambda: 'waiter'), 'waiter')
+        leader.join()
+        self.assertIsNone(cache.get('page:flight'))
+
+    def test_waiter_stops_waiting_after_wait(self):
+        cache.add('page:flight', 'stuck-leader', 30)
+        started = time.monotonic()
+        self.assertEqual(single_flight('page', lambda: 'waiter', wait=0.1), 'waiter')
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_cache_unavailable_computes(self):
+        with mock.patch.object(cache, 'add', side_effect=ConnectionError('redis down')), \
+                self.assertLogs('core.singleflight', 'WARNING'):
+            self.assertEqual(single_flight('page', lambda: 'value'), 'value')
+
+    def test_coalesced_keys_calls_by_arguments(self):
+        calls = []
+
+        @coalesced(lambda tenant_id: f"export_{tenant_id}")
+        def export(tenant_id):
+            """Build an export."""
+            calls.append(tenant_id)
+            time.sleep(0.2)
+            return f"export of {tenant_id}"
+
+        results = {}
+        threads = [
+            threading.Thread(target=lambda i=i, t=t: results.__setitem__(i, export(t)))
+            for i, t in enumerate(['acme', 'acme', 'beta'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {0: 'export of acme', 1: 'export of acme', 2: 'export of beta'})
+        self.assertEqual(sorted(calls), ['acme', 'beta'])
+        self.assertEqual(export.__doc__, 'Build an export.')
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'swr-tests',
+}})
+class StaleWhileRevalidateTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_fresh_value_is_served_from_cache(self):
+        self.assertEqual(get_or_refresh('page', lambda: 'first', 60), 'first')
+        compute = mock.Mock(return_value='second')
+
+        self.assertEqual(get_or_refresh('page', compute, 60), 'first')
+        compute.assert_not_called()
+
+    def test_none_is_not_cached(self):
+        self.assertIsNone(get_or_refresh('page', lambda: None, 60))
+        self.assertEqual(get_or_refresh('page', lambda: 'value', 60), 'value')
+
+    def test_version_bump_marks_the_value_stale(self):
+        get_or_refresh('page', lambda: 'first', 60, version_scope=('page', 'acme'))
+        bump_cache_version('page', 'acme')
+
+        self.assertEqual(get_or_refresh('page', lambda: 'second', 60, version_scope=('page', 'acme')), 'second')
+        self.assertIsNone(cache.get('page:refreshing'))
+
+    def test_stale_value_served_while_one_caller_refreshes(self):
+        get_or_refresh('page', lambda: 'old', 0)
+        started, finish = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            finish.wait(5)
+            return 'new'
+        results = []
+        refresher = threading.Thread(target=lambda: results.append(get_or_refresh('page', slow, 60)))
+        refresher.start()
+        started.wait(5)
+
+        compute = mock.Mock(return_value='other')
+        self.assertEqual(get_or_refresh('page', compute, 60), 'old')
+        compute.assert_not_called()
+
+        finish.set()
+        refresher.join()
+        self.assertEqual(results, ['new'])
+        self.assertEqual(get_or_refresh('page', compute, 60), 'new')
+        compute.assert_not_called()
+
+    def test_failed_refresh_serves_the_stale_value(self):
+        get_or_refresh('page', lambda: 'old', 0)
+        with self.assertLogs('core.cache_utils', 'ERROR'):
+            self.assertEqual(get_or_refresh('page', mock.Mock(side_effect=RuntimeError('database down')), 60), 'old')
+        self.assertIsNone(cache.get('page:refreshing'))
+
+    def test_cache_unavailable_computes(self):
+        with mock.patch.object(cache, 'get_many', side_effect=ConnectionError('redis down')), \
+                self.assertLogs('core.cache_utils', 'WARNING'):
+            self.assertEqual(get_or_refresh('page', lambda: 'value', 60), 'value')
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'cache-tag-tests',
+}})
+class CacheTagTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def tagged(self, value, *tags):
+        def compute():
+            cache_tags(*tags)
+            return value
+        return compute
+
+    def test_invalidation_marks_only_tagged_entries(self):
+        get_or_refresh('chair', self.tagged('chair', product_tag(1)), 60)
+        get_or_refresh('table', self.tagged('table', product_tag(2)), 60)
+
+        invalidate_tags([product_tag(1)])
+
+        self.assertEqual(get_or_refresh('chair', self.tagged('new chair', product_tag(1)), 60), 'new chair')
+        self.assertEqual(get_or_refresh('table', self.tagged('new table', product_tag(2)), 60), 'table')
+
+    def test_tags_of_nested_values_are_passed_up(self):
+        def page():
+            common = get_or_refresh('common', self.tagged('common', tenant_tag('acme')), 60)
+            return f"page with {common}"
+        get_or_refresh('page', page, 60)
+
+        invalidate_tags([tenant_tag('acme')])
+
+        self.assertEqual(get_or_refresh('page', lambda: 'new page', 60), 'new page')
+
+    def test_recomputed_entries_are_tagged_again(self):
+        get_or_refresh('chair', self.tagged('chair', product_tag(1)), 60)
+        invalidate_tags([product_tag(1)])
+        get_or_refresh('chair', self.tagged('new chair', product_tag(1)), 60)
+
+        invalidate_tags([product_tag(1)])
+
+        self.assertEqual(get_or_refresh('chair', self.tagged('newer chair', product_tag(1)), 60), 'newer chair')
+
+    def test_unknown_tags(self):
+        get_or_refresh('chair', self.tagged('chair', product_tag(1)), 60)
+        invalidate_tags([product_tag(3)])
+        invalidate_tags([])
+
+        self.assertEqual(get_or_refresh('chair', self.tagged('new chair', product_tag(1)), 60), 'chair')
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'cache-registry-tests',
+}})
+class CacheRegistryTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def cached(self, entry, value, tenant_id=None, **params):
+        return entry.get_or_set(lambda: value, tenant_id, **params)
+
+    def test_needs_bump(self):
+        # Tagged kinds only need a bump when no id says which payloads changed
+        self.assertFalse(STOREFRONT_PRODUCT.needs_bump(product_tag(1)))
+        self.assertTrue(STOREFRONT_PRODUCT.needs_bump(PRODUCT))
+        self.assertTrue(STOREFRONT_CATEGORIES.needs_bump(category_tag(1)))
+        self.assertFalse(STOREFRONT_CATEGORIES.needs_bump(product_tag(1)))
+
+    def test_per_tenant_entries_invalidated_for_one_tenant(self):
+        self.cached(ADMIN_TENANT_SETTINGS, 'acme settings', 'acme')
+        self.cached(ADMIN_TENANT_SETTINGS, 'beta settings', 'beta')
+
+        invalidate('acme', TENANT)
+
+        self.assertEqual(self.cached(ADMIN_TENANT_SETTINGS, 'new acme settings', 'acme'), 'new acme settings')
+        self.assertEqual(self.cached(ADMIN_TENANT_SETTINGS, 'new beta settings', 'beta'), 'beta settings')
+
+    def test_global_entries_invalidated_by_any_tenant(self):
+        self.cached(TENANT_LOOKUP, 'acme', lookup='acme')
+        self.cached(TENANT_LOOKUP, 'beta', lookup='beta')
+
+        invalidate('acme', TENANT)
+
+        self.assertEqual(self.cached(TENANT_LOOKUP, 'new acme', lookup='acme'), 'new acme')
+        self.assertEqual(self.cached(TENANT_LOOKUP, 'new beta', lookup='beta'), 'new beta')
+
+    def test_entries_not_depending_on_the_kind_are_kept(self):
+        self.cached(STOREFRONT_CATEGORIES, 'menu', 'acme')
+        self.cached(ADMIN_TENANT_SETTINGS, 'settings', 'acme')
+
+        invalidate('acme', PRODUCT)
+
+        self.assertEqual(self.cached(STOREFRONT_CATEGORIES, 'new menu', 'acme'), 'menu')
+        self.assertEqual(self.cached(ADMIN_TENANT_SETTINGS, 'new settings', 'acme'), 'settings')
+
+    def test_invalidate_all(self):
+        self.cached(ADMIN_ORDER_STATS, 'stats', 'acme')
+        self.cached(STOREFRONT_CATEGORIES, 'menu', 'acme')
+
+        invalidate_all('acme')
+
+        self.assertEqual(self.cached(ADMIN_ORDER_STATS, 'new stats', 'acme'), 'new stats')
+        self.assertEqual(self.cached(STOREFRONT_CATEGORIES, 'new menu', 'acme'), 'new menu')
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'cache-version-tests',
+}})
+class CacheVersionTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        # The registered script is kept per process
+        patcher = mock.patch('core.cache_utils._versioned_get_script', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def redis(self, script):
+        client = mock.Mock()
+        client.register_script.return_value = script
+        return mock.patch('core.cache_utils._redis_client', return_value=client)
+
+    def test_versions_read_with_one_get_many(self):
+        get_cache_version('product', 'acme')
+        bump_cache_version('product', 'acme')
+        with mock.patch.object(cache, 'get_many', wraps=cache.get_many) as get_many:
+            versions = get_cache_versions(('product', 'acme'), ('category', 'acme'), ('product', 'beta'))
+
+        self.assertEqual(versions, {('product', 'acme'): 2, ('category', 'acme'): 1, ('product', 'beta'): 1})
+        self.assertEqual(get_many.call_count, 1)
+
+    def test_versions_remembered_within_a_request(self):
+        with version_memo(), mock.patch.object(cache, 'get_many', wraps=cache.get_many) as get_many:
+            self.assertEqual(get_cache_version('product', 'acme'), 1)
+            self.assertEqual(get_cache_version('product', 'acme'), 1)
+            self.assertEqual(get_many.call_count, 1)
+
+            bump_cache_version('product', 'acme')
+            self.assertEqual(get_cache_version('product', 'acme'), 2)
+
+    def test_versioned_get_without_redis(self):
+        cache.set('page:v1', 'value')
+        self.assertEqual(get_versioned('page', 'product', 'acme'), ('page:v1', 'value'))
+        self.assertEqual(get_versioned('missing', 'product', 'acme'), ('missing:v1', None))
+
+    def test_versioned_get_uses_the_script(self):
+        script = mock.Mock(return_value=[b'3', None])
+        with self.redis(script), version_memo():
+            self.assertEqual(get_versioned('page', 'product', 'acme'), ('page:v3', None))
+            # The version is then known for the rest of the request
+            self.assertEqual(get_versioned('page', 'product', 'acme'), ('page:v3', None))
+        self.assertEqual(script.call_count, 1)
+
+    def test_versioned_get_falls_back_when_the_script_fails(self):
+        cache.set('page:v1', 'value')
+        script = mock.Mock(side_effect=ConnectionError('redis down'))
+        with self.redis(script), self.assertLogs('core.cache_utils', 'WARNING'):
+            self.assertEqual(get_versioned('page', 'product', 'acme'), ('page:v1', 'value'))
+
+    def test_registry_computes_when_the_cache_is_unavailable(self):
+        with mock.patch.object(cache, 'get_many', side_effect=ConnectionError('redis down')), \
+                self.assertLogs('core.cache_registry', 'WARNING'):
+            self.assertEqual(ADMIN_ORDER_STATS.get_or_set(lambda: 'stats', 'acme'), 'stats')
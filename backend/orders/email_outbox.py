@@ -0,0 +1,288 @@
+"""
+Transactional email outbox.
+
+Request code never talks to the email provider. ``enqueue_email`` inserts an
+EmailOutbox row in the caller's transaction (so an email exists if and only if
+the order change committed) and the ``process_email_outbox`` worker sends it
+later from a bounded thread pool.
+
+Each row has an idempotency key, by default ``<order id>:<template>``; enqueuing
+the same key twice is a no-op, so the payment webhook, the return URL and
+manual verification can all report the same payment without duplicate emails.
+
+Delivery is at-least-once: a row is claimed with a lease (status Sending,
+next_attempt_at = lease expiry). Failures are retried with exponential backoff
+until ``max_attempts``; a worker that dies mid-send lets the lease expire and
+another worker picks the row up again.
+
+A claimed batch is grouped by (tenant, template): each group is rendered with
+one items query and sent with the provider's batch endpoint, up to
+``BATCH_LIMIT`` emails per request, so marking hundreds of orders shipped
+costs a handful of HTTP calls. Emails with attachments (the quote PDF) are
+sent one by one. Sends are throttled per tenant by ``TenantRateLimiter`` so
+one store's campaign cannot use up the provider quota of every other store.
+"""
+import logging
+import random
+from datetime import timedelta
+
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from . import email_service
+from .email_backends import BATCH_LIMIT, get_backend
+from .email_templates import prepare_batch, render_email
+from .models import EmailOutbox, EmailOutboxStatus
+
+logger = logging.getLogger(__name__)
+
+
+# Outbox template -> email_service function taking the order
+EMAIL_SENDERS = {
+    'order_confirmation': 'send_order_confirmation_email',
+    'new_order_notification': 'send_new_order_notification',
+    'order_status_update': 'send_order_status_update_email',
+    'quote_request_notification': 'send_quote_request_notification',
+    'quote_received_confirmation': 'send_quote_received_confirmation_to_customer',
+}
+
+LEASE_SECONDS = 300
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+DEFAULT_MAX_ATTEMPTS = 6
+
+CLAIM_SQL = """
+UPDATE email_outbox
+SET status = 'Sending', attempts = attempts + 1, next_attempt_at = %(lease_until)s, updated_at = %(now)s
+WHERE id IN (
+    SELECT id FROM email_outbox
+    WHERE status IN ('Pending', 'Sending') AND next_attempt_at <= %(now)s
+    ORDER BY next_attempt_at
+    LIMIT %(limit)s
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING id
+"""
+
+
+class EmailDeliveryError(Exception):
+    pass
+
+
+# Statuses announced to the customer with order_status_update
+NOTIFY_STATUSES = ('QuoteSent', 'Processing', 'Shipped', 'Delivered', 'Cancelled', 'Refunded')
+
+
+def enqueue_email(order, template, key=None, context=None):
+    """
+    Queue ``template`` for an order. Safe to call more than once per event:
+    rows with an existing idempotency key are ignored.
+    """
+    enqueue_emails([(order, template, key, context)])
+
+
+def enqueue_emails(emails):
+    """Queue many (order, template, key, context) emails with a single INSERT."""
+    now = timezone.now()
+    rows = []
+    for order, template, key, context in emails:
+        if template not in EMAIL_SENDERS:
+            raise ValueError(f"Unknown email template: {template}")
+        rows.append(EmailOutbox(
+            tenant_id=order.tenant_id,
+            order=order,
+            template=template,
+            idempotency_key=key or f"{order.pk}:{template}",
+            context=context or {},
+            next_attempt_at=now,
+        ))
+    if rows:
+        EmailOutbox.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def quote_sent_email(order):
+    """
+    The quote response email (with the quote PDF) for the version of the quote
+    just saved, keyed by ``updated_at`` so each (re)sent quote is queued once.
+    """
+    key = f"{order.pk}:order_status_update:QuoteSent:{order.updated_at.isoformat()}"
+    return (order, 'order_status_update', key, {'status': 'QuoteSent'})
+
+
+def transition_emails(order, previous_status, created=False):
+    """
+    Emails an order status change sends, as (order, template, key, context)
+    entries for enqueue_emails. Shared by the Order post_save signal and the
+    bulk transitions in orders/state_machine.py, which bypass signals.
+    """
+    current_status = order.status
+    # Every (re)sent quote gets its own email, even if it was QuoteSent before
+    if current_status == 'QuoteSent':
+        return [quote_sent_email(order)]
+
+    # Avoid duplicate emails if status hasn't changed
+    if not created and current_status == previous_status:
+        return []
+
+    # New sale: the confirmation emails are enough for this transition
+    if current_status == 'Paid' and (created or previous_status != 'Paid'):
+        return [
+            (order, 'order_confirmation', None, None),
+            (order, 'new_order_notification', None, None),
+        ]
+
+    if current_status in NOTIFY_STATUSES:
+        key = f"{order.pk}:order_status_update:{current_status}"
+        return [(order, 'order_status_update', key, {'status': current_status})]
+    return []
+
+
+def backoff_delay(attempts):
+    """Exponential backoff with jitter: 30s, 60s, 2m, 4m ... capped at 1h."""
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** max(attempts - 1, 0), BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(1.0, 1.2))
+
+
+def claim_batch(limit):
+    """Lease up to ``limit`` due emails; returns their ids."""
+    now = timezone.now()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(CLAIM_SQL, {
+            'now': now,
+            'lease_until': now + timedelta(seconds=LEASE_SECONDS),
+            'limit': limit,
+        })
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _mark_sent(emails, message_ids):
+    now = timezone.now()
+    for email, message_id in zip(emails, message_ids):
+        email.status = EmailOutboxStatus.SENT
+        email.sent_at = now
+        email.provider_message_id = message_id
+        email.last_error = None
+        email.updated_at = now
+    EmailOutbox.objects.bulk_update(
+        emails, ['status', 'sent_at', 'provider_message_id', 'last_error', 'updated_at']
+    )
+
+
+def _mark_failed(email, error, max_attempts, retry=True):
+    failed = not retry or email.attempts >= max_attempts
+    EmailOutbox.objects.filter(pk=email.pk, status=EmailOutboxStatus.SENDING).update(
+        status=EmailOutboxStatus.FAILED if failed else EmailOutboxStatus.PENDING,
+        next_attempt_at=timezone.now() + backoff_delay(email.attempts),
+        last_error=str(error)[:2000],
+        updated_at=timezone.now(),
+    )
+    logger.warning(
+        f"Email {email.template} for order {email.order_id} failed "
+        f"(attempt {email.attempts}/{max_attempts}): {error}"
+    )
+
+
+def _prepare(email):
+    """The email's order, showing the status the email was queued for."""
+    order = email.order
+    if order is None:
+        raise EmailDeliveryError('Order no longer exists')
+    if email.context.get('status'):
+        # Announce the status the email was queued for, not the current one
+        order.status = email.context['status']
+    return order
+
+
+def is_batchable(email):
+    # Resend batch requests cannot carry attachments (QuoteSent sends the quote PDF)
+    return email.order_id is not None and email.context.get('status') != 'QuoteSent'
+
+
+def deliver(email, max_attempts=DEFAULT_MAX_ATTEMPTS, limiter=None):
+    """Send one claimed email and record the outcome. Runs in a worker thread."""
+    try:
+        try:
+            order = _prepare(email)
+            if limiter:
+                limiter.acquire(email.tenant_id)
+            sender = getattr(email_service, EMAIL_SENDERS[email.template])
+            message_id = sender(order)
+            if not message_id:
+                # email_service logs the provider error and returns None
+                raise EmailDeliveryError('Email provider returned no response (see logs)')
+        except Exception as e:
+            _mark_failed(email, e, max_attempts)
+            return 0
+        _mark_sent([email], [message_id])
+        return 1
+    finally:
+        close_old_connections()
+
+
+def deliver_batch(emails, max_attempts=DEFAULT_MAX_ATTEMPTS, limiter=None):
+    """
+    Send emails of one tenant and template with a single batch request.
+    Returns the number sent. Runs in a worker thread.
+    """
+    try:
+        template = emails[0].template
+        rendered, params_list = [], []
+        for email, order in zip(emails, prepare_batch(template, [_prepare(email) for email in emails])):
+            try:
+                params = render_email(template, order)
+            except Exception as e:
+                _mark_failed(email, e, max_attempts)
+                continue
+            if params is None:
+                _mark_failed(email, f'No {template} email for status {order.status}', max_attempts, retry=False)
+                continue
+            rendered.append(email)
+            params_list.append(params)
+
+        if not rendered:
+            return 0
+        try:
+            if limiter:
+                limiter.acquire(emails[0].tenant_id, len(rendered))
+            message_ids = get_backend().send_batch(params_list)
+            if len(message_ids) != len(rendered):
+                raise EmailDeliveryError(
+                    f'Email provider accepted {len(message_ids)} of {len(rendered)} batched emails'
+                )
+        except Exception as e:
+            for email in rendered:
+                _mark_failed(email, e, max_attempts)
+            return 0
+        _mark_sent(rendered, message_ids)
+        return len(rendered)
+    finally:
+        close_old_connections()
+
+
+def group_for_delivery(emails):
+    """Split claimed emails into batches of one tenant and template, and single sends."""
+    groups, singles = {}, []
+    for email in emails:
+        if is_batchable(email):
+            groups.setdefault((email.tenant_id, email.template), []).append(email)
+        else:
+            singles.append(email)
+    batches = [
+        group[i:i + BATCH_LIMIT]
+        for group in groups.values()
+        for i in range(0, len(group), BATCH_LIMIT)
+    ]
+    return batches, singles
+
+
+def process_batch(executor, batch_size, max_attempts=DEFAULT_MAX_ATTEMPTS, limiter=None):
+    """Claim one batch and send it on the executor. Returns (claimed, sent)."""
+    ids = claim_batch(batch_size)
+    if not ids:
+        return 0, 0
+    emails = list(EmailOutbox.objects.filter(pk__in=ids).select_related('order__tenant'))
+    batches, singles = group_for_delivery(emails)
+    futures = [executor.submit(deliver_batch, group, max_attempts, limiter) for group in batches]
+    futures += [executor.submit(deliver, email, max_attempts, limiter) for email in singles]
+    sent = sum(future.result() for future in futures)
+    return len(ids), sent
@@ -0,0 +1,214 @@
+"""
+Transactional email rendering.
+
+Every email is a Django template in orders/templates/emails/transactional/
+extending a shared base.html layout. Templates are compiled once per process
+(Django's cached loader) so a send only fills in the context.
+
+Per-tenant branding (sender, reply-to, storefront/admin URLs, logo) is derived
+once per tenant and kept in a version-scoped local cache, which is dropped
+whenever a tenant is saved (see core.tenant_resolver).
+
+    render_email(name, order)     -> Resend params dict (None if nothing to send)
+    render_batch(name, orders)    -> [(order, params)], one items query for all orders
+    prepare_batch(name, orders)   -> prefetch what render_email needs for many orders
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+from django.template.loader import get_template
+
+from core.tenant_resolver import LocalTenantCache
+from tenants.models import Tenant
+
+from .templatetags.email_tags import money
+
+
+TEMPLATE_DIR = 'emails/transactional'
+
+EmailBranding = namedtuple('EmailBranding', [
+    'tenant_id', 'name', 'slug', 'logo_url', 'sender', 'reply_to', 'storefront_url', 'admin_url'
+])
+
+BRANDING_FIELDS = ('id', 'name', 'slug', 'logo_url', 'email', 'custom_domain')
+BRANDING_TTL = 300
+
+_branding_cache = LocalTenantCache(maxsize=256)
+
+# Audience: 'customer' emails go to the buyer and reply to the store,
+# 'tenant' emails go to the store and reply to the buyer.
+EmailSpec = namedtuple('EmailSpec', ['subject', 'audience'])
+
+EMAILS = {
+    'quote_request_notification': EmailSpec(" Nueva Solicitud de Cotizacion - {order.order_number}", 'tenant'),
+    'quote_received_confirmation': EmailSpec("Recibimos tu solicitud de cotización - {order.order_number}", 'customer'),
+    'quote_response_notification': EmailSpec("Tu Cotizacion esta Lista - {order.order_number}", 'customer'),
+    'order_confirmation': EmailSpec(" Confirmacion de Pedido - {order.order_number}", 'customer'),
+    'new_order_notification': EmailSpec(" Nueva Venta: {order.order_number} ({total})", 'tenant'),
+    'order_status_update': EmailSpec("{status[title]} - Pedido {order.order_number}", 'customer'),
+}
+
+# Emails that list or count the order lines
+ITEM_EMAILS = frozenset(['quote_request_notification', 'order_confirmation', 'new_order_notification'])
+# The order line columns those templates use
+ITEM_FIELDS = ('product_name', 'variant_name', 'sku', 'quantity', 'total')
+
+# QuoteSent is announced with the quote response email (it carries the PDF)
+STATUS_UPDATES = {
+    'Processing': {
+        'title': 'Tu Pedido está en Preparación',
+        'subtitle': 'Estamos alistando tus productos',
+        'description': 'Nuestro equipo ya está trabajando en preparar tu pedido para que llegue pronto a tus manos.',
+        'color': '#f59e0b',  # Amber
+    },
+    'Shipped': {
+        'title': 'Tu Pedido va en Camino',
+        'subtitle': 'Tu encomienda ha sido despachada',
+        'description': '¡Buenas noticias! Tu pedido ya salió de nuestras bodegas y está en manos del transportista.',
+        'color': '#3b82f6',  # Blue
+    },
+    'Delivered': {
+        'title': 'Pedido Entregado',
+        'subtitle': 'Hemos completado la entrega',
+        'description': 'Tu pedido ha sido entregado exitosamente. ¡Esperamos que disfrutes tu compra!',
+        'color': '#10b981',  # Green
+    },
+    'Cancelled': {
+        'title': 'Pedido Cancelado',
+        'subtitle': 'Información sobre tu pedido',
+        'description': 'Te informamos que tu pedido ha sido cancelado.',
+        'color': '#ef4444',  # Red
+    },
+    'Refunded': {
+        'title': 'Reembolso Procesado',
+        'subtitle': 'Actualización de pago',
+        'description': 'Se ha procesado un reembolso para tu pedido.',
+        'color': '#6b7280',  # Gray
+    },
+}
+
+
+def _base_url(custom_domain):
+    """Storefront URL: the tenant's custom domain, else FRONTEND_URL."""
+    if custom_domain:
+        base_url = custom_domain
+        if not base_url.startswith(('http://', 'https://')):
+            base_url = f"https://{base_url}"
+    else:
+        base_url = settings.FRONTEND_URL
+    return base_url.rstrip('/')
+
+
+def get_branding(tenant_id):
+    """Cached EmailBranding for a tenant id."""
+    branding = _branding_cache.get(tenant_id)
+    if branding is not None:
+        return branding
+
+    row = Tenant.objects.filter(pk=tenant_id).values(*BRANDING_FIELDS).get()
+    storefront_url = _base_url(row['custom_domain'])
+    branding = EmailBranding(
+        tenant_id=row['id'],
+        name=row['name'],
+        slug=row['slug'],
+        logo_url=row['logo_url'],
+        sender=f"{row['name']} <{settings.DEFAULT_FROM_EMAIL}>",
+        reply_to=row['email'] or getattr(settings, 'ADMIN_EMAIL', None) or "admin@empresa.cl",
+        storefront_url=storefront_url,
+        admin_url=f"{storefront_url}/admin/orders",
+    )
+    _branding_cache.set(tenant_id, branding, BRANDING_TTL)
+    return branding
+
+
+_templates = {}
+
+
+def _compiled(name):
+    """Compiled template for an email, resolved through the loaders once per process."""
+    template = _templates.get(name)
+    if template is None:
+        template = _templates[name] = get_template(f"{TEMPLATE_DIR}/{name}.html")
+    return template
+
+
+def format_shipping_address(order):
+    parts = [
+        order.shipping_street_address,
+        f"Depto/Casa: {order.shipping_apartment}" if order.shipping_apartment else None,
+        order.shipping_commune,
+        order.shipping_city,
+        order.shipping_region,
+    ]
+    return ", ".join(part for part in parts if part)
+
+
+def _items(order):
+    """
+    The order lines, lazily: the prefetched instances in a batch, else only
+    ITEM_FIELDS as dicts, so a single send does not build full OrderItems.
+    """
+    if 'items' in getattr(order, '_prefetched_objects_cache', {}):
+        return order.items.all()
+    return order.items.values(*ITEM_FIELDS)
+
+
+def render_email(name, order):
+    """
+    Render one email for an order as Resend params (from, to, reply_to,
+    subject, html). Returns None when the email does not apply, e.g. a
+    status update for a status without a notification.
+    """
+    spec = EMAILS[name]
+    context = {
+        'order': order,
+        'items': _items(order),
+        'branding': get_branding(order.tenant_id),
+        'customer_name': order.shipping_recipient_name or order.customer_email.split('@')[0],
+        'shipping_address': format_shipping_address(order),
+        'total': money(order.total),
+    }
+    if name == 'order_status_update':
+        context['status'] = STATUS_UPDATES.get(order.status)
+        if context['status'] is None:
+            return None
+
+    branding = context['branding']
+    if spec.audience == 'tenant':
+        to, reply_to = branding.reply_to, order.customer_email
+    else:
+        to, reply_to = order.customer_email, branding.reply_to
+        if name == 'order_confirmation' and settings.DEBUG:
+            to = settings.ADMIN_EMAIL
+
+    return {
+        "from": branding.sender,
+        "to": to,
+        "reply_to": reply_to,
+        "subject": spec.subject.format(**context),
+        "html": _compiled(name).render(context),
+    }
+
+
+def prepare_batch(name, orders):
+    """Load the order lines of every order in one query when the email lists them."""
+    orders = list(orders)
+    if name in ITEM_EMAILS:
+        prefetch_related_objects(orders, 'items')
+    return orders
+
+
+def render_batch(name, orders):
+    """
+    Render the same email for many orders. Items are fetched with one query
+    for the whole batch and branding once per tenant. Skipped emails are
+    omitted; returns a list of (order, params).
+    """
+    orders = prepare_batch(name, orders)
+    rendered = []
+    for order in orders:
+        params = render_email(name, order)
+        if params is not None:
+            rendered.append((order, params))
+    return rendered
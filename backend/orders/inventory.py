@@ -0,0 +1,322 @@
+"""
+Inventory service: stock reservation, commit and release.
+
+Every operation is a single conditional UPDATE on product_variants, so
+concurrent checkouts never read-modify-write the same counters and no row is
+locked longer than the statement itself:
+
+    reserve   reserved_quantity += qty, only where stock - reserved >= qty
+    commit    stock_quantity -= qty and reserved_quantity -= qty (payment received);
+              without a reservation only where stock - reserved >= qty
+    release   reserved_quantity -= qty (order cancelled, payment failed, or
+              expired: see release_expired_reservations)
+
+``Order.stock_status`` records which of these already happened. Commit and
+release first move it with a compare-and-set UPDATE on the order row, so a
+payment confirmed twice (webhook + return URL + manual verification) only
+touches stock once.
+
+An order paid without a live reservation (expired or cancelled, paid late)
+may find its units sold again. Those lines are not decremented: commit
+returns them and the caller flags the order for manual fulfilment
+(flag_short_stock) instead of overselling.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, Min, TextField, Value, When
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from products.listing import sync_product_summaries
+from products.models import ProductVariant
+from tenants.models import Tenant
+
+from .models import Order, OrderStatus, StockStatus
+from .stats import apply_counter_deltas, new_deltas, transition_deltas
+
+logger = logging.getLogger(__name__)
+
+
+RESERVE_SQL = """
+UPDATE product_variants v
+SET reserved_quantity = v.reserved_quantity + r.quantity
+FROM unnest(%s::uuid[], %s::integer[]) AS r(id, quantity)
+WHERE v.id = r.id
+  AND v.stock_quantity - v.reserved_quantity >= r.quantity
+RETURNING v.id, v.product_id, v.tenant_id
+"""
+
+# Per-variant totals of the given orders' lines, only for products that manage stock
+ORDER_LINES_SQL = """
+SELECT oi.product_variant_id AS id, SUM(oi.quantity) AS quantity
+FROM order_items oi
+JOIN product_variants pv ON pv.id = oi.product_variant_id
+JOIN products p ON p.id = pv.product_id
+WHERE oi.order_id = ANY(%s::uuid[]) AND p.manage_stock
+GROUP BY oi.product_variant_id
+"""
+
+# Without a live reservation (second parameter 0) a line is only decremented
+# where the stock is still available, as in RESERVE_SQL; every line comes
+# back, with a NULL product_id when it was not decremented (short)
+COMMIT_SQL = f"""
+WITH lines AS ({ORDER_LINES_SQL}),
+committed AS (
+    UPDATE product_variants v
+    SET stock_quantity = v.stock_quantity - i.quantity,
+        reserved_quantity = GREATEST(v.reserved_quantity - i.quantity * %s, 0)
+    FROM lines i
+    WHERE v.id = i.id
+      AND (%s = 1 OR v.stock_quantity - v.reserved_quantity >= i.quantity)
+    RETURNING v.id, v.product_id, v.tenant_id
+)
+SELECT l.id, c.product_id, c.tenant_id
+FROM lines l
+LEFT JOIN committed c ON c.id = l.id
+"""
+
+RELEASE_SQL = f"""
+UPDATE product_variants v
+SET reserved_quantity = GREATEST(v.reserved_quantity - i.quantity, 0)
+FROM ({ORDER_LINES_SQL}) AS i
+WHERE v.id = i.id
+RETURNING v.product_id, v.tenant_id
+"""
+
+# Batch compare-and-set on orders.stock_status; returns the orders that moved
+TRANSITION_SQL = """
+UPDATE orders SET stock_status = %s
+WHERE id = ANY(%s::uuid[]) AND stock_status = %s
+RETURNING id
+"""
+
+# Claim a batch of unpaid orders past their tenant's reservation TTL and cancel
+# them, whether they still hold their reservation or already gave it back (a
+# failed or cancelled payment releases it at once). SKIP LOCKED lets several
+# sweepers (or a sweeper and a checkout) run side by side; the outer
+# stock_status check re-validates rows changed meanwhile. Returns the previous
+# stock_status, so only orders that were still Reserved release stock.
+EXPIRE_SQL = """
+WITH expired AS (
+    SELECT o.id, o.stock_status
+    FROM orders o
+    JOIN tenants t ON t.id = o.tenant_id
+    WHERE o.status = 'PendingPayment'
+      AND o.stock_status IN ('Reserved', 'Released')
+      AND o.created_at < %(cutoff)s
+      AND o.created_at < %(now)s - make_interval(mins => COALESCE(t.reservation_ttl_minutes, %(default_ttl)s))
+    ORDER BY o.created_at
+    LIMIT %(limit)s
+    FOR UPDATE OF o SKIP LOCKED
+)
+UPDATE orders o
+SET status = 'Cancelled',
+    stock_status = 'Released',
+    cancelled_at = %(now)s,
+    updated_at = %(now)s,
+    internal_notes = CONCAT_WS(E'\\n\\n', NULLIF(o.internal_notes, ''), %(note)s)
+FROM expired e
+WHERE o.id = e.id AND o.status = 'PendingPayment' AND o.stock_status = e.stock_status
+RETURNING o.id, o.tenant_id, o.order_type, o.deleted_at, e.stock_status
+"""
+
+
+# (previous stock_status, whether reserved_quantity must be decremented too)
+COMMIT_FROM = (
+    (StockStatus.RESERVED, 1),
+    (StockStatus.NOT_RESERVED, 0),
+    (StockStatus.RELEASED, 0),
+)
+
+
+def _sync_summaries(rows):
+    # Raw UPDATEs bypass the variant signals
+    sync_product_summaries({product_id: tenant_id for product_id, tenant_id in rows})
+
+
+def reserve_stock(quantities):
+    """
+    Reserve stock for {variant_id: quantity}.
+    Returns the ids of variants without enough available stock; when the list
+    is not empty the caller must roll back the transaction, since the other
+    lines were reserved.
+    """
+    if not quantities:
+        return []
+
+    variant_ids = [str(variant_id) for variant_id in quantities]
+    with connection.cursor() as cursor:
+        cursor.execute(RESERVE_SQL, [variant_ids, list(quantities.values())])
+        rows = cursor.fetchall()
+
+    reserved = {str(row[0]) for row in rows}
+    failed = [variant_id for variant_id in quantities if str(variant_id) not in reserved]
+    if not failed:
+        _sync_summaries((product_id, tenant_id) for _, product_id, tenant_id in rows)
+    return failed
+
+
+def _transition(order, from_status, to_status):
+    """Compare-and-set on Order.stock_status; True only for the caller that won."""
+    updated = Order.objects.filter(pk=order.pk, stock_status=from_status).update(stock_status=to_status)
+    if updated:
+        order.stock_status = to_status
+    return bool(updated)
+
+
+def _commit(order_ids, was_reserved, cursor):
+    """Run COMMIT_SQL for some orders; returns the ids of the variants left short."""
+    cursor.execute(COMMIT_SQL, [order_ids, was_reserved, was_reserved])
+    rows = cursor.fetchall()
+    _sync_summaries((product_id, tenant_id) for _, product_id, tenant_id in rows if product_id)
+    return [str(variant_id) for variant_id, product_id, _ in rows if product_id is None]
+
+
+def commit_order_stock(order):
+    """
+    Turn an order's reservation into a stock decrement once payment is received.
+    Orders without a live reservation (quotes, expired or cancelled orders paid
+    late) only decrement the lines still in stock. Idempotent.
+
+    Returns the ids of the variants that were not decremented for lack of
+    stock (pass them to flag_short_stock); empty when nothing is short or the
+    stock was already committed.
+    """
+    for from_status, was_reserved in COMMIT_FROM:
+        if _transition(order, from_status, StockStatus.COMMITTED):
+            break
+    else:
+        logger.info(f"Stock for order {order.order_number} already committed, skipping")
+        return []
+
+    with connection.cursor() as cursor:
+        return _commit([str(order.pk)], was_reserved, cursor)
+
+
+def flag_short_stock(order, variant_ids):
+    """
+    Record on a paid order that some lines could not be taken from stock
+    (commit_order_stock), so the store fulfils them by hand.
+    """
+    if not variant_ids:
+        return
+    skus = ', '.join(sorted(ProductVariant.objects.filter(pk__in=variant_ids).values_list('sku', flat=True)))
+    logger.warning(f"Order {order.order_number} paid without stock for {skus}: needs manual fulfilment")
+
+    now = timezone.now()
+    note = f"[{now.strftime('%Y-%m-%d %H:%M')}] Insufficient stock when paid, fulfil manually: {skus}"
+    Order.objects.filter(pk=order.pk).update(internal_notes=Case(
+        When(internal_notes__gt='', then=Concat(F('internal_notes'), Value(f"\n\n{note}"))),
+        default=Value(note),
+        output_field=TextField(),
+    ))
+    order.internal_notes = f"{order.internal_notes}\n\n{note}" if order.internal_notes else note
+
+
+def release_order_stock(order):
+    """Give an order's reserved stock back (cancellation / expiry). Idempotent."""
+    if not _transition(order, StockStatus.RESERVED, StockStatus.RELEASED):
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute(RELEASE_SQL, [[str(order.pk)]])
+        _sync_summaries(cursor.fetchall())
+    return True
+
+
+def _transition_many(order_ids, from_status, to_status, cursor):
+    cursor.execute(TRANSITION_SQL, [to_status, order_ids, from_status])
+    return [str(row[0]) for row in cursor.fetchall()]
+
+
+def commit_orders_stock(order_ids):
+    """
+    commit_order_stock for many orders at once (bulk status changes): one
+    compare-and-set per previous stock_status, one stock UPDATE for the
+    reserved orders and one per order for the others, so a short variant is
+    attributed to its order. Returns {order_id: [short variant ids]} for the
+    orders that could not be fully taken from stock.
+    """
+    order_ids = [str(order_id) for order_id in order_ids]
+    short = {}
+    if not order_ids:
+        return short
+
+    with connection.cursor() as cursor:
+        for from_status, was_reserved in COMMIT_FROM:
+            moved = _transition_many(order_ids, from_status, StockStatus.COMMITTED, cursor)
+            if not moved:
+                continue
+            if was_reserved:
+                _commit(moved, was_reserved, cursor)
+                continue
+            for order_id in moved:
+                variant_ids = _commit([order_id], was_reserved, cursor)
+                if variant_ids:
+                    short[order_id] = variant_ids
+    return short
+
+
+def release_orders_stock(order_ids):
+    """release_order_stock for many orders at once. Returns the ids of the orders released."""
+    order_ids = [str(order_id) for order_id in order_ids]
+    if not order_ids:
+        return []
+
+    with connection.cursor() as cursor:
+        released = _transition_many(order_ids, StockStatus.RESERVED, StockStatus.RELEASED, cursor)
+        if released:
+            cursor.execute(RELEASE_SQL, [released])
+            _sync_summaries(cursor.fetchall())
+    return released
+
+
+def release_expired_reservations(batch_size=500, now=None):
+    """
+    Cancel one batch of unpaid orders whose reservation expired and give back
+    the stock they still hold, with two set-based UPDATEs. Orders whose stock
+    was already released (failed payment) are cancelled too. Must run inside
+    a transaction. Returns the number of orders cancelled (less than
+    batch_size when done).
+
+    Order signals are bypassed on purpose: abandoned carts get no emails
+    (the order status counters are moved here instead).
+    """
+    now = now or timezone.now()
+    default_ttl = getattr(settings, 'ORDER_RESERVATION_TTL_MINUTES', 60)
+    tenant_min_ttl = Tenant.objects.filter(
+        reservation_ttl_minutes__isnull=False
+    ).aggregate(ttl=Min('reservation_ttl_minutes'))['ttl']
+    # Lower bound for every tenant, so the (status, created_at) index bounds the scan
+    min_ttl = min(default_ttl, tenant_min_ttl) if tenant_min_ttl is not None else default_ttl
+
+    with connection.cursor() as cursor:
+        cursor.execute(EXPIRE_SQL, {
+            'now': now,
+            'cutoff': now - timedelta(minutes=min_ttl),
+            'default_ttl': default_ttl,
+            'limit': batch_size,
+            'note': f"[{now.strftime('%Y-%m-%d %H:%M')}] Order cancelled: stock reservation expired",
+        })
+        rows = cursor.fetchall()
+        if not rows:
+            return 0
+
+        reserved = [str(row[0]) for row in rows if row[4] == StockStatus.RESERVED]
+        if reserved:
+            cursor.execute(RELEASE_SQL, [reserved])
+            _sync_summaries(cursor.fetchall())
+
+    deltas = new_deltas()
+    for _, tenant_id, order_type, deleted_at, _ in rows:
+        if deleted_at is None:
+            transition_deltas(
+                deltas, tenant_id, (OrderStatus.PENDING_PAYMENT, order_type), (OrderStatus.CANCELLED, order_type)
+            )
+    apply_counter_deltas(deltas)
+
+    logger.info(f"Cancelled {len(rows)} expired orders, released the stock reservations of {len(reserved)}")
+    return len(rows)
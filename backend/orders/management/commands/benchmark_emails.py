@@ -0,0 +1,82 @@
+"""
+Measure email render time (nothing is sent).
+Run with: python manage.py benchmark_emails [--orders 50] [--iterations 5] [--tenant slug]
+
+For each email type it reports the time per email when rendering orders one
+by one (items fetched per email, as a single send does) and through
+render_batch (one items query for the whole batch). For the emails with order
+lines it also times the f-string renderer the templates replaced
+(_legacy_emails.py), rendering one by one as before, as the baseline.
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.email_templates import EMAILS, render_batch, render_email
+from orders.models import Order
+
+from ._legacy_emails import LEGACY_RENDERERS
+
+
+class Command(BaseCommand):
+    help = 'Benchmark transactional email rendering per email, single vs batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=50, help='Number of recent orders to render')
+        parser.add_argument('--iterations', type=int, default=5)
+        parser.add_argument('--tenant', help='Only use orders of this tenant slug')
+
+    def handle(self, *args, **options):
+        orders = Order.objects.filter(deleted_at__isnull=True).order_by('-created_at')
+        if options['tenant']:
+            orders = orders.filter(tenant__slug=options['tenant'])
+        orders = list(orders[:options['orders']])
+        if not orders:
+            self.stdout.write(self.style.WARNING('No orders to render'))
+            return
+
+        self.stdout.write(f"Rendering {len(orders)} orders x {options['iterations']} iterations")
+        self.stdout.write(
+            f"{'email':30s} {'legacy (us/email)':>18s} {'single (us/email)':>18s} {'batch (us/email)':>18s}"
+        )
+
+        for name in EMAILS:
+            originals = [order.status for order in orders]
+            if name == 'order_status_update':
+                for order in orders:
+                    order.status = 'Shipped'
+
+            render_email(name, orders[0])  # warm template and branding caches
+            legacy_render = LEGACY_RENDERERS.get(name)
+            legacy, single, batch = [], [], []
+            for _ in range(options['iterations']):
+                if legacy_render:
+                    fresh = [self.without_prefetch(order) for order in orders]
+                    start = time.perf_counter()
+                    for order in fresh:
+                        legacy_render(order)
+                    legacy.append((time.perf_counter() - start) / len(orders))
+
+                fresh = [self.without_prefetch(order) for order in orders]
+                start = time.perf_counter()
+                for order in fresh:
+                    render_email(name, order)
+                single.append((time.perf_counter() - start) / len(orders))
+
+                fresh = [self.without_prefetch(order) for order in orders]
+                start = time.perf_counter()
+                render_batch(name, fresh)
+                batch.append((time.perf_counter() - start) / len(orders))
+
+            for order, status in zip(orders, originals):
+                order.status = status
+            baseline = f"{statistics.median(legacy) * 1e6:18.0f}" if legacy else f"{'-':>18s}"
+            self.stdout.write(
+                f"{name:30s} {baseline} {statistics.median(single) * 1e6:18.0f} {statistics.median(batch) * 1e6:18.0f}"
+            )
+
+    @staticmethod
+    def without_prefetch(order):
+        order._prefetched_objects_cache = {}
+        return order
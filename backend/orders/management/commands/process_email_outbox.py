@@ -0,0 +1,57 @@
+"""
+Send queued transactional emails.
+Run with: python manage.py process_email_outbox [--workers 4] [--batch-size 100] [--rate-limit 10] [--loop [--interval 2]]
+
+Without --loop the command drains the outbox once; with --loop it runs as the
+email worker process (see Procfile). Claimed emails of the same tenant and
+template go out in one provider batch request; --rate-limit caps the emails
+per second of each tenant (default EMAIL_TENANT_RATE_LIMIT, 0 = unlimited).
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from orders.email_backends import TenantRateLimiter
+from orders.email_outbox import DEFAULT_MAX_ATTEMPTS, process_batch
+
+
+class Command(BaseCommand):
+    help = 'Send pending emails from the outbox in per-tenant batches with retries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent sends')
+        parser.add_argument('--batch-size', type=int, default=100, help='Emails claimed per round')
+        parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS)
+        parser.add_argument('--rate-limit', type=float, default=settings.EMAIL_TENANT_RATE_LIMIT,
+                            help='Emails per second per tenant (0 = unlimited)')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox')
+        parser.add_argument('--interval', type=float, default=2, help='Seconds between polls when idle')
+
+    def drain(self, executor, limiter, options):
+        claimed_total = sent_total = 0
+        while True:
+            claimed, sent = process_batch(executor, options['batch_size'], options['max_attempts'], limiter)
+            claimed_total += claimed
+            sent_total += sent
+            if claimed < options['batch_size']:
+                return claimed_total, sent_total
+
+    def handle(self, *args, **options):
+        limiter = TenantRateLimiter(options['rate_limit'], settings.EMAIL_TENANT_BURST)
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='email-outbox') as executor:
+            if not options['loop']:
+                claimed, sent = self.drain(executor, limiter, options)
+                self.stdout.write(self.style.SUCCESS(f'Sent {sent} of {claimed} emails'))
+                return
+
+            self.stdout.write(f"Email outbox worker started ({options['workers']} threads)")
+            try:
+                while True:
+                    claimed, sent = self.drain(executor, limiter, options)
+                    if claimed:
+                        self.stdout.write(f'Sent {sent} of {claimed} emails')
+                    time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                self.stdout.write(self.style.SUCCESS('Stopped'))
@@ -0,0 +1,44 @@
+"""
+Recount the order status counters from the orders table.
+Run with: python manage.py rebuild_order_counters [--tenant slug] [--check]
+
+The counters are kept up to date incrementally (orders/stats.py); run this
+after bulk imports or manual SQL on orders. --check only reports tenants whose
+counters differ from a fresh count.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.stats import aggregate_order_stats, counter_stats, rebuild_counters
+from tenants.models import Tenant
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-tenant order status counters used by the order stats'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', help='Only this tenant slug')
+        parser.add_argument('--check', action='store_true', help='Report drift without rebuilding')
+
+    def handle(self, *args, **options):
+        tenant_id = None
+        if options['tenant']:
+            try:
+                tenant_id = Tenant.objects.values_list('id', flat=True).get(slug=options['tenant'])
+            except Tenant.DoesNotExist:
+                raise CommandError(f"Tenant '{options['tenant']}' not found")
+
+        if options['check']:
+            tenants = Tenant.objects.all() if tenant_id is None else Tenant.objects.filter(pk=tenant_id)
+            drifted = 0
+            for tenant in tenants.only('id', 'slug'):
+                expected, actual = aggregate_order_stats(tenant.id), counter_stats(tenant.id)
+                if expected != actual:
+                    drifted += 1
+                    self.stdout.write(self.style.WARNING(
+                        f"{tenant.slug}: counters total {actual['total']}, orders {expected['total']}"
+                    ))
+            self.stdout.write(f"{drifted} tenant(s) with drifted counters")
+            return
+
+        tenants = rebuild_counters(tenant_id)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt order counters for {tenants} tenant(s)'))
@@ -0,0 +1,54 @@
+"""
+Recompute the dashboard sales rollups from the orders table.
+Run with: python manage.py reconcile_sales_rollups [--tenant slug] [--check]
+
+Meant to run nightly (cron). The rollups are maintained incrementally on
+paid-status transitions (orders/rollups.py); reconciling picks up what that
+cannot see, such as totals edited on paid orders, variant cost changes and
+manual SQL. Each tenant is rebuilt in its own transaction. --check only
+reports tenants whose rollup totals differ from the orders.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Sum
+
+from orders.models import Order, OrderType, SalesDailyRollup
+from orders.rollups import SALE_STATUSES, rebuild_rollups
+from tenants.models import Tenant
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily/hourly/product/customer sales rollups used by the admin dashboard'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', help='Only this tenant slug')
+        parser.add_argument('--check', action='store_true', help='Report drift without rebuilding')
+
+    def handle(self, *args, **options):
+        tenants = Tenant.objects.only('id', 'slug').order_by('slug')
+        if options['tenant']:
+            tenants = tenants.filter(slug=options['tenant'])
+            if not tenants:
+                raise CommandError(f"Tenant '{options['tenant']}' not found")
+
+        drifted = 0
+        for tenant in tenants:
+            if options['check']:
+                live = Order.objects.filter(
+                    tenant=tenant, status__in=SALE_STATUSES, order_type=OrderType.SALE
+                ).aggregate(orders=Count('id'), revenue=Sum('total'))
+                rolled = SalesDailyRollup.objects.filter(tenant=tenant).aggregate(
+                    orders=Sum('orders_count'), revenue=Sum('revenue')
+                )
+                if (live['orders'] or 0, live['revenue'] or 0) != (rolled['orders'] or 0, rolled['revenue'] or 0):
+                    drifted += 1
+                    self.stdout.write(self.style.WARNING(
+                        f"{tenant.slug}: rollups {rolled['orders'] or 0} orders / {rolled['revenue'] or 0}, "
+                        f"orders table {live['orders']} / {live['revenue'] or 0}"
+                    ))
+            else:
+                rebuild_rollups(tenant.id)
+
+        if options['check']:
+            self.stdout.write(f"{drifted} tenant(s) with drifted rollups")
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Reconciled sales rollups for {len(tenants)} tenant(s)'))
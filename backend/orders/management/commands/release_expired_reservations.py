@@ -0,0 +1,52 @@
+"""
+Release stock held by abandoned (unpaid) orders.
+Run with: python manage.py release_expired_reservations [--batch-size 500] [--loop [--interval 60]]
+
+Orders in PendingPayment older than their tenant's reservation TTL are
+cancelled and their reserved quantities returned in set-based batches.
+Without --loop the command drains every expired order once (cron friendly);
+with --loop it keeps running as a background worker.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from orders.inventory import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = 'Cancel unpaid orders whose stock reservation expired and release the reserved stock'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--loop', action='store_true', help='Keep running, sweeping every --interval seconds')
+        parser.add_argument('--interval', type=int, default=60, help='Seconds between sweeps with --loop')
+
+    def drain(self, batch_size):
+        total = 0
+        while True:
+            # One transaction per batch keeps row locks short
+            with transaction.atomic():
+                released = release_expired_reservations(batch_size=batch_size)
+            total += released
+            if released < batch_size:
+                return total
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        if not options['loop']:
+            total = self.drain(batch_size)
+            self.stdout.write(self.style.SUCCESS(f'Released reservations of {total} expired orders'))
+            return
+
+        self.stdout.write(f"Sweeping expired reservations every {options['interval']}s...")
+        try:
+            while True:
+                total = self.drain(batch_size)
+                if total:
+                    self.stdout.write(f'Released reservations of {total} expired orders')
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('Stopped'))
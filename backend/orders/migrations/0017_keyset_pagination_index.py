@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-18 04:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0016_alter_shippingzone_commune_codes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['tenant', '-created_at', '-id'], name='idx_order_tenant_keyset'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.27 on 2026-10-18 04:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0021_seed_basic_palettes'),
+        ('orders', '0017_keyset_pagination_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderNumberSequence',
+            fields=[
+                ('tenant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='order_number_sequence', serialize=False, to='tenants.tenant')),
+                ('last_value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'order_number_sequences',
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.27 on 2026-10-18 04:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0018_ordernumbersequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stock_status',
+            field=models.CharField(choices=[('NotReserved', 'Not Reserved'), ('Reserved', 'Reserved'), ('Committed', 'Committed'), ('Released', 'Released')], default='NotReserved', max_length=20),
+        ),
+        # Existing orders reserved stock at checkout; open ones still hold it,
+        # paid/fulfilled ones have settled and closed ones are left as they are
+        migrations.RunSQL(
+            sql="""
+                UPDATE orders SET stock_status = CASE
+                    WHEN status IN ('Draft', 'PendingPayment', 'QuoteRequested', 'QuoteSent', 'QuoteApproved')
+                        THEN 'Reserved'
+                    WHEN status IN ('Paid', 'Processing', 'Shipped', 'Delivered')
+                        THEN 'Committed'
+                    ELSE 'Released'
+                END;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.27 on 2026-10-18 04:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0022_tenant_reservation_ttl'),
+        ('orders', '0021_emailoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatusCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('Draft', 'Draft'), ('PendingPayment', 'Pending Payment'), ('Paid', 'Paid'), ('QuoteRequested', 'Quote Requested'), ('QuoteSent', 'Quote Sent'), ('QuoteApproved', 'Quote Approved'), ('Processing', 'Processing'), ('Shipped', 'Shipped'), ('Delivered', 'Delivered'), ('Cancelled', 'Cancelled'), ('Refunded', 'Refunded')], max_length=20)),
+                ('order_type', models.CharField(choices=[('Sale', 'Sale'), ('Quote', 'Quote')], max_length=10)),
+                ('count', models.IntegerField(default=0)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_status_counters', to='tenants.tenant')),
+            ],
+            options={
+                'db_table': 'order_status_counters',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='orderstatuscounter',
+            constraint=models.UniqueConstraint(fields=('tenant', 'status', 'order_type'), name='uniq_order_status_counter'),
+        ),
+        # Seed the counters from existing orders; from here on they are kept
+        # up to date incrementally (orders/stats.py)
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO order_status_counters (tenant_id, status, order_type, count)
+                SELECT tenant_id, status, order_type, COUNT(*)
+                FROM orders
+                WHERE deleted_at IS NULL
+                GROUP BY tenant_id, status, order_type;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
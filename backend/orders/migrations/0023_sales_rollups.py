@@ -0,0 +1,139 @@
+# Generated by Django 4.2.27 on 2026-10-18 04:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Seed the rollups from the existing sales (orders/rollups.py at the time of
+# this migration); from here on they are kept up to date incrementally and
+# by the reconcile_sales_rollups command
+SALES = """
+    SELECT o.*, (o.created_at AT TIME ZONE %s)::date AS day
+    FROM orders o
+    WHERE o.status IN ('Paid', 'Processing', 'Shipped', 'Delivered') AND o.order_type = 'Sale'
+"""
+
+SEED_SQL = [
+    f"""
+    INSERT INTO sales_daily_rollups (tenant_id, day, orders_count, revenue, cost)
+    SELECT t.tenant_id, t.day, COUNT(*), SUM(t.total), COALESCE(SUM(c.cost), 0)
+    FROM ({SALES}) t
+    LEFT JOIN (
+        SELECT oi.order_id, SUM(oi.quantity * pv.cost) AS cost
+        FROM order_items oi
+        LEFT JOIN product_variants pv ON pv.id = oi.product_variant_id
+        GROUP BY oi.order_id
+    ) c ON c.order_id = t.id
+    GROUP BY t.tenant_id, t.day;
+    """,
+    f"""
+    INSERT INTO sales_hourly_rollups (tenant_id, hour, orders_count, revenue)
+    SELECT t.tenant_id, date_trunc('hour', t.created_at), COUNT(*), SUM(t.total)
+    FROM ({SALES}) t
+    GROUP BY t.tenant_id, date_trunc('hour', t.created_at);
+    """,
+    f"""
+    INSERT INTO product_sales_daily_rollups (tenant_id, day, product_name, sku, quantity, revenue)
+    SELECT t.tenant_id, t.day, oi.product_name, oi.sku, SUM(oi.quantity), SUM(oi.total)
+    FROM ({SALES}) t
+    JOIN order_items oi ON oi.order_id = t.id
+    GROUP BY t.tenant_id, t.day, oi.product_name, oi.sku;
+    """,
+    f"""
+    INSERT INTO customer_sales_rollups (tenant_id, customer_email, orders_count, ltv)
+    SELECT t.tenant_id, t.customer_email, COUNT(*), SUM(t.total)
+    FROM ({SALES}) t
+    GROUP BY t.tenant_id, t.customer_email;
+    """,
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0022_tenant_reservation_ttl'),
+        ('orders', '0022_orderstatuscounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesHourlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('orders_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_hourly_rollups', to='tenants.tenant')),
+            ],
+            options={
+                'db_table': 'sales_hourly_rollups',
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('orders_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_daily_rollups', to='tenants.tenant')),
+            ],
+            options={
+                'db_table': 'sales_daily_rollups',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSalesDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('product_name', models.CharField(max_length=300)),
+                ('sku', models.CharField(max_length=100)),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_sales_rollups', to='tenants.tenant')),
+            ],
+            options={
+                'db_table': 'product_sales_daily_rollups',
+            },
+        ),
+        migrations.CreateModel(
+            name='CustomerSalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('customer_email', models.EmailField(max_length=254)),
+                ('orders_count', models.IntegerField(default=0)),
+                ('ltv', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='customer_sales_rollups', to='tenants.tenant')),
+            ],
+            options={
+                'db_table': 'customer_sales_rollups',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='saleshourlyrollup',
+            constraint=models.UniqueConstraint(fields=('tenant', 'hour'), name='uniq_sales_hourly_rollup'),
+        ),
+        migrations.AddConstraint(
+            model_name='salesdailyrollup',
+            constraint=models.UniqueConstraint(fields=('tenant', 'day'), name='uniq_sales_daily_rollup'),
+        ),
+        migrations.AddConstraint(
+            model_name='productsalesdailyrollup',
+            constraint=models.UniqueConstraint(fields=('tenant', 'day', 'product_name', 'sku'), name='uniq_product_sales_daily_rollup'),
+        ),
+        migrations.AddIndex(
+            model_name='customersalesrollup',
+            index=models.Index(fields=['tenant', '-ltv'], name='idx_customer_sales_ltv'),
+        ),
+        migrations.AddConstraint(
+            model_name='customersalesrollup',
+            constraint=models.UniqueConstraint(fields=('tenant', 'customer_email'), name='uniq_customer_sales_rollup'),
+        ),
+        migrations.RunSQL(
+            sql=[(statement, [settings.TIME_ZONE]) for statement in SEED_SQL],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
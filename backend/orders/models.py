@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.postgres.fields import ArrayField
 import uuid
+from core.models import TrackedFieldsMixin
 from .payment_models import PaymentGateway, PaymentStatus, Payment, PaymentWebhookLog
 
 
@@ -120,11 +121,23 @@ class OrderStatus(models.TextChoices):
     REFUNDED = 'Refunded', 'Refunded'
 
 
-class Order(models.Model):
+class StockStatus(models.TextChoices):
+    """What the order currently holds in inventory (see orders/inventory.py)"""
+    NOT_RESERVED = 'NotReserved', 'Not Reserved'
+    RESERVED = 'Reserved', 'Reserved'
+    COMMITTED = 'Committed', 'Committed'
+    RELEASED = 'Released', 'Released'
+
+
+class Order(TrackedFieldsMixin, models.Model):
     """
     Orders and Quotes.
     Includes address snapshots for historical audit.
     """
+    # Values as loaded are kept on the instance for the transition signals
+    # and the order counters (see orders/stats.py)
+    tracked_fields = ('status', 'order_type', 'deleted_at')
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     tenant = models.ForeignKey('tenants.Tenant', on_delete=models.CASCADE, related_name='orders')
     customer = models.ForeignKey('orders.Customer', on_delete=models.RESTRICT, related_name='orders')
@@ -133,6 +146,7 @@ class Order(models.Model):
     order_number = models.CharField(max_length=50, blank=True)  # Auto-generated by DB trigger
     order_type = models.CharField(max_length=10, choices=OrderType.choices, default=OrderType.SALE)
     status = models.CharField(max_length=20, choices=OrderStatus.choices, default=OrderStatus.DRAFT)
+    stock_status = models.CharField(max_length=20, choices=StockStatus.choices, default=StockStatus.NOT_RESERVED)
     
     # Billing Info (Chile)
     billing_type = models.CharField(max_length=10, choices=BillingType.choices, default=BillingType.BOLETA)
@@ -227,7 +241,9 @@ class Order(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['tenant', 'created_at']),
+            models.Index(fields=['tenant', '-created_at', '-id'], name='idx_order_tenant_keyset'),
             models.Index(fields=['tenant', 'status']),
+            models.Index(fields=['status', 'created_at'], name='idx_order_status_created'),
             models.Index(fields=['tenant', 'order_type']),
             models.Index(fields=['tenant', 'order_number']),
             models.Index(fields=['customer', 'created_at']),
@@ -257,8 +273,110 @@ class Order(models.Model):
     
     @property
     def can_cancel(self):
-        """Can cancel if not shipped/delivered/cancelled"""
-        return self.status not in [OrderStatus.SHIPPED, OrderStatus.DELIVERED, OrderStatus.CANCELLED]
+        """Can cancel if not shipped/delivered/cancelled (see orders/state_machine.py)"""
+        from .state_machine import can_transition
+        return can_transition(self.status, OrderStatus.CANCELLED)
+
+
+class OrderNumberSequence(models.Model):
+    """
+    Per-tenant order number counter.
+    Allocated atomically with UPDATE ... RETURNING (see orders/numbering.py).
+    """
+    tenant = models.OneToOneField('tenants.Tenant', on_delete=models.CASCADE, primary_key=True, related_name='order_number_sequence')
+    last_value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'order_number_sequences'
+
+    def __str__(self):
+        return f"{self.tenant_id}: {self.last_value}"
+
+
+class OrderStatusCounter(models.Model):
+    """
+    Live count of a tenant's orders per status and type (soft-deleted orders
+    excluded). Kept up to date on every status change by orders/stats.py, so
+    order stats never scan the orders table; rebuild_order_counters fixes drift.
+    """
+    tenant = models.ForeignKey('tenants.Tenant', on_delete=models.CASCADE, related_name='order_status_counters')
+    status = models.CharField(max_length=20, choices=OrderStatus.choices)
+    order_type = models.CharField(max_length=10, choices=OrderType.choices)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'order_status_counters'
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'status', 'order_type'], name='uniq_order_status_counter'),
+        ]
+
+    def __str__(self):
+        return f"{self.tenant_id} {self.order_type}/{self.status}: {self.count}"
+
+
+# Sales rollups: pre-aggregated paid sales for the admin dashboard, kept up to
+# date on paid-status transitions and reconciled nightly (see orders/rollups.py).
+# Days are local dates (TIME_ZONE), hours are UTC-aligned instants.
+
+class SalesDailyRollup(models.Model):
+    tenant = models.ForeignKey('tenants.Tenant', on_delete=models.CASCADE, related_name='sales_daily_rollups')
+    day = models.DateField()
+    orders_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    cost = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'sales_daily_rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'day'], name='uniq_sales_daily_rollup'),
+        ]
+
+
+class SalesHourlyRollup(models.Model):
+    tenant = models.ForeignKey('tenants.Tenant', on_delete=models.CASCADE, related_name='sales_hourly_rollups')
+    hour = models.DateTimeField()
+    orders_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'sales_hourly_rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'hour'], name='uniq_sales_hourly_rollup'),
+        ]
+
+
+class ProductSalesDailyRollup(models.Model):
+    tenant = models.ForeignKey('tenants.Tenant', on_delete=models.CASCADE, related_name='product_sales_rollups')
+    day = models.DateField()
+    product_name = models.CharField(max_length=300)
+    sku = models.CharField(max_length=100)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'product_sales_daily_rollups'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tenant', 'day', 'product_name', 'sku'], name='uniq_product_sales_daily_rollup'
+            ),
+        ]
+
+
+class CustomerSalesRollup(models.Model):
+    tenant = models.ForeignKey('tenants.Tenant', on_delete=models.CASCADE, related_name='customer_sales_rollups')
+    customer_email = models.EmailField()
+    orders_count = models.IntegerField(default=0)
+    ltv = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'customer_sales_rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'customer_email'], name='uniq_customer_sales_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['tenant', '-ltv'], name='idx_customer_sales_ltv'),
+        ]
 
 
 class OrderItem(models.Model):
@@ -412,3 +530,45 @@ class ShippingCarrierConfig(models.Model):
         db_table = 'shipping_carrier_configs'
         unique_together = [['tenant', 'carrier_name']]
 
+
+
+class EmailOutboxStatus(models.TextChoices):
+    PENDING = 'Pending', 'Pending'
+    SENDING = 'Sending', 'Sending'
+    SENT = 'Sent', 'Sent'
+    FAILED = 'Failed', 'Failed'
+
+
+class EmailOutbox(models.Model):
+    """
+    Transactional email waiting to be sent (see orders/email_outbox.py).
+    Rows are written in the same transaction as the order change and drained
+    by the process_email_outbox worker.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tenant = models.ForeignKey('tenants.Tenant', on_delete=models.CASCADE, related_name='email_outbox')
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='emails', null=True, blank=True)
+
+    template = models.CharField(max_length=50)
+    idempotency_key = models.CharField(max_length=200, unique=True)
+    context = models.JSONField(default=dict, blank=True)  # e.g. the status the update email announces
+
+    status = models.CharField(max_length=20, choices=EmailOutboxStatus.choices, default=EmailOutboxStatus.PENDING)
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField()  # also the lease expiry while Sending
+    last_error = models.TextField(blank=True, null=True)
+    provider_message_id = models.CharField(max_length=100, blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'email_outbox'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='idx_email_outbox_due'),
+            models.Index(fields=['order']),
+        ]
+
+    def __str__(self):
+        return f"{self.template} ({self.status})"
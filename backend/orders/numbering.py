@@ -0,0 +1,125 @@
+"""
+Race-free per-tenant order number allocation.
+
+Each tenant has one row in ``order_number_sequences``. A number is reserved with
+a single ``UPDATE ... SET last_value = last_value + n RETURNING last_value``,
+which Postgres serialises on the row, so concurrent checkouts can never get the
+same number. The row is seeded lazily from the highest existing suffix
+(``SLUG-000123`` -> 123).
+
+With ``ORDER_NUMBER_BLOCK_SIZE`` > 1 each worker reserves a block of numbers on
+a separate autocommit connection and hands them out from memory. This keeps the
+counter row lock out of the checkout transaction; the trade-off is that
+numbers are not strictly chronological across workers and unused numbers of a
+block are skipped when the worker restarts.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+
+logger = logging.getLogger(__name__)
+
+
+RESERVE_SQL = """
+UPDATE order_number_sequences
+SET last_value = last_value + %s, updated_at = NOW()
+WHERE tenant_id = %s
+RETURNING last_value
+"""
+
+SEED_SQL = """
+INSERT INTO order_number_sequences (tenant_id, last_value, updated_at)
+SELECT %s, COALESCE(MAX(CAST(SUBSTRING(order_number FROM '([0-9]+)$') AS BIGINT)), 0), NOW()
+FROM orders
+WHERE tenant_id = %s
+ON CONFLICT (tenant_id) DO NOTHING
+"""
+
+
+def format_order_number(tenant, value):
+    return f"{tenant.slug.upper()}-{value:06d}"
+
+
+def reserve_range(db_connection, tenant_id, size):
+    """
+    Reserve ``size`` consecutive numbers for a tenant on the given connection.
+    Returns (first, last), both inclusive.
+    """
+    tenant_id = str(tenant_id)
+    with db_connection.cursor() as cursor:
+        cursor.execute(RESERVE_SQL, [size, tenant_id])
+        row = cursor.fetchone()
+        if row is None:
+            # First order for this tenant since the counter was introduced
+            cursor.execute(SEED_SQL, [tenant_id, tenant_id])
+            cursor.execute(RESERVE_SQL, [size, tenant_id])
+            row = cursor.fetchone()
+    last = row[0]
+    return last - size + 1, last
+
+
+class BlockAllocator:
+    """Per-worker pool of pre-reserved order numbers, one block per tenant."""
+
+    def __init__(self):
+        self._blocks = {}  # tenant_id -> [next_value, last_value]
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _connection(self):
+        """Dedicated autocommit connection, so a block survives checkout rollbacks."""
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = connections.create_connection(DEFAULT_DB_ALIAS)
+            self._local.connection = conn
+        return conn
+
+    def _reset_connection(self):
+        conn = getattr(self._local, 'connection', None)
+        self._local.connection = None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _reserve_block(self, tenant_id, size):
+        try:
+            return reserve_range(self._connection(), tenant_id, size)
+        except Exception as e:
+            # Stale/broken connection: reconnect once
+            logger.warning(f"Order number block allocation failed, reconnecting: {e}")
+            self._reset_connection()
+            return reserve_range(self._connection(), tenant_id, size)
+
+    def allocate(self, tenant_id, size):
+        key = str(tenant_id)
+        with self._lock:
+            block = self._blocks.get(key)
+            if block and block[0] <= block[1]:
+                value = block[0]
+                block[0] += 1
+                return value
+
+        first, last = self._reserve_block(key, size)
+
+        with self._lock:
+            # Keep the remainder of the new block (another thread may have refilled meanwhile;
+            # the numbers of the block we drop are simply skipped)
+            self._blocks[key] = [first + 1, last]
+        return first
+
+
+block_allocator = BlockAllocator()
+
+
+def allocate_order_number(tenant):
+    """Return the next order number for a tenant, e.g. ``ACME-000124``."""
+    block_size = getattr(settings, 'ORDER_NUMBER_BLOCK_SIZE', 1)
+    if block_size > 1:
+        value = block_allocator.allocate(tenant.id, block_size)
+    else:
+        value, _ = reserve_range(connection, tenant.id, 1)
+    return format_order_number(tenant, value)
@@ -16,7 +16,7 @@ from tenants.models import Tenant
 from .models import Order, OrderStatus
 from .payment_models import Payment, PaymentStatus, PaymentWebhookLog
 from .payment_services import PaymentServiceFactory, PaymentGatewayError
-from .email_service import send_order_confirmation_email, send_new_order_notification
+from .inventory import commit_order_stock, flag_short_stock, release_order_stock
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
@@ -265,18 +265,12 @@ def payment_return_handler(request, gateway):
                             order.status = OrderStatus.PAID
                             order.paid_at = timezone.now()
                             order.save()
+                            flag_short_stock(order, commit_order_stock(order))
                             
                             logger.info(f"Order {order.order_number} marked as PAID")
                         
-                        # Send emails explicitly (don't rely on signals in production)
-                        try:
-                            logger.info(f"Sending confirmation emails for order {order.order_number}")
-                            send_order_confirmation_email(order)
-                            send_new_order_notification(order)
-                            logger.info(f"Confirmation emails sent successfully")
-                        except Exception as email_error:
-                            logger.error(f"Error sending confirmation emails: {email_error}", exc_info=True)
-                            # Don't fail the payment flow if emails fail
+                        # Confirmation emails are queued by the Order post_save signal
+                        # in the same transaction (orders/email_outbox.py)
                             
                     else:
                         logger.info(f"Payment {payment.id} already completed")
@@ -404,6 +398,7 @@ def payment_callback(request, gateway):
                     order.status = OrderStatus.PAID
                     order.paid_at = timezone.now()
                     order.save()
+                    flag_short_stock(order, commit_order_stock(order))
                     
                     logger.info(f'Payment completed for order {order.order_number}')
                     
@@ -420,6 +415,9 @@ def payment_callback(request, gateway):
                     order = payment.order
                     order.payment_status = PaymentStatus.FAILED
                     order.save()
+                    # Give the reserved units back now rather than at expiry; the
+                    # order stays open for a retry until the expiry sweeper cancels it
+                    release_order_stock(order)
                     
                     logger.warning(f'Payment failed for order {order.order_number}')
                     
@@ -430,6 +428,7 @@ def payment_callback(request, gateway):
                     order = payment.order
                     order.payment_status = PaymentStatus.CANCELLED
                     order.save()
+                    release_order_stock(order)
                     
                     logger.info(f'Payment cancelled for order {order.order_number}')
             
@@ -654,14 +653,12 @@ def verify_payment_manually(request, order_id):
         
         # Always sync order status with payment status
         if payment.status == 'completed' and order.status != OrderStatus.PAID:
-            order.payment_status = 'paid'
-            order.status = OrderStatus.PAID
-            order.paid_at = timezone.now()
-            order.save()
-            logger.info(f'Updated order {order.id} status to Paid')
-            
-            order.paid_at = timezone.now()
-            order.save()
+            with transaction.atomic():
+                order.payment_status = 'paid'
+                order.status = OrderStatus.PAID
+                order.paid_at = timezone.now()
+                order.save()
+                flag_short_stock(order, commit_order_stock(order))
             logger.info(f'Updated order {order.id} status to Paid')
             
             # Emails handled by signals
@@ -0,0 +1,141 @@
+"""
+Sales rollups for the admin dashboard.
+
+A sale is an order of type Sale in one of SALE_STATUSES, the set the
+dashboard has always reported. The rollup tables (models.py) hold its
+totals per tenant x day, tenant x hour, tenant x product x day and
+tenant x customer, so the dashboard reads a few hundred small rows instead
+of scanning orders and order_items.
+
+    apply_sales(order_ids, sign)     add (+1) or remove (-1) orders, one statement
+    sale_transitions(changes)        apply the orders entering / leaving SALE_STATUSES
+    rebuild_rollups(tenant_id=None)  recount from orders (reconcile_sales_rollups)
+
+Orders enter the rollups when they become paid and leave them when cancelled
+or refunded: from the Order signals, bulk_transition and any code doing set
+based status updates. The values are read from the rows at that moment, so
+later edits to a paid order's total or a variant cost are only picked up by
+the nightly reconciliation.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import OrderStatus, OrderType
+
+SALE_STATUSES = (OrderStatus.PAID, OrderStatus.PROCESSING, OrderStatus.SHIPPED, OrderStatus.DELIVERED)
+
+ROLLUP_TABLES = (
+    'sales_daily_rollups',
+    'sales_hourly_rollups',
+    'product_sales_daily_rollups',
+    'customer_sales_rollups',
+)
+
+# One statement updates every rollup for the orders selected by {where}.
+# Cost is quantity x the variant's cost, as the dashboard computed it live.
+APPLY_SQL = """
+WITH target AS (
+    SELECT o.id, o.tenant_id, o.created_at, o.total, o.customer_email,
+           (o.created_at AT TIME ZONE %(tz)s)::date AS day
+    FROM orders o
+    WHERE {where}
+),
+lines AS (
+    SELECT oi.order_id, oi.product_name, oi.sku, oi.quantity, oi.total,
+           oi.quantity * pv.cost AS cost
+    FROM order_items oi
+    JOIN target t ON t.id = oi.order_id
+    LEFT JOIN product_variants pv ON pv.id = oi.product_variant_id
+),
+daily AS (
+    INSERT INTO sales_daily_rollups (tenant_id, day, orders_count, revenue, cost)
+    SELECT t.tenant_id, t.day, %(sign)s * COUNT(*), %(sign)s * SUM(t.total), %(sign)s * COALESCE(SUM(c.cost), 0)
+    FROM target t
+    LEFT JOIN (SELECT order_id, SUM(cost) AS cost FROM lines GROUP BY order_id) c ON c.order_id = t.id
+    GROUP BY t.tenant_id, t.day
+    ON CONFLICT (tenant_id, day) DO UPDATE SET
+        orders_count = sales_daily_rollups.orders_count + EXCLUDED.orders_count,
+        revenue = sales_daily_rollups.revenue + EXCLUDED.revenue,
+        cost = sales_daily_rollups.cost + EXCLUDED.cost
+    RETURNING 1
+),
+hourly AS (
+    INSERT INTO sales_hourly_rollups (tenant_id, hour, orders_count, revenue)
+    SELECT t.tenant_id, date_trunc('hour', t.created_at), %(sign)s * COUNT(*), %(sign)s * SUM(t.total)
+    FROM target t
+    GROUP BY t.tenant_id, date_trunc('hour', t.created_at)
+    ON CONFLICT (tenant_id, hour) DO UPDATE SET
+        orders_count = sales_hourly_rollups.orders_count + EXCLUDED.orders_count,
+        revenue = sales_hourly_rollups.revenue + EXCLUDED.revenue
+    RETURNING 1
+),
+products AS (
+    INSERT INTO product_sales_daily_rollups (tenant_id, day, product_name, sku, quantity, revenue)
+    SELECT t.tenant_id, t.day, l.product_name, l.sku, %(sign)s * SUM(l.quantity), %(sign)s * SUM(l.total)
+    FROM lines l
+    JOIN target t ON t.id = l.order_id
+    GROUP BY t.tenant_id, t.day, l.product_name, l.sku
+    ON CONFLICT (tenant_id, day, product_name, sku) DO UPDATE SET
+        quantity = product_sales_daily_rollups.quantity + EXCLUDED.quantity,
+        revenue = product_sales_daily_rollups.revenue + EXCLUDED.revenue
+    RETURNING 1
+)
+INSERT INTO customer_sales_rollups (tenant_id, customer_email, orders_count, ltv)
+SELECT t.tenant_id, t.customer_email, %(sign)s * COUNT(*), %(sign)s * SUM(t.total)
+FROM target t
+GROUP BY t.tenant_id, t.customer_email
+ON CONFLICT (tenant_id, customer_email) DO UPDATE SET
+    orders_count = customer_sales_rollups.orders_count + EXCLUDED.orders_count,
+    ltv = customer_sales_rollups.ltv + EXCLUDED.ltv
+"""
+
+SALES_WHERE = "o.status = ANY(%(statuses)s) AND o.order_type = %(sale)s"
+
+
+def is_sale(status, order_type):
+    return status in SALE_STATUSES and order_type == OrderType.SALE
+
+
+def apply_sales(order_ids, sign=1):
+    """Add (sign=1) or remove (sign=-1) the given orders from every rollup."""
+    order_ids = [str(order_id) for order_id in order_ids]
+    if not order_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(APPLY_SQL.format(where='o.id = ANY(%(ids)s::uuid[])'), {
+            'ids': order_ids,
+            'sign': sign,
+            'tz': settings.TIME_ZONE,
+        })
+
+
+def sale_transitions(changes):
+    """
+    Apply [(order_id, was_sale, is_sale)]: orders that became a sale are
+    added, orders that stopped being one are removed.
+    """
+    entered = [order_id for order_id, before, after in changes if after and not before]
+    left = [order_id for order_id, before, after in changes if before and not after]
+    apply_sales(entered, 1)
+    apply_sales(left, -1)
+
+
+@transaction.atomic
+def rebuild_rollups(tenant_id=None):
+    """Recompute every rollup from the orders table, for one tenant or all of them."""
+    where, params = SALES_WHERE, {
+        'statuses': list(SALE_STATUSES),
+        'sale': OrderType.SALE,
+        'sign': 1,
+        'tz': settings.TIME_ZONE,
+    }
+    tenant_filter = ''
+    if tenant_id is not None:
+        where += ' AND o.tenant_id = %(tenant_id)s'
+        tenant_filter = ' WHERE tenant_id = %(tenant_id)s'
+        params['tenant_id'] = str(tenant_id)
+
+    with connection.cursor() as cursor:
+        for table in ROLLUP_TABLES:
+            cursor.execute(f'DELETE FROM {table}{tenant_filter}', params)
+        cursor.execute(APPLY_SQL.format(where=where), params)
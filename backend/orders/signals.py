@@ -1,77 +1,77 @@
-
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
-from .models import Order, OrderStatus
-from .email_service import send_order_confirmation_email, send_new_order_notification
+from .models import Order
+from .email_outbox import enqueue_emails, transition_emails
+from .rollups import apply_sales, is_sale, sale_transitions
+from .stats import apply_counter_deltas, new_deltas, transition_deltas
 import logging
 
 logger = logging.getLogger(__name__)
 
-@receiver(pre_save, sender=Order)
-def store_previous_status(sender, instance, **kwargs):
+@receiver(post_save, sender=Order)
+def send_order_emails(sender, instance, created, **kwargs):
     """
-    Store the previous status to detect transitions
+    Queue emails when order status changes.
+    They are written to the outbox in the same transaction and sent by the
+    process_email_outbox worker, so no provider call happens here.
     """
-    if instance.pk:
-        try:
-            old_instance = Order.objects.get(pk=instance.pk)
-            instance._previous_status = old_instance.status
-        except Order.DoesNotExist:
-            instance._previous_status = None
-    else:
-        instance._previous_status = None
+    # Status as loaded from the database (TrackedFieldsMixin); None for new orders
+    previous_status = None if created else instance.previous_value('status')
+
+    emails = transition_emails(instance, previous_status, created)
+    if emails:
+        logger.info(
+            f"Order {instance.order_number} transitioned to {instance.status}. "
+            f"Queueing {', '.join(template for _, template, _, _ in emails)}."
+        )
+        enqueue_emails(emails)
+
+
+def _previous(instance, created):
+    """(status, order_type, deleted_at) before this save; None for new orders."""
+    if created:
+        return None
+    dirty = instance.get_dirty_fields()
+    return (
+        dirty.get('status', instance.status),
+        dirty.get('order_type', instance.order_type),
+        dirty.get('deleted_at', instance.deleted_at),
+    )
+
+
+def _counted(status, order_type, deleted_at):
+    """Counter key of an order, None if it is not counted (soft-deleted)."""
+    return None if deleted_at else (status, order_type)
+
 
 @receiver(post_save, sender=Order)
-def send_order_emails(sender, instance, created, **kwargs):
+def update_order_counters(sender, instance, created, **kwargs):
     """
-    Trigger emails when order status changes
+    Move the order status counters (orders/stats.py) when an order is
+    created, changes status or type, or is soft-deleted / restored.
     """
-    from .email_service import (
-        send_order_confirmation_email, 
-        send_new_order_notification,
-        send_order_status_update_email
-    )
-    
-    current_status = instance.status
-    previous_status = getattr(instance, '_previous_status', None)
-    
-    # Avoid duplicate emails if status hasn't changed
-    if not created and current_status == previous_status:
-        return
+    previous = _previous(instance, created)
+    before = _counted(*previous) if previous else None
+    after = _counted(instance.status, instance.order_type, instance.deleted_at)
+    apply_counter_deltas(transition_deltas(new_deltas(), instance.tenant_id, before, after))
+
+
+@receiver(post_save, sender=Order)
+def update_sales_rollups(sender, instance, created, **kwargs):
+    """Add an order to the dashboard sales rollups when paid, remove it when cancelled/refunded."""
+    previous = _previous(instance, created)
+    was_sale = bool(previous) and is_sale(previous[0], previous[1])
+    sale_transitions([(instance.pk, was_sale, is_sale(instance.status, instance.order_type))])
+
+
+@receiver(pre_delete, sender=Order)
+def remove_order_from_sales(sender, instance, **kwargs):
+    # Before the delete, while the order and its lines can still be read
+    if is_sale(instance.status, instance.order_type):
+        apply_sales([instance.pk], -1)
 
-    # 1. Handle PAID status (New Sale)
-    is_paid_now = current_status == 'Paid' or current_status == OrderStatus.PAID
-    was_paid_before = previous_status == 'Paid' or previous_status == OrderStatus.PAID
-    
-    if is_paid_now and (created or not was_paid_before):
-        logger.info(f"Order {instance.order_number} is PAID. Sending confirmation emails.")
-        try:
-            send_order_confirmation_email(instance)
-            send_new_order_notification(instance)
-        except Exception as e:
-            logger.error(f"Failed to send paid confirmation emails: {e}")
-        return # Confirmation email is enough for this transition
 
-    # 2. Handle Status Updates
-    # Supported statuses for notifications:
-    notify_statuses = [
-        'QuoteSent', 
-        'Processing', 
-        'Shipped', 
-        'Delivered', 
-        'Cancelled', 
-        'Refunded'
-    ]
-    
-    # Check if we transitioned TO one of these statuses
-    if current_status in notify_statuses:
-        # For QuoteSent, we always notify even if it was QuoteSent before (e.g. re-sending updated quote)
-        # For others, only if it changed
-        should_send = (current_status == 'QuoteSent') or (current_status != previous_status)
-        
-        if should_send:
-            logger.info(f"Order {instance.order_number} transitioned to {current_status}. Sending update email.")
-            try:
-                send_order_status_update_email(instance)
-            except Exception as e:
-                logger.error(f"Failed to send status update email for {current_status}: {e}")
+@receiver(post_delete, sender=Order)
+def remove_order_from_counters(sender, instance, **kwargs):
+    before = _counted(instance.status, instance.order_type, instance.deleted_at)
+    apply_counter_deltas(transition_deltas(new_deltas(), instance.tenant_id, before, None))
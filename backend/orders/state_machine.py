@@ -0,0 +1,189 @@
+"""
+Order status state machine.
+
+TRANSITIONS lists the statuses an order may move to from each status.
+Entering a status stamps its timestamp (only the first time) and runs its
+side effects:
+
+    Paid        stock committed (orders/inventory.py); lines out of stock
+                flagged for manual fulfilment
+    Cancelled   reserved stock released
+    any         customer / store emails queued (email_outbox.transition_emails),
+                order status counters moved (orders/stats.py),
+                paid sales added to / removed from the dashboard rollups (orders/rollups.py)
+
+``transition`` changes one order through Order.save(), so the post_save email
+signal fires as usual. ``bulk_transition`` validates many orders with one
+SELECT, moves them with one UPDATE and queues their side effects in batch;
+it bypasses signals and does the signal's work itself.
+
+Payments (payment_views) and quote responses keep their own flows: they set
+fields beyond the status.
+"""
+from django.db.models import Case, F, TextField, Value, When
+from django.db.models.functions import Coalesce, Concat
+from django.utils import timezone
+
+from .email_outbox import enqueue_emails, transition_emails
+from .inventory import (
+    commit_order_stock, commit_orders_stock, flag_short_stock, release_order_stock, release_orders_stock,
+)
+from .models import Order, OrderStatus
+from .rollups import is_sale, sale_transitions
+from .stats import apply_counter_deltas, new_deltas, transition_deltas
+
+
+TRANSITIONS = {
+    OrderStatus.DRAFT: {OrderStatus.PENDING_PAYMENT, OrderStatus.QUOTE_REQUESTED, OrderStatus.CANCELLED},
+    OrderStatus.PENDING_PAYMENT: {OrderStatus.PAID, OrderStatus.CANCELLED},
+    OrderStatus.QUOTE_REQUESTED: {OrderStatus.QUOTE_SENT, OrderStatus.CANCELLED},
+    OrderStatus.QUOTE_SENT: {
+        OrderStatus.QUOTE_APPROVED, OrderStatus.PENDING_PAYMENT, OrderStatus.PAID, OrderStatus.CANCELLED,
+    },
+    OrderStatus.QUOTE_APPROVED: {OrderStatus.PENDING_PAYMENT, OrderStatus.PAID, OrderStatus.CANCELLED},
+    OrderStatus.PAID: {
+        OrderStatus.PROCESSING, OrderStatus.SHIPPED, OrderStatus.CANCELLED, OrderStatus.REFUNDED,
+    },
+    OrderStatus.PROCESSING: {OrderStatus.SHIPPED, OrderStatus.CANCELLED, OrderStatus.REFUNDED},
+    OrderStatus.SHIPPED: {OrderStatus.DELIVERED, OrderStatus.REFUNDED},
+    OrderStatus.DELIVERED: {OrderStatus.REFUNDED},
+    OrderStatus.CANCELLED: set(),
+    OrderStatus.REFUNDED: {OrderStatus.CANCELLED},
+}
+
+# Set when the status is first entered
+TIMESTAMP_FIELDS = {
+    OrderStatus.PAID: 'paid_at',
+    OrderStatus.SHIPPED: 'shipped_at',
+    OrderStatus.DELIVERED: 'delivered_at',
+    OrderStatus.CANCELLED: 'cancelled_at',
+}
+
+# Fields bulk_transition loads to validate and to queue emails
+BULK_FIELDS = ('id', 'tenant_id', 'order_number', 'order_type', 'status', 'updated_at')
+
+
+class InvalidTransition(Exception):
+    def __init__(self, from_status, to_status):
+        self.from_status = from_status
+        self.to_status = to_status
+        super().__init__(f'Cannot change order status from {from_status} to {to_status}')
+
+
+def can_transition(from_status, to_status):
+    return to_status in TRANSITIONS.get(from_status, ())
+
+
+def check_transition(from_status, to_status):
+    """Raise InvalidTransition unless ``from_status`` may move to ``to_status``."""
+    if not can_transition(from_status, to_status):
+        raise InvalidTransition(from_status, to_status)
+
+
+def format_note(message, now):
+    return f"[{now.strftime('%Y-%m-%d %H:%M')}] {message}"
+
+
+def transition(order, to_status, note=None):
+    """
+    Move one order to ``to_status`` and run its side effects. Keeping the
+    current status is allowed (it only records the note). Must run inside a
+    transaction. Raises InvalidTransition.
+    """
+    if order.status != to_status:
+        check_transition(order.status, to_status)
+
+    now = timezone.now()
+    order.status = to_status
+    timestamp_field = TIMESTAMP_FIELDS.get(to_status)
+    if timestamp_field and not getattr(order, timestamp_field):
+        setattr(order, timestamp_field, now)
+    if note:
+        if order.internal_notes:
+            order.internal_notes += f"\n\n{format_note(note, now)}"
+        else:
+            order.internal_notes = format_note(note, now)
+    order.save()
+
+    # Keep inventory in step with the new status (both calls are idempotent)
+    if to_status == OrderStatus.PAID:
+        flag_short_stock(order, commit_order_stock(order))
+    elif to_status == OrderStatus.CANCELLED:
+        release_order_stock(order)
+    return order
+
+
+def bulk_transition(tenant, order_ids, to_status, note=None):
+    """
+    Move many orders of a tenant to ``to_status`` in one set-based pass.
+    Must run inside a transaction (the orders are locked while validated).
+
+    Returns {'updated': [ids], 'skipped': [{id, order_number, status, error}],
+    'not_found': [ids]}; orders already in ``to_status`` or not allowed to
+    move there are skipped, the rest are updated.
+    """
+    requested = list(dict.fromkeys(str(order_id) for order_id in order_ids))
+    orders = list(
+        Order.objects.select_for_update()
+        .filter(tenant=tenant, pk__in=requested, deleted_at__isnull=True)
+        .only(*BULK_FIELDS)
+    )
+
+    found = {str(order.pk) for order in orders}
+    result = {
+        'updated': [],
+        'skipped': [],
+        'not_found': [order_id for order_id in requested if order_id not in found],
+    }
+
+    movable = []
+    for order in orders:
+        if can_transition(order.status, to_status):
+            movable.append(order)
+        else:
+            error = 'Already in this status' if order.status == to_status else str(InvalidTransition(order.status, to_status))
+            result['skipped'].append({
+                'id': str(order.pk),
+                'order_number': order.order_number,
+                'status': order.status,
+                'error': error,
+            })
+    if not movable:
+        return result
+
+    now = timezone.now()
+    changes = {'status': to_status, 'updated_at': now}
+    timestamp_field = TIMESTAMP_FIELDS.get(to_status)
+    if timestamp_field:
+        changes[timestamp_field] = Coalesce(F(timestamp_field), Value(now))
+    if note:
+        note = format_note(note, now)
+        changes['internal_notes'] = Case(
+            When(internal_notes__gt='', then=Concat(F('internal_notes'), Value(f"\n\n{note}"))),
+            default=Value(note),
+            output_field=TextField(),
+        )
+    ids = [order.pk for order in movable]
+    Order.objects.filter(pk__in=ids).update(**changes)
+
+    emails, deltas, sales = [], new_deltas(), []
+    for order in movable:
+        previous_status = order.status
+        order.status = to_status
+        order.updated_at = now
+        emails += transition_emails(order, previous_status)
+        transition_deltas(deltas, order.tenant_id, (previous_status, order.order_type), (to_status, order.order_type))
+        sales.append((order.pk, is_sale(previous_status, order.order_type), is_sale(to_status, order.order_type)))
+    enqueue_emails(emails)
+    apply_counter_deltas(deltas)
+    sale_transitions(sales)
+
+    if to_status == OrderStatus.PAID:
+        short = commit_orders_stock(ids)
+        for order in movable:
+            flag_short_stock(order, short.get(str(order.pk)))
+    elif to_status == OrderStatus.CANCELLED:
+        release_orders_stock(ids)
+
+    result['updated'] = [str(order_id) for order_id in ids]
+    return result
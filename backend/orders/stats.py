@@ -0,0 +1,146 @@
+"""
+Order counts per status and type (admin order list header).
+
+    get_order_stats(tenant_id)        cached stats, read from the counters table
+    aggregate_order_stats(tenant_id)  the same stats with one GROUP BY over orders
+    apply_counter_deltas(deltas)      +/- counts after status changes
+    rebuild_counters(tenant_id=None)  recount from orders (rebuild_order_counters)
+
+OrderStatusCounter holds one row per (tenant, status, type), so reading the
+stats costs a single indexed query however many orders a tenant has. Every
+path that changes an order's status, type or soft-delete moves the counters
+in the same transaction: the Order signals (save/delete), bulk_transition
+and the expired-reservation sweeper. Raw SQL or QuerySet.update() elsewhere
+would bypass them; rebuild_counters restores exact counts.
+
+The stats are cached as core.cache_registry.ADMIN_ORDER_STATS, whose
+version is bumped after the transaction that moved the counters commits.
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Count
+
+from core.cache_registry import ADMIN_ORDER_STATS
+
+from .models import Order, OrderStatus, OrderStatusCounter, OrderType
+
+# Positive deltas may create the row; negative ones only ever decrement an
+# existing row (an order being counted out was counted in before)
+INCREMENT_SQL = """
+INSERT INTO order_status_counters (tenant_id, status, order_type, count)
+SELECT * FROM unnest(%s::uuid[], %s::varchar[], %s::varchar[], %s::integer[])
+ON CONFLICT (tenant_id, status, order_type)
+DO UPDATE SET count = order_status_counters.count + EXCLUDED.count
+"""
+
+DECREMENT_SQL = """
+UPDATE order_status_counters c
+SET count = GREATEST(c.count + d.delta, 0)
+FROM unnest(%s::uuid[], %s::varchar[], %s::varchar[], %s::integer[]) AS d(tenant_id, status, order_type, delta)
+WHERE c.tenant_id = d.tenant_id AND c.status = d.status AND c.order_type = d.order_type
+"""
+
+REBUILD_SQL = """
+INSERT INTO order_status_counters (tenant_id, status, order_type, count)
+SELECT tenant_id, status, order_type, COUNT(*)
+FROM orders
+WHERE deleted_at IS NULL {tenant_filter}
+GROUP BY tenant_id, status, order_type
+RETURNING tenant_id
+"""
+
+
+def empty_stats():
+    return {
+        'total': 0,
+        'by_status': {status: 0 for status in OrderStatus.values},
+        'by_type': {order_type: 0 for order_type in OrderType.values},
+    }
+
+
+def _stats_from_rows(rows):
+    """Build the stats from (status, order_type, count) rows."""
+    stats = empty_stats()
+    for status, order_type, count in rows:
+        stats['total'] += count
+        stats['by_status'][status] = stats['by_status'].get(status, 0) + count
+        stats['by_type'][order_type] = stats['by_type'].get(order_type, 0) + count
+    return stats
+
+
+def aggregate_order_stats(tenant_id):
+    """Stats straight from the orders table, with one grouped aggregate."""
+    rows = (
+        Order.objects.filter(tenant_id=tenant_id, deleted_at__isnull=True)
+        .order_by()
+        .values_list('status', 'order_type')
+        .annotate(count=Count('id'))
+    )
+    return _stats_from_rows(rows)
+
+
+def counter_stats(tenant_id):
+    rows = OrderStatusCounter.objects.filter(tenant_id=tenant_id).values_list('status', 'order_type', 'count')
+    return _stats_from_rows(rows)
+
+
+def get_order_stats(tenant_id):
+    return ADMIN_ORDER_STATS.get_or_set(lambda: counter_stats(tenant_id), tenant_id)
+
+
+def invalidate_order_stats(tenant_ids):
+    """Drop cached stats once the current transaction commits."""
+    for tenant_id in set(tenant_ids):
+        transaction.on_commit(lambda tenant_id=tenant_id: ADMIN_ORDER_STATS.invalidate(tenant_id))
+
+
+def transition_deltas(deltas, tenant_id, before, after):
+    """
+    Add the moves of one order to ``deltas``. ``before`` / ``after`` are
+    (status, order_type) or None when the order is not counted (new,
+    soft-deleted or deleted).
+    """
+    if before == after:
+        return deltas
+    if before is not None:
+        deltas[(str(tenant_id), *before)] -= 1
+    if after is not None:
+        deltas[(str(tenant_id), *after)] += 1
+    return deltas
+
+
+def new_deltas():
+    return defaultdict(int)
+
+
+def apply_counter_deltas(deltas):
+    """Apply {(tenant_id, status, order_type): delta} with at most two statements."""
+    increments = [key + (delta,) for key, delta in deltas.items() if delta > 0]
+    decrements = [key + (delta,) for key, delta in deltas.items() if delta < 0]
+    if not increments and not decrements:
+        return
+
+    with connection.cursor() as cursor:
+        for sql, rows in ((INCREMENT_SQL, increments), (DECREMENT_SQL, decrements)):
+            if rows:
+                cursor.execute(sql, [list(column) for column in zip(*rows)])
+    invalidate_order_stats(key[0] for key in deltas)
+
+
+@transaction.atomic
+def rebuild_counters(tenant_id=None):
+    """Recount from the orders table, for one tenant or all of them. Returns the tenants touched."""
+    counters = OrderStatusCounter.objects.all()
+    tenant_filter, params = '', []
+    if tenant_id is not None:
+        counters = counters.filter(tenant_id=tenant_id)
+        tenant_filter, params = 'AND tenant_id = %s', [str(tenant_id)]
+
+    tenant_ids = set(counters.values_list('tenant_id', flat=True).distinct())
+    counters.delete()
+    with connection.cursor() as cursor:
+        cursor.execute(REBUILD_SQL.format(tenant_filter=tenant_filter), params)
+        tenant_ids.update(row[0] for row in cursor.fetchall())
+    invalidate_order_stats(tenant_ids)
+    return len(tenant_ids)
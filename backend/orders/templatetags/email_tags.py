@@ -0,0 +1,9 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def money(value):
+    """Whole-peso amount with thousands separators: 15990 -> $15,990"""
+    return f"${float(value or 0):,.0f}"
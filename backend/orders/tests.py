@@ -1,3 +1,632 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.db.models import Count, F, Sum
+from django.db.models.signals import post_save
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from products.models import Product, ProductVariant
+from tenants.models import Tenant
+
+from .email_outbox import transition_emails
+from .email_templates import ITEM_EMAILS, render_batch, render_email
+from .inventory import (
+    commit_order_stock, commit_orders_stock, flag_short_stock, release_order_stock, release_orders_stock,
+    release_expired_reservations, reserve_stock,
+)
+from .models import (
+    CustomerSalesRollup, Customer, Order, OrderItem, OrderStatus, OrderStatusCounter, ProductSalesDailyRollup,
+    SalesDailyRollup, SalesHourlyRollup, StockStatus,
+)
+from .rollups import SALE_STATUSES, rebuild_rollups
+from .numbering import BlockAllocator, allocate_order_number, format_order_number
+from .state_machine import (
+    TRANSITIONS, InvalidTransition, bulk_transition, can_transition, check_transition, transition,
+)
+from .stats import aggregate_order_stats, apply_counter_deltas, counter_stats, new_deltas, rebuild_counters
+from .views import OrderViewSet
+
+
+class OrderNumberingTests(SimpleTestCase):
+    tenant = SimpleNamespace(id='tenant-a', slug='acme')
+
+    def test_format(self):
+        self.assertEqual(format_order_number(self.tenant, 124), 'ACME-000124')
+        self.assertEqual(format_order_number(self.tenant, 1234567), 'ACME-1234567')
+
+    @override_settings(ORDER_NUMBER_BLOCK_SIZE=1)
+    def test_one_number_per_reservation(self):
+        with mock.patch('orders.numbering.reserve_range', return_value=(7, 7)) as reserve_range:
+            self.assertEqual(allocate_order_number(self.tenant), 'ACME-000007')
+        self.assertEqual(reserve_range.call_args.args[1:], ('tenant-a', 1))
+
+    def test_block_handed_out_in_order(self):
+        allocator = BlockAllocator()
+        blocks = iter([(1, 3), (10, 12)])
+        with mock.patch.object(allocator, '_reserve_block', side_effect=lambda *args: next(blocks)) as reserve:
+            values = [allocator.allocate('tenant-a', 3) for _ in range(4)]
+        self.assertEqual(values, [1, 2, 3, 10])
+        self.assertEqual(reserve.call_count, 2)
+
+    def test_blocks_are_per_tenant(self):
+        allocator = BlockAllocator()
+        blocks = {'tenant-a': (1, 5), 'tenant-b': (6, 10)}
+        with mock.patch.object(allocator, '_reserve_block', side_effect=lambda tenant_id, size: blocks[tenant_id]):
+            self.assertEqual(
+                [allocator.allocate(tenant, 5) for tenant in ('tenant-a', 'tenant-b', 'tenant-a')],
+                [1, 6, 2],
+            )
+
+
+class StateMachineTests(SimpleTestCase):
+    def test_every_status_has_an_entry(self):
+        self.assertEqual(set(TRANSITIONS), set(OrderStatus.values))
+        for targets in TRANSITIONS.values():
+            self.assertLessEqual(targets, set(OrderStatus.values))
+
+    def test_allowed_edges(self):
+        for from_status, to_status in [
+            (OrderStatus.DRAFT, OrderStatus.PENDING_PAYMENT),
+            (OrderStatus.PENDING_PAYMENT, OrderStatus.PAID),
+            (OrderStatus.QUOTE_SENT, OrderStatus.PAID),
+            (OrderStatus.PAID, OrderStatus.SHIPPED),
+            (OrderStatus.SHIPPED, OrderStatus.DELIVERED),
+            (OrderStatus.DELIVERED, OrderStatus.REFUNDED),
+        ]:
+            self.assertTrue(can_transition(from_status, to_status), (from_status, to_status))
+
+    def test_rejected_edges(self):
+        for from_status, to_status in [
+            (OrderStatus.DRAFT, OrderStatus.PAID),
+            (OrderStatus.PENDING_PAYMENT, OrderStatus.SHIPPED),
+            (OrderStatus.DELIVERED, OrderStatus.PAID),
+            (OrderStatus.SHIPPED, OrderStatus.CANCELLED),
+            (OrderStatus.CANCELLED, OrderStatus.PENDING_PAYMENT),
+        ]:
+            self.assertFalse(can_transition(from_status, to_status), (from_status, to_status))
+            with self.assertRaises(InvalidTransition):
+                check_transition(from_status, to_status)
+
+    def test_cancelled_is_final(self):
+        self.assertEqual(TRANSITIONS[OrderStatus.CANCELLED], set())
+
+
+@mock.patch('orders.state_machine.release_order_stock')
+@mock.patch('orders.state_machine.flag_short_stock')
+@mock.patch('orders.state_machine.commit_order_stock', return_value=[])
+class TransitionTests(SimpleTestCase):
+    def order(self, status, **fields):
+        order = Order(status=status, order_number='ACME-000001', **fields)
+        order.save = mock.Mock()
+        return order
+
+    def test_paid_stamps_and_commits_stock(self, commit, flag, release):
+        order = self.order(OrderStatus.PENDING_PAYMENT)
+        transition(order, OrderStatus.PAID)
+
+        self.assertEqual(order.status, OrderStatus.PAID)
+        self.assertIsNotNone(order.paid_at)
+        order.save.assert_called_once_with()
+        commit.assert_called_once_with(order)
+        flag.assert_called_once_with(order, [])
+        release.assert_not_called()
+
+    def test_cancelled_releases_stock(self, commit, flag, release):
+        order = self.order(OrderStatus.PENDING_PAYMENT)
+        transition(order, OrderStatus.CANCELLED)
+
+        self.assertIsNotNone(order.cancelled_at)
+        release.assert_called_once_with(order)
+        commit.assert_not_called()
+
+    def test_rejected_transition_saves_nothing(self, commit, flag, release):
+        order = self.order(OrderStatus.DELIVERED)
+        with self.assertRaises(InvalidTransition):
+            transition(order, OrderStatus.PAID)
+
+        self.assertEqual(order.status, OrderStatus.DELIVERED)
+        order.save.assert_not_called()
+        commit.assert_not_called()
+
+    def test_same_status_keeps_timestamp_and_adds_note(self, commit, flag, release):
+        shipped_at = datetime(2024, 5, 1, tzinfo=dt_timezone.utc)
+        order = self.order(OrderStatus.SHIPPED, shipped_at=shipped_at, internal_notes='Packed')
+        transition(order, OrderStatus.SHIPPED, note='Tracking sent')
+
+        self.assertEqual(order.shipped_at, shipped_at)
+        self.assertTrue(order.internal_notes.startswith('Packed\n\n['))
+        self.assertTrue(order.internal_notes.endswith('] Tracking sent'))
+        order.save.assert_called_once_with()
+
+
+class TransitionEmailTests(SimpleTestCase):
+    def order(self, status):
+        return Order(status=status, updated_at=datetime(2024, 5, 1, tzinfo=dt_timezone.utc))
+
+    def templates(self, order, previous_status, created=False):
+        return [template for _, template, _, _ in transition_emails(order, previous_status, created)]
+
+    def test_paid_sends_confirmations(self):
+        order = self.order(OrderStatus.PAID)
+        self.assertEqual(
+            self.templates(order, OrderStatus.PENDING_PAYMENT),
+            ['order_confirmation', 'new_order_notification'],
+        )
+        self.assertEqual(self.templates(order, OrderStatus.PAID), [])
+
+    def test_status_update_only_on_change(self):
+        order = self.order(OrderStatus.SHIPPED)
+        self.assertEqual(self.templates(order, OrderStatus.PAID), ['order_status_update'])
+        self.assertEqual(self.templates(order, OrderStatus.SHIPPED), [])
+        self.assertEqual(self.templates(self.order(OrderStatus.PENDING_PAYMENT), OrderStatus.DRAFT), [])
+
+    def test_resent_quote_gets_a_new_email(self):
+        order = self.order(OrderStatus.QUOTE_SENT)
+        [(_, template, first_key, context)] = transition_emails(order, OrderStatus.QUOTE_REQUESTED)
+        self.assertEqual((template, context), ('order_status_update', {'status': 'QuoteSent'}))
+
+        order.updated_at = datetime(2024, 5, 2, tzinfo=dt_timezone.utc)
+        [(_, _, second_key, _)] = transition_emails(order, OrderStatus.QUOTE_SENT)
+        self.assertNotEqual(first_key, second_key)
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'order-tests',
+}})
+class OrderTestCase(TestCase):
+    """A tenant with one stock-managed variant (5 units) and helpers to place orders on it."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name='Acme', slug='acme')
+        cls.product = Product.objects.create(tenant=cls.tenant, name='Silla', slug='silla', status='Published')
+        cls.variant = ProductVariant.objects.create(
+            tenant=cls.tenant, product=cls.product, sku='SILLA-1', price=1000, stock_quantity=5
+        )
+        cls.customer = Customer.objects.create(tenant=cls.tenant, email='cliente@acme.cl')
+
+    def order(self, quantity, status=OrderStatus.PENDING_PAYMENT, stock_status=StockStatus.RESERVED, **fields):
+        fields.setdefault('customer_email', self.customer.email)
+        order = Order.objects.create(
+            tenant=self.tenant, customer=self.customer, order_number=f"ACME-{Order.objects.count() + 1:06d}",
+            status=status, stock_status=stock_status, **fields,
+        )
+        OrderItem.objects.create(
+            tenant=self.tenant, order=order, product_variant=self.variant, product_name='Silla', sku='SILLA-1',
+            unit_price=1000, quantity=quantity, subtotal=1000 * quantity, tax_amount=0, total=1000 * quantity,
+        )
+        return order
+
+    def set_stock(self, stock_quantity, reserved_quantity=0):
+        ProductVariant.objects.filter(pk=self.variant.pk).update(
+            stock_quantity=stock_quantity, reserved_quantity=reserved_quantity
+        )
+
+    def stock(self):
+        """(stock_quantity, reserved_quantity) of the variant."""
+        self.variant.refresh_from_db()
+        return self.variant.stock_quantity, self.variant.reserved_quantity
+
+
+class ReserveStockTests(OrderTestCase):
+    def test_reserves_available_stock(self):
+        self.assertEqual(reserve_stock({self.variant.pk: 3}), [])
+        self.assertEqual(reserve_stock({self.variant.pk: 2}), [])
+        self.assertEqual(self.stock(), (5, 5))
+
+    def test_over_reservation_rejected(self):
+        self.set_stock(5, reserved_quantity=4)
+        self.assertEqual(reserve_stock({self.variant.pk: 2}), [self.variant.pk])
+        self.assertEqual(self.stock(), (5, 4))
+
+    def checkout(self, quantity):
+        request = APIRequestFactory().post('/api/orders/', {
+            'order_type': 'Sale',
+            'customer_email': 'cliente@acme.cl',
+            'shipping_recipient_name': 'Cliente',
+            'shipping_phone': '+56911111111',
+            'is_store_pickup': True,
+            'items': [{'product_variant_id': str(self.variant.pk), 'quantity': quantity}],
+        }, format='json')
+        request.tenant = self.tenant
+        return OrderViewSet.as_view({'post': 'create'})(request)
+
+    def test_checkout_reserves_stock(self):
+        response = self.checkout(3)
+
+        self.assertEqual(response.status_code, 201, response.data)
+        order = Order.objects.get(pk=response.data['id'])
+        self.assertEqual(order.stock_status, StockStatus.RESERVED)
+        self.assertEqual(self.stock(), (5, 3))
+
+    def test_checkout_without_stock_rolls_back(self):
+        self.set_stock(5, reserved_quantity=3)
+        response = self.checkout(3)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['unavailable_items'], [
+            {'product_variant_id': str(self.variant.pk), 'product_name': 'Silla', 'quantity': 3},
+        ])
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.stock(), (5, 3))
+
+
+class CommitReleaseTests(OrderTestCase):
+    def test_commit_from_reserved(self):
+        self.set_stock(5, reserved_quantity=2)
+        order = self.order(2)
+
+        self.assertEqual(commit_order_stock(order), [])
+        self.assertEqual(order.stock_status, StockStatus.COMMITTED)
+        self.assertEqual(self.stock(), (3, 0))
+
+    def test_commit_from_released_takes_available_stock(self):
+        order = self.order(2, stock_status=StockStatus.RELEASED)
+
+        self.assertEqual(commit_order_stock(order), [])
+        self.assertEqual(self.stock(), (3, 0))
+
+    def test_late_payment_never_oversells(self):
+        # Released at expiry, then 4 of the 5 units reserved by another order
+        self.set_stock(5, reserved_quantity=4)
+        order = self.order(2, stock_status=StockStatus.RELEASED)
+
+        short = commit_order_stock(order)
+        self.assertEqual(short, [str(self.variant.pk)])
+        self.assertEqual(self.stock(), (5, 4))
+
+        flag_short_stock(order, short)
+        order.refresh_from_db()
+        self.assertIn('fulfil manually: SILLA-1', order.internal_notes)
+
+    def test_commit_twice_is_a_no_op(self):
+        self.set_stock(5, reserved_quantity=2)
+        order = self.order(2)
+        commit_order_stock(order)
+
+        self.assertEqual(commit_order_stock(Order.objects.get(pk=order.pk)), [])
+        self.assertEqual(self.stock(), (3, 0))
+
+    def test_release_twice_is_a_no_op(self):
+        self.set_stock(5, reserved_quantity=2)
+        order = self.order(2)
+
+        self.assertTrue(release_order_stock(order))
+        self.assertFalse(release_order_stock(Order.objects.get(pk=order.pk)))
+        self.assertEqual(self.stock(), (5, 0))
+
+    def test_release_after_commit_is_a_no_op(self):
+        self.set_stock(5, reserved_quantity=2)
+        order = self.order(2)
+        commit_order_stock(order)
+
+        self.assertFalse(release_order_stock(order))
+        self.assertEqual(self.stock(), (3, 0))
+
+    def test_bulk_commit_reports_short_orders(self):
+        self.set_stock(4, reserved_quantity=2)
+        reserved = self.order(2)
+        late = self.order(1, stock_status=StockStatus.RELEASED)
+        too_late = self.order(3, stock_status=StockStatus.RELEASED)
+
+        short = commit_orders_stock([reserved.pk, late.pk, too_late.pk])
+        self.assertEqual(short, {str(too_late.pk): [str(self.variant.pk)]})
+        self.assertEqual(self.stock(), (1, 0))
+        self.assertEqual(commit_orders_stock([reserved.pk, late.pk, too_late.pk]), {})
+        self.assertEqual(self.stock(), (1, 0))
+
+    def test_bulk_release_only_reserved_orders(self):
+        self.set_stock(5, reserved_quantity=3)
+        first, second = self.order(1), self.order(2)
+        committed = self.order(1, stock_status=StockStatus.COMMITTED)
+
+        released = release_orders_stock([first.pk, second.pk, committed.pk])
+        self.assertEqual(sorted(released), sorted([str(first.pk), str(second.pk)]))
+        self.assertEqual(self.stock(), (5, 0))
+        self.assertEqual(release_orders_stock([first.pk, second.pk]), [])
+
+
+class ReleaseExpiredReservationsTests(OrderTestCase):
+    def expired(self, *args, **kwargs):
+        order = self.order(*args, **kwargs)
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(hours=2))
+        return order
+
+    def counters(self):
+        return dict(OrderStatusCounter.objects.filter(tenant=self.tenant, count__gt=0).values_list('status', 'count'))
+
+    def test_releases_expired_pending_orders(self):
+        self.set_stock(5, reserved_quantity=5)
+        expired = self.expired(2)
+        fresh = self.order(3)
+
+        self.assertEqual(release_expired_reservations(), 1)
+
+        expired.refresh_from_db()
+        self.assertEqual((expired.status, expired.stock_status), (OrderStatus.CANCELLED, StockStatus.RELEASED))
+        self.assertIsNotNone(expired.cancelled_at)
+        self.assertIn('stock reservation expired', expired.internal_notes)
+        fresh.refresh_from_db()
+        self.assertEqual((fresh.status, fresh.stock_status), (OrderStatus.PENDING_PAYMENT, StockStatus.RESERVED))
+        self.assertEqual(self.stock(), (5, 3))
+        self.assertEqual(self.counters(), {OrderStatus.PENDING_PAYMENT: 1, OrderStatus.CANCELLED: 1})
+
+    def test_cancels_orders_released_by_a_failed_payment(self):
+        self.set_stock(5, reserved_quantity=5)
+        failed = self.expired(3)
+        release_order_stock(failed)
+
+        self.assertEqual(release_expired_reservations(), 1)
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.stock_status), (OrderStatus.CANCELLED, StockStatus.RELEASED))
+        # Its units were given back when the payment failed, not a second time
+        self.assertEqual(self.stock(), (5, 2))
+        self.assertEqual(self.counters(), {OrderStatus.CANCELLED: 1})
+
+    def test_other_orders_untouched(self):
+        self.set_stock(5, reserved_quantity=2)
+        quote = self.expired(1, status=OrderStatus.QUOTE_REQUESTED, stock_status=StockStatus.NOT_RESERVED)
+        paid = self.expired(1, status=OrderStatus.PAID, stock_status=StockStatus.COMMITTED)
+        draft = self.expired(2, status=OrderStatus.DRAFT)
+
+        self.assertEqual(release_expired_reservations(), 0)
+        for order in (quote, paid, draft):
+            self.assertEqual(Order.objects.get(pk=order.pk).status, order.status)
+        self.assertEqual(self.stock(), (5, 2))
+
+    def test_tenant_ttl(self):
+        Tenant.objects.filter(pk=self.tenant.pk).update(reservation_ttl_minutes=180)
+        self.set_stock(5, reserved_quantity=2)
+        self.expired(2)
+
+        self.assertEqual(release_expired_reservations(), 0)
+        self.assertEqual(release_expired_reservations(now=timezone.now() + timedelta(hours=2)), 1)
+        self.assertEqual(self.stock(), (5, 0))
+
+    def test_batches(self):
+        self.set_stock(5, reserved_quantity=3)
+        for _ in range(3):
+            self.expired(1)
+
+        self.assertEqual(release_expired_reservations(batch_size=2), 2)
+        self.assertEqual(release_expired_reservations(batch_size=2), 1)
+        self.assertEqual(release_expired_reservations(batch_size=2), 0)
+        self.assertEqual(self.stock(), (5, 0))
+        self.assertEqual(self.counters(), {OrderStatus.CANCELLED: 3})
+
+
+class EmailRenderTests(OrderTestCase):
+    def test_single_send_matches_batch(self):
+        orders = [self.order(2), self.order(1)]
+        for name in ITEM_EMAILS:
+            single = [render_email(name, Order.objects.get(pk=order.pk)) for order in orders]
+            batch = [params for _, params in render_batch(name, Order.objects.filter(pk__in=[o.pk for o in orders]))]
+            self.assertCountEqual(single, batch, name)
+            # The second order's single line (quantity 1), or its line count
+            self.assertIn('>1<', single[1]['html'], name)
+
+
+class TrackedFieldsTests(OrderTestCase):
+    def test_new_instance(self):
+        order = Order(tenant=self.tenant, customer=self.customer, status=OrderStatus.PENDING_PAYMENT)
+        self.assertTrue(order.has_changed('status'))
+        self.assertIsNone(order.previous_value('status'))
+
+    def test_loaded_values(self):
+        order = Order.objects.get(pk=self.order(1).pk)
+        self.assertEqual(order.previous_value('status'), OrderStatus.PENDING_PAYMENT)
+        self.assertEqual(order.get_dirty_fields(), {})
+
+        order.status = OrderStatus.PAID
+        self.assertEqual(order.get_dirty_fields(), {'status': OrderStatus.PENDING_PAYMENT})
+
+    def test_save_moves_the_snapshot_after_the_signals(self):
+        order = Order.objects.get(pk=self.order(1).pk)
+        seen = []
+
+        def receiver(sender, instance, **kwargs):
+            seen.append(instance.get_dirty_fields())
+        post_save.connect(receiver, sender=Order)
+        self.addCleanup(post_save.disconnect, receiver, sender=Order)
+
+        order.status = OrderStatus.PAID
+        order.save()
+        self.assertEqual(seen, [{'status': OrderStatus.PENDING_PAYMENT}])
+        self.assertEqual(order.get_dirty_fields(), {})
+        self.assertEqual(order.previous_value('status'), OrderStatus.PAID)
+
+    def test_update_fields_only_snapshots_saved_fields(self):
+        order = Order.objects.get(pk=self.order(1).pk)
+        order.status = OrderStatus.PAID
+        order.internal_notes = 'Llamar antes'
+        order.save(update_fields=['internal_notes'])
+
+        self.assertEqual(order.get_dirty_fields(), {'status': OrderStatus.PENDING_PAYMENT})
+
+    def test_refresh_from_db(self):
+        order = Order.objects.get(pk=self.order(1).pk)
+        Order.objects.filter(pk=order.pk).update(status=OrderStatus.CANCELLED)
+        order.refresh_from_db()
+
+        self.assertEqual(order.previous_value('status'), OrderStatus.CANCELLED)
+        self.assertEqual(order.get_dirty_fields(), {})
+
+    def test_deferred_field_snapshotted_when_loaded(self):
+        order = Order.objects.only('id').get(pk=self.order(1).pk)
+        self.assertFalse(order.has_changed('deleted_at'))
+        self.assertIsNone(order.previous_value('status'))
+
+        self.assertEqual(order.status, OrderStatus.PENDING_PAYMENT)
+        self.assertEqual(order.previous_value('status'), OrderStatus.PENDING_PAYMENT)
+        self.assertFalse(order.has_changed('status'))
+
+
+class OrderCounterTests(OrderTestCase):
+    def assertCountersMatchOrders(self):
+        self.assertEqual(counter_stats(self.tenant.id), aggregate_order_stats(self.tenant.id))
+
+    def test_create_and_transition(self):
+        order = self.order(1)
+        self.assertEqual(counter_stats(self.tenant.id)['by_status'][OrderStatus.PENDING_PAYMENT], 1)
+
+        order.status = OrderStatus.PAID
+        order.save()
+        stats = counter_stats(self.tenant.id)
+        self.assertEqual(stats['by_status'][OrderStatus.PENDING_PAYMENT], 0)
+        self.assertEqual(stats['by_status'][OrderStatus.PAID], 1)
+        self.assertEqual(stats['total'], 1)
+        self.assertCountersMatchOrders()
+
+    def test_order_type_change(self):
+        order = self.order(1, status=OrderStatus.QUOTE_REQUESTED)
+        order.order_type = 'Quote'
+        order.save()
+
+        self.assertEqual(counter_stats(self.tenant.id)['by_type'], {'Sale': 0, 'Quote': 1})
+        self.assertCountersMatchOrders()
+
+    def test_soft_delete_restore_and_delete(self):
+        order = self.order(1)
+        order.deleted_at = timezone.now()
+        order.save()
+        self.assertEqual(counter_stats(self.tenant.id)['total'], 0)
+
+        order.deleted_at = None
+        order.save()
+        self.assertEqual(counter_stats(self.tenant.id)['total'], 1)
+
+        order.delete()
+        self.assertEqual(counter_stats(self.tenant.id)['total'], 0)
+        self.assertCountersMatchOrders()
+
+    def test_bulk_transition_and_sweeper(self):
+        orders = [self.order(1) for _ in range(3)]
+        bulk_transition(self.tenant, [order.pk for order in orders[:2]], OrderStatus.PAID)
+        Order.objects.filter(pk=orders[2].pk).update(created_at=timezone.now() - timedelta(hours=2))
+        release_expired_reservations()
+
+        stats = counter_stats(self.tenant.id)
+        self.assertEqual(stats['by_status'][OrderStatus.PAID], 2)
+        self.assertEqual(stats['by_status'][OrderStatus.CANCELLED], 1)
+        self.assertCountersMatchOrders()
+
+    def test_decrements_never_go_below_zero(self):
+        apply_counter_deltas({(str(self.tenant.id), OrderStatus.SHIPPED, 'Sale'): -1})
+        self.order(1)
+        apply_counter_deltas({(str(self.tenant.id), OrderStatus.PENDING_PAYMENT, 'Sale'): -5})
+
+        self.assertEqual(counter_stats(self.tenant.id)['total'], 0)
+
+    def test_rebuild_restores_drifted_counters(self):
+        for status in (OrderStatus.PENDING_PAYMENT, OrderStatus.PAID, OrderStatus.PAID):
+            self.order(1, status=status)
+        # Drift, as raw SQL or QuerySet.update() would cause
+        Order.objects.filter(status=OrderStatus.PENDING_PAYMENT).update(status=OrderStatus.SHIPPED)
+        deltas = new_deltas()
+        deltas[(str(self.tenant.id), OrderStatus.DELIVERED, 'Sale')] += 4
+        apply_counter_deltas(deltas)
+        self.assertNotEqual(counter_stats(self.tenant.id), aggregate_order_stats(self.tenant.id))
+
+        self.assertEqual(rebuild_counters(self.tenant.id), 1)
+        self.assertCountersMatchOrders()
+
+
+class SalesRollupTests(OrderTestCase):
+    def setUp(self):
+        ProductVariant.objects.filter(pk=self.variant.pk).update(cost=600)
+
+    def rollups(self):
+        """Every non-empty rollup row, without ids."""
+        return {
+            'daily': set(SalesDailyRollup.objects.filter(orders_count__gt=0).values_list(
+                'tenant_id', 'day', 'orders_count', 'revenue', 'cost')),
+            'hourly': set(SalesHourlyRollup.objects.filter(orders_count__gt=0).values_list(
+                'tenant_id', 'hour', 'orders_count', 'revenue')),
+            'products': set(ProductSalesDailyRollup.objects.filter(quantity__gt=0).values_list(
+                'tenant_id', 'day', 'product_name', 'sku', 'quantity', 'revenue')),
+            'customers': set(CustomerSalesRollup.objects.filter(orders_count__gt=0).values_list(
+                'tenant_id', 'customer_email', 'orders_count', 'ltv')),
+        }
+
+    def assertRollupsMatchOrders(self):
+        incremental = self.rollups()
+        sales = Order.objects.filter(status__in=SALE_STATUSES, order_type='Sale')
+        lines = OrderItem.objects.filter(order__in=sales)
+
+        live = sales.aggregate(orders=Count('id'), revenue=Sum('total'))
+        cost = lines.aggregate(cost=Sum(F('quantity') * F('product_variant__cost')))['cost'] or 0
+        self.assertEqual(
+            (sum(row[2] for row in incremental['daily']), sum(row[3] for row in incremental['daily']),
+             sum(row[4] for row in incremental['daily'])),
+            (live['orders'], live['revenue'] or 0, cost),
+        )
+        self.assertEqual(
+            {(email, count, ltv) for _, email, count, ltv in incremental['customers']},
+            set(sales.values('customer_email').annotate(n=Count('id'), ltv=Sum('total'))
+                .values_list('customer_email', 'n', 'ltv')),
+        )
+        self.assertEqual(
+            {(sku, quantity, revenue) for *_, sku, quantity, revenue in incremental['products']},
+            set(lines.values('sku').annotate(q=Sum('quantity'), r=Sum('total')).values_list('sku', 'q', 'r')),
+        )
+
+        rebuild_rollups(self.tenant.id)
+        self.assertEqual(self.rollups(), incremental)
+
+    def pay(self, order):
+        order.status = OrderStatus.PAID
+        order.save()
+
+    def test_paid_orders_enter_the_rollups(self):
+        self.pay(self.order(2, total=2000))
+        self.pay(self.order(1, total=1000, customer_email='otro@acme.cl'))
+        self.order(3, total=3000)  # unpaid
+
+        self.assertEqual(sum(row[2] for row in self.rollups()['daily']), 2)
+        self.assertRollupsMatchOrders()
+
+    def test_cancelled_refunded_and_deleted_orders_leave_them(self):
+        cancelled, refunded, deleted, kept = (self.order(1, total=1000) for _ in range(4))
+        for order in (cancelled, refunded, deleted, kept):
+            self.pay(order)
+
+        cancelled.status = OrderStatus.CANCELLED
+        cancelled.save()
+        refunded.status = OrderStatus.REFUNDED
+        refunded.save()
+        deleted.delete()
+
+        self.assertEqual(sum(row[2] for row in self.rollups()['daily']), 1)
+        self.assertRollupsMatchOrders()
+
+    def test_fulfilment_keeps_the_sale(self):
+        order = self.order(2, total=2000)
+        self.pay(order)
+        for status in (OrderStatus.PROCESSING, OrderStatus.SHIPPED, OrderStatus.DELIVERED):
+            order.status = status
+            order.save()
+
+        self.assertEqual(sum(row[2] for row in self.rollups()['daily']), 1)
+        self.assertRollupsMatchOrders()
+
+    def test_bulk_transition(self):
+        orders = [self.order(1, total=1000) for _ in range(3)]
+        bulk_transition(self.tenant, [order.pk for order in orders], OrderStatus.PAID)
+        bulk_transition(self.tenant, [orders[0].pk], OrderStatus.REFUNDED)
+
+        self.assertEqual(sum(row[2] for row in self.rollups()['daily']), 2)
+        self.assertRollupsMatchOrders()
+
+    def test_rebuild_repairs_drift(self):
+        order = self.order(2, total=2000)
+        self.pay(order)
+        # Total edited after payment: only the reconciliation sees it
+        Order.objects.filter(pk=order.pk).update(total=1500)
+
+        rebuild_rollups(self.tenant.id)
+        self.assertEqual({row[3] for row in self.rollups()['daily']}, {1500})
+        self.assertRollupsMatchOrders()
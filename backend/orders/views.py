@@ -10,7 +10,8 @@ from decimal import Decimal
 from datetime import timedelta
 from django.conf import settings
 from core.models import Commune
-from .models import Customer, ShippingZone, Order, OrderItem, DiscountCoupon, CouponUsage, DiscountType
+from .models import Customer, ShippingZone, Order, OrderItem, OrderStatus, DiscountCoupon, CouponUsage, DiscountType, StockStatus
+from .state_machine import InvalidTransition, transition
 from .serializers import (
     ShippingZoneSerializer,
     OrderSerializer,
@@ -25,9 +26,11 @@ from .serializers_phase4 import (
 from .email_service import (
     send_order_confirmation_email, 
     send_new_order_notification,
-    send_quote_response_notification
 )
 from products.models import ProductVariant
+from .email_outbox import enqueue_email, quote_sent_email
+from .inventory import reserve_stock, commit_order_stock, flag_short_stock
+from .numbering import allocate_order_number
 
 
 class ShippingZoneViewSet(viewsets.ReadOnlyModelViewSet):
@@ -203,6 +206,17 @@ class StorefrontCommuneViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(result)
 
 
+def get_item_image_url(variant):
+    """Image snapshot for an order line: variant image, else primary product image, else first image."""
+    if variant.image_url:
+        return variant.image_url
+    images = list(variant.product.images.all())  # prefetched
+    primary = next((image for image in images if image.is_primary), None)
+    if primary:
+        return primary.url
+    return images[0].url if images else None
+
+
 class OrderViewSet(viewsets.ModelViewSet):
     """Orders for the storefront"""
     serializer_class = OrderSerializer
@@ -249,16 +263,8 @@ class OrderViewSet(viewsets.ModelViewSet):
                 }
             )
             
-            # Generate order number
-            last_order = Order.objects.filter(tenant=tenant).order_by('-created_at').first()
-            if last_order and last_order.order_number:
-                try:
-                    last_number = int(last_order.order_number.split('-')[-1])
-                    order_number = f"{tenant.slug.upper()}-{last_number + 1:06d}"
-                except:
-                    order_number = f"{tenant.slug.upper()}-000001"
-            else:
-                order_number = f"{tenant.slug.upper()}-000001"
+            # Generate order number (atomic per-tenant counter, safe under concurrent checkouts)
+            order_number = allocate_order_number(tenant)
             
             # Determine if this is a quote
             is_quote = data['order_type'] == 'Quote'
@@ -278,13 +284,20 @@ class OrderViewSet(viewsets.ModelViewSet):
             subtotal = Decimal('0')
             tax_amount = Decimal('0')
             
-            # Validate items and calculate subtotal
+            # Validate items and calculate subtotal (one query for every variant in the cart)
+            variant_ids = [item_data['product_variant_id'] for item_data in data['items']]
+            variants = ProductVariant.objects.filter(tenant=tenant).select_related(
+                'product'
+            ).prefetch_related('product__images').in_bulk(variant_ids)
+
+            requested = {}
+            for item_data in data['items']:
+                variant_id = item_data['product_variant_id']
+                requested[variant_id] = requested.get(variant_id, 0) + item_data['quantity']
+
             items_data = []
             for item_data in data['items']:
-                variant = ProductVariant.objects.filter(
-                    id=item_data['product_variant_id'],
-                    tenant=tenant
-                ).select_related('product').first()
+                variant = variants.get(item_data['product_variant_id'])
                 
                 if not variant:
                     return Response(
@@ -292,14 +305,6 @@ class OrderViewSet(viewsets.ModelViewSet):
                         status=status.HTTP_404_NOT_FOUND
                     )
                 
-                # Check stock if product manages stock (skip for quotes)
-                if not is_quote and variant.product.manage_stock:
-                    if variant.available_stock < item_data['quantity']:
-                        return Response(
-                            {'error': f'Insufficient stock for {variant.product.name}'},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-                
                 # Calculate item total
                 p = variant.price
                 cp = variant.compare_at_price
@@ -335,6 +340,35 @@ class OrderViewSet(viewsets.ModelViewSet):
                     'total': item_total
                 })
             
+            # Reserve stock for sales with one conditional UPDATE (never oversells
+            # under concurrent checkouts); quotes do not hold stock
+            stock_status = StockStatus.NOT_RESERVED
+            if not is_quote:
+                to_reserve = {
+                    variant_id: quantity
+                    for variant_id, quantity in requested.items()
+                    if variants[variant_id].product.manage_stock
+                }
+                failed = reserve_stock(to_reserve)
+                if failed:
+                    transaction.set_rollback(True)
+                    return Response(
+                        {
+                            'error': f'Insufficient stock for {variants[failed[0]].product.name}',
+                            'unavailable_items': [
+                                {
+                                    'product_variant_id': str(variant_id),
+                                    'product_name': variants[variant_id].product.name,
+                                    'quantity': requested[variant_id],
+                                }
+                                for variant_id in failed
+                            ]
+                        },
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                if to_reserve:
+                    stock_status = StockStatus.RESERVED
+            
             # Calculate shipping (skip for quotes)
             shipping_cost = Decimal('0')
             if not is_quote and not data.get('is_store_pickup') and shipping_zone:
@@ -399,6 +433,7 @@ class OrderViewSet(viewsets.ModelViewSet):
                 order_number=order_number,
                 order_type=data['order_type'],
                 status='QuoteRequested' if data['order_type'] == 'Quote' else 'PendingPayment',
+                stock_status=stock_status,
                 customer_email=data['customer_email'],
                 customer_phone=data.get('customer_phone', ''),
                 
@@ -429,43 +464,25 @@ class OrderViewSet(viewsets.ModelViewSet):
                 estimated_delivery_date=data.get('estimated_delivery_date')
             )
             
-            # Create order items
-            for item_data in items_data:
-                variant = item_data['variant']
-                product_image_url = None
-                try:
-                    if variant.image_url:
-                        product_image_url = variant.image_url
-                    elif variant.product.images.filter(is_primary=True).exists():
-                        primary_image = variant.product.images.filter(is_primary=True).first()
-                        if primary_image:
-                            product_image_url = primary_image.url
-                    elif variant.product.images.exists():
-                        first_image = variant.product.images.first()
-                        if first_image:
-                            product_image_url = first_image.url
-                except Exception as e:
-                    logger.error(f"Error getting product image: {e}")
-                
-                OrderItem.objects.create(
+            # Create order items with a single INSERT
+            OrderItem.objects.bulk_create([
+                OrderItem(
                     tenant=tenant,
                     order=order,
-                    product_variant=variant,
-                    product_name=variant.product.name,
-                    variant_name=variant.name or '',
-                    sku=variant.sku,
-                    attributes_snapshot=variant.attributes,
+                    product_variant=item_data['variant'],
+                    product_name=item_data['variant'].product.name,
+                    variant_name=item_data['variant'].name or '',
+                    sku=item_data['variant'].sku,
+                    attributes_snapshot=item_data['variant'].attributes,
                     unit_price=item_data['unit_price'],
                     quantity=item_data['quantity'],
                     subtotal=item_data['subtotal'],
                     tax_amount=item_data['tax_amount'],
                     total=item_data['total'],
-                    product_image_url=product_image_url
+                    product_image_url=get_item_image_url(item_data['variant'])
                 )
-                
-                if variant.product.manage_stock:
-                    variant.reserved_quantity += item_data['quantity']
-                    variant.save(update_fields=['reserved_quantity'])
+                for item_data in items_data
+            ])
             
             # Record Coupon Usage
             if applied_coupon and coupon_discount > 0:
@@ -480,13 +497,10 @@ class OrderViewSet(viewsets.ModelViewSet):
                 applied_coupon.current_uses = F('current_uses') + 1
                 applied_coupon.save(update_fields=['current_uses'])
                 
-            # Send email notification for quote requests
+            # Queue email notifications for quote requests (sent by the outbox worker)
             if is_quote:
-                try:
-                    from .email_service import send_quote_request_notification
-                    send_quote_request_notification(order)
-                except Exception as e:
-                    logger.error(f"Failed to send quote request email: {e}")
+                enqueue_email(order, 'quote_received_confirmation')
+                enqueue_email(order, 'quote_request_notification')
             
             # Return created order
             response_serializer = OrderSerializer(order)
@@ -570,17 +584,10 @@ class OrderViewSet(viewsets.ModelViewSet):
         order.internal_notes = data.get('internal_notes', '')
         order.save()
         
-        logger.info(f"Quote {order.order_number} updated. Sending email to {order.customer_email}")
+        logger.info(f"Quote {order.order_number} updated. Queueing email to {order.customer_email}")
         
-        # Send quote response email
-        try:
-            response = send_quote_response_notification(order)
-            logger.info(f"Email sent response: {response}")
-        except Exception as e:
-            logger.exception(f"CRITICAL: Failed to send quote response email: {e}")
-            # Log traceback
-            import traceback
-            logger.error(traceback.format_exc())
+        # Sent by the outbox worker; the post_save signal queues the same key
+        enqueue_email(*quote_sent_email(order))
         
         return Response(OrderSerializer(order).data)
     
@@ -608,17 +615,9 @@ class OrderViewSet(viewsets.ModelViewSet):
             order.internal_notes = (order.internal_notes or '') + '\n' + data['internal_notes']
         order.save()
         
-        # Decrement stock and release reserved stock
-        for item in order.items.all():
-            variant = item.product_variant
-            if variant.product.manage_stock:
-                # Decrement actual stock
-                variant.stock_quantity -= item.quantity
-                # Release reserved stock
-                variant.reserved_quantity -= item.quantity
-                variant.save(update_fields=['stock_quantity', 'reserved_quantity'])
-        
-                variant.save(update_fields=['stock_quantity', 'reserved_quantity'])
+        # Decrement stock and release the reservation (no-op if already committed);
+        # lines sold out meanwhile are flagged for manual fulfilment
+        flag_short_stock(order, commit_order_stock(order))
         
         # Emails are now handled by signals.py when status changes to 'Paid'
 
@@ -628,36 +627,20 @@ class OrderViewSet(viewsets.ModelViewSet):
     @transaction.atomic
     def mark_shipped(self, request, pk=None):
         """Mark order as shipped"""
-        order = self.get_object()
-        
-        if order.status != 'Paid':
-            return Response(
-                {'error': 'Order must be paid before shipping'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        order.status = 'Shipped'
-        order.shipped_at = timezone.now()
-        order.save()
-        
-        return Response(OrderSerializer(order).data)
+        return self._transition(OrderStatus.SHIPPED)
     
     @action(detail=True, methods=['post'])
     @transaction.atomic
     def mark_delivered(self, request, pk=None):
         """Mark order as delivered"""
+        return self._transition(OrderStatus.DELIVERED)
+    
+    def _transition(self, to_status):
         order = self.get_object()
-        
-        if order.status != 'Shipped':
-            return Response(
-                {'error': 'Order must be shipped before delivery'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        order.status = 'Delivered'
-        order.delivered_at = timezone.now()
-        order.save()
-        
+        try:
+            transition(order, to_status)
+        except InvalidTransition as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         return Response(OrderSerializer(order).data)
 
 from rest_framework.views import APIView
@@ -0,0 +1,178 @@
+"""
+Product listing engine shared by every storefront endpoint that lists products
+(product list, home data, category pages and related products).
+
+Per-product figures (min/max price, variants count, stock, discount flag and
+primary image) live in the denormalised ProductSummary table. Listings join one
+narrow row per product instead of aggregating product_variants on every request.
+
+Summaries are refreshed in the same transaction as the variant/image write.
+Code that touches many variants at once (checkout, payment confirmation, admin
+bulk edits) wraps the work in ``deferred_summary_refresh()`` so every affected
+product is refreshed with a single statement at the end of the block.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models import F, Value, BooleanField, IntegerField
+from django.db.models.functions import Coalesce
+
+from core.cache_registry import invalidate
+from core.cache_utils import invalidate_product_cache, product_tag
+
+from .models import Product
+
+
+# Set-based refresh: recompute and upsert the summary rows for the given products
+REFRESH_SUMMARIES_SQL = """
+INSERT INTO product_summaries (
+    product_id, tenant_id, min_price, max_price, min_compare_price,
+    variants_count, in_stock_variants_count, has_discount,
+    total_stock, total_reserved, primary_image_url, updated_at
+)
+SELECT
+    p.id,
+    p.tenant_id,
+    MIN(v.price),
+    MAX(v.price),
+    MIN(v.compare_at_price),
+    COUNT(v.id),
+    COUNT(v.id) FILTER (WHERE v.stock_quantity > 0),
+    COALESCE(BOOL_OR(
+        v.price IS NOT NULL AND v.compare_at_price IS NOT NULL
+        AND v.price <> v.compare_at_price
+    ), FALSE),
+    COALESCE(SUM(v.stock_quantity), 0),
+    COALESCE(SUM(v.reserved_quantity), 0),
+    (
+        SELECT i.url FROM product_images i
+        WHERE i.product_id = p.id AND i.deleted_at IS NULL
+        ORDER BY i.is_primary DESC, i.sort_order ASC
+        LIMIT 1
+    ),
+    NOW()
+FROM products p
+LEFT JOIN product_variants v
+    ON v.product_id = p.id AND v.is_active AND v.deleted_at IS NULL
+WHERE p.id = ANY(%s::uuid[])
+GROUP BY p.id
+ON CONFLICT (product_id) DO UPDATE SET
+    tenant_id = EXCLUDED.tenant_id,
+    min_price = EXCLUDED.min_price,
+    max_price = EXCLUDED.max_price,
+    min_compare_price = EXCLUDED.min_compare_price,
+    variants_count = EXCLUDED.variants_count,
+    in_stock_variants_count = EXCLUDED.in_stock_variants_count,
+    has_discount = EXCLUDED.has_discount,
+    total_stock = EXCLUDED.total_stock,
+    total_reserved = EXCLUDED.total_reserved,
+    primary_image_url = EXCLUDED.primary_image_url,
+    updated_at = EXCLUDED.updated_at
+"""
+
+
+def refresh_product_summaries(product_ids):
+    """
+    Recompute ProductSummary rows for the given product ids in one statement.
+    """
+    product_ids = sorted({str(pid) for pid in product_ids if pid})
+    if not product_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(REFRESH_SUMMARIES_SQL, [product_ids])
+
+
+def invalidate_listing_caches(tenant_ids):
+    """
+    Invalidate every product-dependent cache of the tenants once the
+    surrounding transaction commits, so no request can re-cache pre-commit data.
+    """
+    tenant_ids = {tid for tid in tenant_ids if tid}
+    if not tenant_ids:
+        return
+
+    def invalidate():
+        for tenant_id in tenant_ids:
+            invalidate_product_cache(tenant_id)
+
+    transaction.on_commit(invalidate)
+
+
+def invalidate_product_listings(products):
+    """
+    Invalidate the cached payloads showing these products ({product_id: tenant_id})
+    once the surrounding transaction commits (core/cache_registry.py).
+    """
+    by_tenant = {}
+    for product_id, tenant_id in products.items():
+        by_tenant.setdefault(tenant_id, []).append(product_tag(product_id))
+
+    def invalidate_products():
+        for tenant_id, tags in by_tenant.items():
+            invalidate(tenant_id, *tags)
+
+    transaction.on_commit(invalidate_products)
+
+
+_local = threading.local()
+
+
+def sync_product_summaries(products):
+    """
+    Refresh summaries for a {product_id: tenant_id} mapping and invalidate listings.
+    Inside ``deferred_summary_refresh()`` the work is queued until the block exits.
+    """
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        pending.update(products)
+        return
+    refresh_product_summaries(products.keys())
+    invalidate_product_listings(products)
+
+
+@contextmanager
+def deferred_summary_refresh():
+    """
+    Batch summary refreshes for every variant/image written inside the block.
+    The refresh runs once on exit (still inside the caller's transaction) and is
+    skipped if the block raises. Nested blocks join the outermost one.
+    """
+    if getattr(_local, 'pending', None) is not None:
+        yield
+        return
+
+    _local.pending = pending = {}
+    try:
+        yield
+    finally:
+        _local.pending = None
+    if pending:
+        sync_product_summaries(pending)
+
+
+# Attribute names expected by ProductListSerializer
+SUMMARY_ANNOTATIONS = {
+    'price': F('summary__min_price'),
+    'annotated_max_price': F('summary__max_price'),
+    'annotated_min_compare_price': F('summary__min_compare_price'),
+    'annotated_variants_count': Coalesce(F('summary__variants_count'), Value(0), output_field=IntegerField()),
+    'annotated_primary_image': F('summary__primary_image_url'),
+    'has_stock': Coalesce(F('summary__in_stock_variants_count'), Value(0), output_field=IntegerField()),
+    'annotated_has_discount': Coalesce(F('summary__has_discount'), Value(False), output_field=BooleanField()),
+}
+
+
+def with_listing_summary(queryset):
+    """Annotate a Product queryset with the listing figures from ProductSummary."""
+    return queryset.annotate(**SUMMARY_ANNOTATIONS)
+
+
+def storefront_products_queryset(tenant):
+    """Published, non-deleted products of a tenant, ready for ProductListSerializer."""
+    queryset = Product.objects.filter(
+        tenant=tenant,
+        status='Published',
+        deleted_at__isnull=True
+    ).select_related('category')
+    return with_listing_summary(queryset)
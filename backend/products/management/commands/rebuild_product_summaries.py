@@ -0,0 +1,34 @@
+"""
+Rebuild the denormalised ProductSummary rows.
+Run with: python manage.py rebuild_product_summaries [--tenant slug] [--batch-size 500]
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from products.models import Product
+from products.listing import refresh_product_summaries, invalidate_listing_caches
+
+
+class Command(BaseCommand):
+    help = 'Recompute ProductSummary rows (prices, stock, primary image) from variants and images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', help='Only rebuild products of this tenant slug')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options['tenant']:
+            products = products.filter(tenant__slug=options['tenant'])
+
+        product_ids = list(products.order_by('id').values_list('id', flat=True))
+        tenant_ids = set(products.values_list('tenant_id', flat=True).distinct())
+        batch_size = options['batch_size']
+
+        self.stdout.write(f'Rebuilding summaries for {len(product_ids)} products...')
+        for start in range(0, len(product_ids), batch_size):
+            with transaction.atomic():
+                refresh_product_summaries(product_ids[start:start + batch_size])
+
+        invalidate_listing_caches(tenant_ids)
+
+        self.stdout.write(self.style.SUCCESS('Done!'))
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.27 on 2026-10-18 04:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_product_is_referential_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSummary',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='products.product')),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=18, null=True)),
+                ('max_price', models.DecimalField(blank=True, decimal_places=2, max_digits=18, null=True)),
+                ('min_compare_price', models.DecimalField(blank=True, decimal_places=2, max_digits=18, null=True)),
+                ('variants_count', models.IntegerField(default=0)),
+                ('in_stock_variants_count', models.IntegerField(default=0)),
+                ('has_discount', models.BooleanField(default=False)),
+                ('primary_image_url', models.TextField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'product_summaries',
+            },
+        ),
+        # Backfill one summary row per existing product
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO product_summaries (
+                    product_id, min_price, max_price, min_compare_price,
+                    variants_count, in_stock_variants_count, has_discount,
+                    primary_image_url, updated_at
+                )
+                SELECT
+                    p.id,
+                    MIN(v.price),
+                    MAX(v.price),
+                    MIN(v.compare_at_price),
+                    COUNT(v.id),
+                    COUNT(v.id) FILTER (WHERE v.stock_quantity > 0),
+                    COALESCE(BOOL_OR(
+                        v.price IS NOT NULL AND v.compare_at_price IS NOT NULL
+                        AND v.price <> v.compare_at_price
+                    ), FALSE),
+                    (
+                        SELECT i.url FROM product_images i
+                        WHERE i.product_id = p.id AND i.deleted_at IS NULL
+                        ORDER BY i.is_primary DESC, i.sort_order ASC
+                        LIMIT 1
+                    ),
+                    NOW()
+                FROM products p
+                LEFT JOIN product_variants v
+                    ON v.product_id = p.id AND v.is_active AND v.deleted_at IS NULL
+                GROUP BY p.id
+                ON CONFLICT (product_id) DO NOTHING;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.27 on 2026-10-18 04:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0021_seed_basic_palettes'),
+        ('products', '0009_productsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productsummary',
+            name='tenant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='product_summaries', to='tenants.tenant'),
+        ),
+        migrations.AddField(
+            model_name='productsummary',
+            name='total_reserved',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='productsummary',
+            name='total_stock',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='productsummary',
+            index=models.Index(fields=['tenant', 'min_price'], name='idx_summary_tenant_price'),
+        ),
+        migrations.AddIndex(
+            model_name='productsummary',
+            index=models.Index(fields=['tenant', 'in_stock_variants_count'], name='idx_summary_tenant_stock'),
+        ),
+        # Backfill the new columns for existing summary rows
+        migrations.RunSQL(
+            sql="""
+                UPDATE product_summaries s
+                SET tenant_id = agg.tenant_id,
+                    total_stock = agg.total_stock,
+                    total_reserved = agg.total_reserved
+                FROM (
+                    SELECT
+                        p.id AS product_id,
+                        p.tenant_id,
+                        COALESCE(SUM(v.stock_quantity), 0) AS total_stock,
+                        COALESCE(SUM(v.reserved_quantity), 0) AS total_reserved
+                    FROM products p
+                    LEFT JOIN product_variants v
+                        ON v.product_id = p.id AND v.is_active AND v.deleted_at IS NULL
+                    GROUP BY p.id
+                ) agg
+                WHERE s.product_id = agg.product_id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.27 on 2026-10-18 04:24
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import UnaccentExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_enable_pg_trgm'),
+        ('products', '0010_productsummary_stock_totals'),
+    ]
+
+    operations = [
+        UnaccentExtension(),
+        # Spanish stemming that ignores accents ("diseño" / "diseno", "árbol" / "arbol")
+        migrations.RunSQL(
+            sql="""
+                DO $$
+                BEGIN
+                    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'spanish_unaccent') THEN
+                        CREATE TEXT SEARCH CONFIGURATION spanish_unaccent (COPY = spanish);
+                        ALTER TEXT SEARCH CONFIGURATION spanish_unaccent
+                            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+                    END IF;
+                END
+                $$;
+            """,
+            reverse_sql="DROP TEXT SEARCH CONFIGURATION IF EXISTS spanish_unaccent;"
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='idx_product_search_vector'),
+        ),
+        # Backfill vectors for existing products (same weights as products.search)
+        migrations.RunSQL(
+            sql="""
+                UPDATE products p SET search_vector =
+                    setweight(to_tsvector('spanish_unaccent',
+                        COALESCE(p.name, '') || ' ' || COALESCE(p.sku, '') || ' ' || COALESCE(p.brand, '')), 'A')
+                    || setweight(to_tsvector('spanish_unaccent', COALESCE(
+                        (SELECT c.name FROM categories c WHERE c.id = p.category_id), '')), 'B')
+                    || setweight(to_tsvector('spanish_unaccent', COALESCE(p.short_description, '')), 'C')
+                    || setweight(to_tsvector('spanish_unaccent', COALESCE(p.description, '')), 'D');
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
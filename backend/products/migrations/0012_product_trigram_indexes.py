@@ -0,0 +1,18 @@
+from django.db import migrations
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('products', '0011_product_search_vector'),
+    ]
+
+    operations = [
+        # Trigram indexes for typeahead (name already has idx_product_name_trgm from 0006)
+        migrations.RunSQL(
+            sql="CREATE INDEX IF NOT EXISTS idx_product_sku_trgm ON products USING gin (sku gin_trgm_ops);",
+            reverse_sql="DROP INDEX IF EXISTS idx_product_sku_trgm;"
+        ),
+        migrations.RunSQL(
+            sql="CREATE INDEX IF NOT EXISTS idx_product_brand_trgm ON products USING gin (brand gin_trgm_ops);",
+            reverse_sql="DROP INDEX IF EXISTS idx_product_brand_trgm;"
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-18 04:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_product_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['tenant', '-created_at', '-id'], name='idx_product_tenant_keyset'),
+        ),
+    ]
@@ -2,7 +2,10 @@ import uuid
 from django.db import models
 from django.core.validators import RegexValidator
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from tenants.models import Tenant
+from core.models import TrackedFieldsMixin
 
 
 class Category(models.Model):
@@ -53,9 +56,12 @@ class Category(models.Model):
         return f"{self.name} ({self.tenant.name})"
 
 
-class Product(models.Model):
+class Product(TrackedFieldsMixin, models.Model):
     """Products catalog"""
     
+    # Fields deciding which storefront listings show the product (cache tags in signals.py)
+    tracked_fields = ('category', 'status', 'is_featured', 'deleted_at')
+    
     STATUS_CHOICES = [
         ('Draft', 'Draft'),
         ('Published', 'Published'),
@@ -111,6 +117,9 @@ class Product(models.Model):
     average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
     review_count = models.IntegerField(default=0)
     
+    # Full-text search (maintained by products.search on save)
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+    
     # Audit
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -134,6 +143,8 @@ class Product(models.Model):
             models.Index(fields=['tenant', 'status']),
             models.Index(fields=['tenant', 'is_featured']),
             models.Index(fields=['category']),
+            GinIndex(fields=['search_vector'], name='idx_product_search_vector'),
+            models.Index(fields=['tenant', '-created_at', '-id'], name='idx_product_tenant_keyset'),
         ]
     
     def __str__(self):
@@ -234,6 +245,42 @@ class ProductImage(models.Model):
         return f"Image for {self.product.name}"
 
 
+class ProductSummary(models.Model):
+    """
+    Denormalised per-product listing figures (prices, stock, primary image).
+    One row per product, refreshed by products.listing on variant/image writes
+    so listings read a single narrow row instead of aggregating variants.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='summary')
+    # Denormalised from product so per-tenant filters/ordering can use btree indexes
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='product_summaries', null=True, blank=True)
+    
+    # Active, non-deleted variants only
+    min_price = models.DecimalField(max_digits=18, decimal_places=2, null=True, blank=True)
+    max_price = models.DecimalField(max_digits=18, decimal_places=2, null=True, blank=True)
+    min_compare_price = models.DecimalField(max_digits=18, decimal_places=2, null=True, blank=True)
+    variants_count = models.IntegerField(default=0)
+    in_stock_variants_count = models.IntegerField(default=0)
+    has_discount = models.BooleanField(default=False)
+    total_stock = models.IntegerField(default=0)
+    total_reserved = models.IntegerField(default=0)
+    
+    # Primary image, falling back to the first image by sort order
+    primary_image_url = models.TextField(blank=True, null=True)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'product_summaries'
+        indexes = [
+            models.Index(fields=['tenant', 'min_price'], name='idx_summary_tenant_price'),
+            models.Index(fields=['tenant', 'in_stock_variants_count'], name='idx_summary_tenant_stock'),
+        ]
+    
+    def __str__(self):
+        return f"Summary for {self.product_id}"
+
+
 class ProductFeature(models.Model):
     """Product features (visual highlights)"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
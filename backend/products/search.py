@@ -0,0 +1,151 @@
+"""
+Postgres full-text search for products.
+
+Each product stores a weighted ``search_vector`` (Spanish stemming with
+unaccent, see migration 0011) covered by a GIN index:
+
+    A: name, sku, brand
+    B: category name
+    C: short description
+    D: description
+
+Queries use prefix matching on every term so partial words typed by shoppers
+("sill" -> "silla") still match.
+
+Typeahead suggestions use pg_trgm word similarity instead, backed by trigram
+GIN indexes on name, sku and brand, which tolerates typos in short prefixes.
+"""
+import re
+
+from django.contrib.postgres.search import (
+    SearchHeadline, SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+)
+from django.db.models import F, Q, OuterRef, Subquery
+from django.db.models.functions import Greatest
+
+from .models import Category
+
+
+SEARCH_CONFIG = 'spanish_unaccent'
+
+# Fields whose change requires recomputing the vector
+SEARCH_FIELDS = frozenset([
+    'name', 'sku', 'brand', 'category', 'category_id', 'short_description', 'description'
+])
+
+MAX_QUERY_TERMS = 8
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def product_search_vector():
+    """Weighted vector expression, usable in ``QuerySet.update()`` (no joins)."""
+    category_name = Subquery(
+        Category.objects.filter(pk=OuterRef('category_id')).values('name')[:1]
+    )
+    return (
+        SearchVector('name', 'sku', 'brand', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(category_name, weight='B', config=SEARCH_CONFIG)
+        + SearchVector('short_description', weight='C', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='D', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(queryset):
+    """Recompute search vectors for every product in the queryset with one UPDATE."""
+    return queryset.update(search_vector=product_search_vector())
+
+
+def build_search_query(text):
+    """
+    Build a prefix-matching tsquery ("silla roble" -> "silla:* & roble:*").
+    Returns None when the text has no searchable terms.
+    """
+    terms = _TERM_RE.findall((text or '').lower())[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    raw = ' & '.join(f"{term}:*" for term in terms)
+    return SearchQuery(raw, search_type='raw', config=SEARCH_CONFIG)
+
+
+def normalise_search(text):
+    """The terms build_search_query uses, as a cache key value; None when there are none."""
+    terms = _TERM_RE.findall((text or '').lower())[:MAX_QUERY_TERMS]
+    return ' '.join(terms) or None
+
+
+def filter_by_search(queryset, text):
+    """Restrict a Product queryset to full-text matches (uses the GIN index)."""
+    query = build_search_query(text)
+    if query is None:
+        return queryset
+    return queryset.filter(search_vector=query)
+
+
+def ranked_search(queryset, text, highlight=True):
+    """
+    Filter, rank and optionally highlight a Product queryset.
+    Adds ``rank`` and, with ``highlight``, ``name_highlight`` / ``description_highlight``.
+    """
+    query = build_search_query(text)
+    if query is None:
+        return queryset.none()
+
+    queryset = queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query)
+    )
+    if highlight:
+        queryset = queryset.annotate(
+            name_highlight=SearchHeadline(
+                'name', query, config=SEARCH_CONFIG,
+                start_sel='<mark>', stop_sel='</mark>', highlight_all=True
+            ),
+            description_highlight=SearchHeadline(
+                'short_description', query, config=SEARCH_CONFIG,
+                start_sel='<mark>', stop_sel='</mark>', max_words=25, min_words=10
+            ),
+        )
+    return queryset.order_by('-rank', '-created_at')
+
+
+
+SUGGEST_MIN_LENGTH = 2
+SUGGEST_MAX_LENGTH = 50
+SUGGEST_DEFAULT_LIMIT = 8
+SUGGEST_MAX_LIMIT = 20
+
+
+def normalise_prefix(text):
+    """Lowercase, collapse whitespace and cap length; used for matching and cache keys."""
+    return ' '.join((text or '').lower().split())[:SUGGEST_MAX_LENGTH]
+
+
+def suggest_products(queryset, prefix, limit=SUGGEST_DEFAULT_LIMIT):
+    """
+    Typeahead matches for a normalised prefix, best first.
+    Returns a list of small dicts: id, slug, name, image, price.
+    """
+    matches = queryset.filter(
+        Q(name__trigram_word_similar=prefix)
+        | Q(sku__trigram_word_similar=prefix)
+        | Q(brand__trigram_word_similar=prefix)
+    ).annotate(
+        score=Greatest(
+            TrigramWordSimilarity(prefix, 'name'),
+            TrigramWordSimilarity(prefix, 'sku'),
+            TrigramWordSimilarity(prefix, 'brand'),
+        )
+    ).order_by('-score', 'name').values(
+        'id', 'slug', 'name', 'is_quote_only', 'summary__primary_image_url', 'summary__min_price'
+    )[:limit]
+
+    return [
+        {
+            'id': row['id'],
+            'slug': row['slug'],
+            'name': row['name'],
+            'image': row['summary__primary_image_url'],
+            'price': None if row['is_quote_only'] else row['summary__min_price'],
+        }
+        for row in matches
+    ]
@@ -228,6 +228,16 @@ class ProductListSerializer(serializers.ModelSerializer):
         return obj.variants.filter(is_active=True, deleted_at__isnull=True, stock_quantity__gt=0).exists()
 
 
+class ProductSearchResultSerializer(ProductListSerializer):
+    """Listing fields plus search rank and <mark>-highlighted snippets"""
+    rank = serializers.FloatField(read_only=True)
+    name_highlight = serializers.CharField(read_only=True)
+    description_highlight = serializers.CharField(read_only=True, allow_null=True)
+    
+    class Meta(ProductListSerializer.Meta):
+        fields = ProductListSerializer.Meta.fields + ['rank', 'name_highlight', 'description_highlight']
+
+
 class ProductDetailSerializer(serializers.ModelSerializer):
     """Serializer for product detail (full information)"""
     category = CategorySerializer(read_only=True)
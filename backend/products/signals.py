@@ -1,60 +1,97 @@
+import logging
+
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.core.cache import cache
-from .models import Product, Category
-
-# Helper to clear Home Page Cache
-def clear_home_cache(tenant_id):
-    # Bump version for 'home_data' scope
-    from core.cache_utils import bump_cache_version
-    bump_cache_version('home_data', tenant_id)
-    print(f"Bumped Cache Version: home_data_{tenant_id}")
-
-# Helper to clear Product Detail Cache
-def clear_product_cache(tenant_id, slug):
-    cache_key = f"storefront_product_{tenant_id}_{slug}"
-    cache.delete(cache_key)
-    print(f"Removed Cache: {cache_key}")
-
-# Helper to clear Category Page Cache
-def clear_category_cache(tenant_id, slug=None):
-    # Bump version for 'categories' scope
-    # This invalidates ALL filtered lists in StorefrontCategoryView because they all share the 'categories' scope version
-    from core.cache_utils import bump_cache_version
-    bump_cache_version('categories', tenant_id)
-    print(f"Bumped Cache Version: categories_{tenant_id}")
+from django.db import transaction
+from .models import Product, Category, ProductVariant, ProductImage, ProductFeature, ProductReview
+from .listing import sync_product_summaries
+from core.cache_registry import invalidate
+from core.cache_utils import catalog_tag, category_tag, product_tag
+from .search import SEARCH_FIELDS, update_search_vectors
+
+logger = logging.getLogger(__name__)
+
+# Helper to invalidate cached payloads (core/cache_registry.py) once the write is committed
+def invalidate_cache_tags(tenant_id, tags):
+    tags = set(tags)
+    transaction.on_commit(lambda: invalidate(tenant_id, *tags))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Invalidating cache tags: %s", ", ".join(sorted(tags)))
 
 @receiver(post_save, sender=Product)
 @receiver(post_delete, sender=Product)
 def invalidate_product_cache(sender, instance, **kwargs):
     """
-    Invalidates:
-    1. Home Page (Featured products list)
-    2. Product Detail Page (Price/Stock/Info update)
-    3. Category Page (Product listing update)
+    Invalidates the pages showing this product (its detail page, the category
+    pages and home page listing it, other products' related lists).
+    When it enters or leaves a listing (created, deleted, new category, status
+    or featured flag) also the pages listing its old and new category and the
+    home selection.
     """
     print(f"Signal: Product {instance.slug} changed. Invalidating cache...")
-    clear_home_cache(instance.tenant.id)
-    clear_product_cache(instance.tenant.id, instance.slug)
-    
-    # Also clear category cache because product count or prices might change in filters
-    # Optimization: Only clear the specific category cache if available
-    if instance.category:
-        try:
-            clear_category_cache(instance.tenant.id, slug=instance.category.slug)
-        except Exception:
-            # Fallback if category access fails
-            clear_category_cache(instance.tenant.id)
+    tags = {product_tag(instance.pk)}
+    dirty = {} if kwargs.get('created') else instance.get_dirty_fields()
+    if kwargs.get('created') or kwargs.get('signal') is post_delete or dirty:
+        tags.add(catalog_tag(instance.tenant_id))
+        for category_id in (instance.category_id, dirty.get('category')):
+            if category_id:
+                tags.add(category_tag(category_id))
+    invalidate_cache_tags(instance.tenant_id, tags)
 
 @receiver(post_save, sender=Category)
 @receiver(post_delete, sender=Category)
 def invalidate_category_cache(sender, instance, **kwargs):
     """
     Invalidates:
-    1. Home Page (Menu structure)
-    2. Category Page (Info update)
+    1. Every page showing the menu (category info)
+    2. The category's own pages
     """
     print(f"Signal: Category {instance.name} changed. Invalidating cache...")
-    clear_home_cache(instance.tenant.id)
-    # Clear this category's cache
-    clear_category_cache(instance.tenant.id, slug=instance.slug)
+    invalidate_cache_tags(
+        instance.tenant_id,
+        (category_tag(category_id) for category_id in (instance.pk, instance.parent_id) if category_id)
+    )
+
+
+@receiver(post_save, sender=ProductFeature)
+@receiver(post_delete, sender=ProductFeature)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+def invalidate_product_details_cache(sender, instance, **kwargs):
+    """Features and review stats are part of the product detail payload"""
+    invalidate_cache_tags(instance.tenant_id, [product_tag(instance.product_id)])
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def refresh_listing_summary(sender, instance, **kwargs):
+    """
+    Keep ProductSummary (prices, stock, primary image) in sync with variant/image writes
+    and invalidate listings that read it.
+    """
+    products = {instance.product_id: instance.tenant_id}
+    if kwargs.get('signal') is post_delete:
+        # Hard deletes may be part of a product cascade; refresh once the product is gone
+        transaction.on_commit(lambda: sync_product_summaries(products))
+    else:
+        sync_product_summaries(products)
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_search_vector(sender, instance, update_fields=None, **kwargs):
+    """Recompute the full-text vector unless only non-searchable fields were saved"""
+    if update_fields and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    update_search_vectors(Product.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Category)
+def refresh_category_products_search_vector(sender, instance, update_fields=None, **kwargs):
+    """Category name is part of the product vector"""
+    if kwargs.get('created'):
+        return
+    if update_fields and 'name' not in update_fields:
+        return
+    update_search_vectors(Product.objects.filter(category=instance))
@@ -1,14 +1,23 @@
-from rest_framework import viewsets, filters, status
+from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.db import models
-from django.db.models import Q, Min, Max, Count, OuterRef, Subquery, Exists, F
-from django.core.cache import cache
+from django.db.models import Q, Count, F
+from core.cache_keys import QueryKey, choice, flag, integer, number, text, uuid_value
+from core.cache_registry import STOREFRONT_CATEGORIES, STOREFRONT_PRODUCTS_LIST, STOREFRONT_SUGGEST
+from core.cache_utils import cache_tags, catalog_tag, product_tag
 from .models import Category, Product, ProductVariant, ProductReview, ProductImage
+from core.pagination import StorefrontKeysetPagination
+from .listing import storefront_products_queryset
+from .search import (
+    filter_by_search, ranked_search, suggest_products, normalise_prefix, normalise_search,
+    SUGGEST_MIN_LENGTH, SUGGEST_DEFAULT_LIMIT, SUGGEST_MAX_LIMIT
+)
 from .serializers import (
     CategorySerializer,
     ProductListSerializer,
     ProductDetailSerializer,
+    ProductSearchResultSerializer,
     ProductVariantWriteSerializer
 )
 
@@ -26,16 +35,9 @@ class StorefrontCategoryViewSet(viewsets.ReadOnlyModelViewSet):
         if not tenant:
             return Response([])
             
-        cache_key = f"storefront_categories_{tenant.id}"
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
-            
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        data = serializer.data
-        
-        cache.set(cache_key, data, 3600) # Cache for 1 hour
+        data = STOREFRONT_CATEGORIES.get_or_set(
+            lambda: self.get_serializer(self.get_queryset(), many=True).data, tenant.id
+        )
         return Response(data)
 
     def get_queryset(self):
@@ -64,14 +66,33 @@ class StorefrontCategoryViewSet(viewsets.ReadOnlyModelViewSet):
         return queryset
 
 
+# Query parameters read by StorefrontProductViewSet.get_queryset and its pagination
+PRODUCT_LIST_KEY = QueryKey(
+    'storefront_products_list',
+    search=normalise_search,
+    category=text,
+    featured=flag,
+    in_stock=flag,
+    min_price=number,
+    max_price=number,
+    exclude=uuid_value,
+    ordering=choice('price', '-price', 'name', 'created_at', 'sales_count'),
+    page=integer,
+    page_size=integer,
+    cursor=text,
+    total=choice('estimate', 'exact'),
+)
+
+
 class StorefrontProductViewSet(viewsets.ReadOnlyModelViewSet):
     """
     Storefront API for products.
     Read-only, filtered by tenant.
     Supports search and filtering.
     """
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['name', 'description', 'brand', 'sku', 'category__name']
+    # ?search= uses the Postgres full-text index (products.search) instead of SearchFilter
+    filter_backends = []
+    pagination_class = StorefrontKeysetPagination
     ordering_fields = ['name', 'created_at', 'sales_count', 'price']
     ordering = ['-created_at']
     lookup_field = 'slug'
@@ -86,52 +107,33 @@ class StorefrontProductViewSet(viewsets.ReadOnlyModelViewSet):
         if not tenant:
             return Response({"results": []})
 
-        # Generate unique cache key based on tenant and all query parameters
-        params_str = "&".join([f"{k}={v}" for k, v in sorted(request.query_params.items())])
-        cache_key = f"storefront_products_list_{tenant.id}_{params_str}"
-        
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
+        # Keyed by the parameters that filter or page the list (tracking params ignored)
+        params = PRODUCT_LIST_KEY.build(request.query_params, tenant.id)
+        data = STOREFRONT_PRODUCTS_LIST.get_or_set(
+            lambda: self.build_list_data(request, *args, **kwargs), tenant.id, params=params
+        )
+        return Response(data)
 
-        response = super().list(request, *args, **kwargs)
-        
-        # Cache for 1 hour to reduce egress
-        cache.set(cache_key, response.data, 3600)
-        return response
+    def build_list_data(self, request, *args, **kwargs):
+        data = super().list(request, *args, **kwargs).data
+        # Shared by every URL with the same key: no tracking params in the page links
+        for link in ('next', 'previous'):
+            if data.get(link):
+                data[link] = PRODUCT_LIST_KEY.clean_url(data[link])
+        # Marked stale when a listed product changes or the catalog selection moves
+        cache_tags(
+            catalog_tag(request.tenant.id),
+            *(product_tag(product['id']) for product in data.get('results', ()))
+        )
+        return data
 
     def get_queryset(self):
         tenant = self.request.tenant
         if not tenant:
             return Product.objects.none()
         
-        # Subquery for primary image URL to avoid N+1 in serializer
-        primary_image_subquery = ProductImage.objects.filter(
-            product=OuterRef('pk'),
-            is_primary=True,
-            deleted_at__isnull=True
-        ).values('url')[:1]
-
-        # Calculate prices and counts in a single query
-        queryset = Product.objects.filter(
-            tenant=tenant,
-            status='Published',
-            deleted_at__isnull=True
-        ).annotate(
-            price=Min('variants__price', filter=Q(variants__is_active=True, variants__deleted_at__isnull=True)),
-            annotated_max_price=Max('variants__price', filter=Q(variants__is_active=True, variants__deleted_at__isnull=True)),
-            annotated_min_compare_price=Min('variants__compare_at_price', filter=Q(variants__is_active=True, variants__deleted_at__isnull=True)),
-            annotated_variants_count=Count('variants', filter=Q(variants__is_active=True, variants__deleted_at__isnull=True), distinct=True),
-            annotated_primary_image=Subquery(primary_image_subquery),
-            has_stock=Count('variants', filter=Q(variants__is_active=True, variants__deleted_at__isnull=True, variants__stock_quantity__gt=0)),
-            annotated_has_discount=Exists(
-                ProductVariant.objects.filter(
-                    product=OuterRef('pk'),
-                    is_active=True,
-                    deleted_at__isnull=True
-                ).exclude(price=F('compare_at_price'))
-            )
-        ).select_related('category')
+        # Listing figures come pre-aggregated from ProductSummary (see products/listing.py)
+        queryset = storefront_products_queryset(tenant)
         
         if self.action == 'retrieve':
             queryset = queryset.prefetch_related(
@@ -139,6 +141,11 @@ class StorefrontProductViewSet(viewsets.ReadOnlyModelViewSet):
                 models.Prefetch('images', queryset=ProductImage.objects.filter(deleted_at__isnull=True).order_by('sort_order'))
             )
         
+        # Full-text search (GIN index on search_vector, prefix matching)
+        search = self.request.query_params.get('search')
+        if search:
+            queryset = filter_by_search(queryset, search)
+        
         # Filter by category
         category_slug = self.request.query_params.get('category')
         if category_slug:
@@ -154,7 +161,7 @@ class StorefrontProductViewSet(viewsets.ReadOnlyModelViewSet):
         if in_stock == 'true':
             queryset = queryset.filter(
                 Q(manage_stock=False) |
-                Q(has_stock__gt=0)
+                Q(summary__in_stock_variants_count__gt=0)
             )
         
         # Filter by price range
@@ -162,9 +169,9 @@ class StorefrontProductViewSet(viewsets.ReadOnlyModelViewSet):
         max_price = self.request.query_params.get('max_price')
         if min_price or max_price:
             if min_price:
-                queryset = queryset.filter(price__gte=min_price)
+                queryset = queryset.filter(summary__min_price__gte=min_price)
             if max_price:
-                queryset = queryset.filter(price__lte=max_price)
+                queryset = queryset.filter(summary__min_price__lte=max_price)
         
         # Filter by exclude (e.g. for related products, exclude current)
         exclude_id = self.request.query_params.get('exclude')
@@ -175,9 +182,9 @@ class StorefrontProductViewSet(viewsets.ReadOnlyModelViewSet):
         ordering = self.request.query_params.get('ordering')
         if ordering:
             if ordering == 'price':
-                queryset = queryset.order_by(F('price').asc(nulls_last=True))
+                queryset = queryset.order_by(F('summary__min_price').asc(nulls_last=True))
             elif ordering == '-price':
-                queryset = queryset.order_by(F('price').desc(nulls_last=True))
+                queryset = queryset.order_by(F('summary__min_price').desc(nulls_last=True))
             elif ordering in self.ordering_fields:
                 queryset = queryset.order_by(ordering)
         else:
@@ -186,6 +193,49 @@ class StorefrontProductViewSet(viewsets.ReadOnlyModelViewSet):
 
         return queryset
     
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Ranked full-text search with highlighting.
+        GET /api/storefront/products/search/?q=silla+roble
+        """
+        tenant = self.request.tenant
+        query = request.query_params.get('q', '').strip()
+        if not tenant or not query:
+            return Response({"results": []})
+        
+        queryset = ranked_search(storefront_products_queryset(tenant), query)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = ProductSearchResultSerializer(page, many=True, context={'request': request})
+            return self.get_paginated_response(serializer.data)
+        serializer = ProductSearchResultSerializer(queryset, many=True, context={'request': request})
+        return Response({"results": serializer.data})
+    
+    @action(detail=False, methods=['get'])
+    def suggest(self, request):
+        """
+        Typeahead suggestions (trigram indexes on name, sku and brand).
+        GET /api/storefront/products/suggest/?q=sil&limit=8
+        """
+        tenant = self.request.tenant
+        prefix = normalise_prefix(request.query_params.get('q'))
+        if not tenant or len(prefix) < SUGGEST_MIN_LENGTH:
+            return Response({"results": []})
+        
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', SUGGEST_DEFAULT_LIMIT)), SUGGEST_MAX_LIMIT))
+        except ValueError:
+            limit = SUGGEST_DEFAULT_LIMIT
+        
+        # One key per normalised prefix (not per raw query string), short TTL
+        queryset = Product.objects.filter(tenant=tenant, status='Published', deleted_at__isnull=True)
+        data = STOREFRONT_SUGGEST.get_or_set(
+            lambda: {"results": suggest_products(queryset, prefix, limit)}, tenant.id,
+            limit=limit, prefix=prefix.replace(' ', '+')
+        )
+        return Response(data)
+    
     def retrieve(self, request, *args, **kwargs):
         """Increment view count when product is viewed (optimized)"""
         instance = self.get_object()
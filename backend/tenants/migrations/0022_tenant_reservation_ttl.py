@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-18 04:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0021_seed_basic_palettes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tenant',
+            name='reservation_ttl_minutes',
+            field=models.IntegerField(blank=True, help_text='Minutes an unpaid order keeps its reserved stock (empty = ORDER_RESERVATION_TTL_MINUTES)', null=True),
+        ),
+    ]
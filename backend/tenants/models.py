@@ -321,6 +321,10 @@ class Tenant(models.Model):
     show_product_ratings = models.BooleanField(default=True)
     allow_reviews = models.BooleanField(default=True)
     show_related_products = models.BooleanField(default=True)
+    reservation_ttl_minutes = models.IntegerField(
+        blank=True, null=True,
+        help_text="Minutes an unpaid order keeps its reserved stock (empty = ORDER_RESERVATION_TTL_MINUTES)"
+    )
     
     # Policies
     POLICY_modes = [
@@ -418,9 +422,12 @@ class Redirect(models.Model):
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from core.cache_utils import invalidate_tenant_cache
+from core.tenant_resolver import invalidate_tenant_resolution
 
 @receiver(post_save, sender=Tenant)
 def handle_tenant_post_save(sender, instance, **kwargs):
     """Clear tenant cache when settings change"""
     invalidate_tenant_cache(instance.id)
+    # Drop resolved tenants in every worker (LRU + Redis descriptors)
+    invalidate_tenant_resolution()
 
@@ -2,13 +2,19 @@ from rest_framework import viewsets, filters, views
 from rest_framework.response import Response
 from django.utils import timezone
 from django.db import models
-from django.db.models import Q, Min, Max, Count, OuterRef, Subquery, Exists, F
+from django.db.models import Q, Count
 from .models import Tenant, PremiumPalette
 from .serializers import TenantSerializer, PremiumPaletteSerializer, StorefrontTenantSerializer
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from products.models import Category, Product, ProductImage, ProductVariant
 from products.serializers import CategorySerializer, ProductListSerializer, ProductDetailSerializer
-from django.core.cache import cache
+from products.listing import storefront_products_queryset
+from core.cache_keys import QueryKey, number, text
+from core.cache_registry import (
+    STOREFRONT_CATEGORY_PAGE, STOREFRONT_COMMON_DATA, STOREFRONT_HOME, STOREFRONT_PRODUCT, TENANT_LOOKUP
+)
+from core.cache_utils import cache_tags, catalog_tag, category_tag, product_tag, tenant_tag
+from core.tenant_resolver import resolve_tenant_for_request
 
 class PremiumPaletteViewSet(viewsets.ModelViewSet):
     """
@@ -59,14 +65,10 @@ class TenantViewSet(viewsets.ModelViewSet):
         domain = request.query_params.get('domain')
         
         if not request.user.is_staff and (slug or domain):
-            cache_key = f"api_tenant_list_{slug or domain}"
-            cached_res = cache.get(cache_key)
-            if cached_res:
-                return Response(cached_res)
-            
-            response = super().list(request, *args, **kwargs)
-            cache.set(cache_key, response.data, 600) # 10 min cache
-            return response
+            data = TENANT_LOOKUP.get_or_set(
+                lambda: super(TenantViewSet, self).list(request, *args, **kwargs).data, lookup=slug or domain
+            )
+            return Response(data)
             
         return super().list(request, *args, **kwargs)
     
@@ -85,56 +87,18 @@ class StorefrontBaseView(views.APIView):
         if tenant:
             return tenant
 
-        # 2. Fallback resolution (consistent with Middleware)
-        header_tenant = request.headers.get('X-Tenant')
-        slug_param = request.query_params.get('tenant') or request.query_params.get('slug')
-        domain_param = request.query_params.get('domain')
-        host = request.get_host().split(':')[0].lower()
-        
-        identifier = header_tenant or slug_param or domain_param
-        
-        if identifier:
-            cache_key = f"resolved_tenant_v2_id_{identifier}"
-        else:
-            cache_key = f"resolved_tenant_v2_host_{host}"
-
-        # 3. Check Cache
-        tenant = cache.get(cache_key)
-        if tenant == "NOT_FOUND":
-            return None
+        # 2. Fallback resolution (shared with TenantMiddleware)
+        tenant = resolve_tenant_for_request(request)
         if tenant:
             request.tenant = tenant
-            return tenant
-
-        # 4. DB Fallback (Lightweight query)
-        if identifier:
-            tenant = Tenant.objects.filter(
-                Q(slug=identifier) | Q(custom_domain=identifier),
-                status__in=['Active', 'Trial'],
-                deleted_at__isnull=True
-            ).first()
-        else:
-            tenant = Tenant.objects.filter(
-                Q(custom_domain=host) | Q(slug=host),
-                status__in=['Active', 'Trial'],
-                deleted_at__isnull=True
-            ).first()
-        
-        if tenant:
-            request.tenant = tenant
-            cache.set(cache_key, tenant, 3600)  # 1 hour cache
-        else:
-            cache.set(cache_key, "NOT_FOUND", 60) # 1 min negative cache
-            
         return tenant
 
 
     def get_common_data(self, request, tenant):
-        cache_key = f"storefront_common_data_{tenant.id}"
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return cached_data['tenant'], cached_data['categories']
+        cached_data = STOREFRONT_COMMON_DATA.get_or_set(lambda: self.build_common_data(request, tenant), tenant.id)
+        return cached_data['tenant'], cached_data['categories']
 
+    def build_common_data(self, request, tenant):
         # 1. Tenant Data (Using lightweight safe serializer)
         tenant_data = StorefrontTenantSerializer(tenant, context={'request': request}).data
         
@@ -157,38 +121,17 @@ class StorefrontBaseView(views.APIView):
             )
         ).order_by('sort_order', 'name')
         categories_data = CategorySerializer(categories_qs, many=True, context={'request': request}).data
-        
-        # Cache Static Data for 1 Hour (3600s)
-        cache.set(cache_key, {'tenant': tenant_data, 'categories': categories_data}, 3600)
-        return tenant_data, categories_data
 
-    def get_annotated_products_queryset(self, tenant):
-        base_products = Product.objects.filter(
-            tenant=tenant,
-            status='Published',
-            deleted_at__isnull=True
-        )
-        primary_image_subquery = ProductImage.objects.filter(
-            product=OuterRef('pk'),
-            is_primary=True,
-            deleted_at__isnull=True
-        ).values('url')[:1]
+        # Every storefront page embeds this: tenant settings, the menu and its product counts
+        cache_tags(tenant_tag(tenant.id))
+        for category in categories_qs:
+            cache_tags(category_tag(category.id), *(category_tag(child.id) for child in category.children.all()))
+        return {'tenant': tenant_data, 'categories': categories_data}
 
-        return base_products.annotate(
-            annotated_min_price=Min('variants__price', filter=Q(variants__is_active=True, variants__deleted_at__isnull=True)),
-            annotated_max_price=Max('variants__price', filter=Q(variants__is_active=True, variants__deleted_at__isnull=True)),
-            annotated_min_compare_price=Min('variants__compare_at_price', filter=Q(variants__is_active=True, variants__deleted_at__isnull=True)),
-            annotated_variants_count=Count('variants', filter=Q(variants__is_active=True, variants__deleted_at__isnull=True), distinct=True),
-            annotated_primary_image=Subquery(primary_image_subquery),
-            has_stock=Count('variants', filter=Q(variants__is_active=True, variants__deleted_at__isnull=True, variants__stock_quantity__gt=0)),
-            annotated_has_discount=Exists(
-                ProductVariant.objects.filter(
-                    product=OuterRef('pk'),
-                    is_active=True,
-                    deleted_at__isnull=True
-                ).exclude(price=F('compare_at_price'))
-            )
-        ).select_related('category')
+
+    def get_annotated_products_queryset(self, tenant):
+        # Shared listing engine: one ProductSummary row per product, no variant GROUP BY
+        return storefront_products_queryset(tenant)
 
 class StorefrontHomeView(StorefrontBaseView):
     def get(self, request, *args, **kwargs):
@@ -196,17 +139,11 @@ class StorefrontHomeView(StorefrontBaseView):
         if not tenant:
             return Response({"error": "Tenant not found"}, status=404)
 
-        # Full Page Cache (Invalidated by Signals via Versioning)
-        from core.cache_utils import get_versioned_cache_key
-        
-        base_key = f"storefront_home_data_{tenant.id}"
-        # Use 'home_data' scope
-        cache_key = get_versioned_cache_key(base_key, 'home_data', tenant.id)
-        
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
+        # Full Page Cache: stale-while-revalidate, marked stale through its cache tags (signals)
+        response_data = STOREFRONT_HOME.get_or_set(lambda: self.build_home_data(request, tenant), tenant.id)
+        return Response(response_data)
 
+    def build_home_data(self, request, tenant):
         tenant_data, categories_data = self.get_common_data(request, tenant)
         products_qs = self.get_annotated_products_queryset(tenant)
         
@@ -218,16 +155,22 @@ class StorefrontHomeView(StorefrontBaseView):
             display_qs = featured_qs.order_by('-created_at')
             
         products_data = ProductListSerializer(display_qs, many=True, context={'request': request}).data
+        cache_tags(catalog_tag(tenant.id), *(product_tag(product['id']) for product in products_data))
         
-        response_data = {
+        return {
             "tenant": tenant_data,
             "categories": categories_data,
             "featured_products": products_data
         }
-        
-        # Cache for 1 Hour (Signal Invalidation handles updates)
-        cache.set(cache_key, response_data, 3600)
-        return Response(response_data)
+
+# Query parameters read by StorefrontCategoryView.build_category_data
+CATEGORY_PAGE_KEY = QueryKey(
+    'storefront_category_data',
+    min_price=number,
+    max_price=number,
+    ordering=text,
+)
+
 
 class StorefrontCategoryView(StorefrontBaseView):
     def get(self, request, *args, **kwargs):
@@ -238,38 +181,39 @@ class StorefrontCategoryView(StorefrontBaseView):
         if not category_slug:
             return Response({"error": "Category slug required"}, status=400)
 
-        # Build cache key from all relevant parameters
-        params_str = "&".join([f"{k}={v}" for k, v in sorted(request.query_params.items())])
-        base_key = f"storefront_category_data_{tenant.id}_{category_slug}_{params_str}"
-        
-        # Use 'categories' scope (general category updates invalidate this)
-        # We could be more specific ('category_slug'), but 'categories' scope aligns with list updates
-        from core.cache_utils import get_versioned_cache_key
-        cache_key = get_versioned_cache_key(base_key, 'categories', tenant.id)
-        
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
+        # Keyed by the filters the page applies (tracking params ignored)
+        params = CATEGORY_PAGE_KEY.build(request.query_params, tenant.id)
+
+        # Marked stale through its cache tags: the category and the products it lists
+        response_data = STOREFRONT_CATEGORY_PAGE.get_or_set(
+            lambda: self.build_category_data(request, tenant, category_slug), tenant.id,
+            category_slug=category_slug, params=params
+        )
+        if response_data is None:
+            return Response({"error": "Category not found"}, status=404)
+        return Response(response_data)
 
+    def build_category_data(self, request, tenant, category_slug):
         tenant_data, categories_data = self.get_common_data(request, tenant)
         
         # Category Detail
         category = Category.objects.filter(tenant=tenant, slug=category_slug, deleted_at__isnull=True).first()
         if not category:
-            return Response({"error": "Category not found"}, status=404)
+            return None
         category_data = CategorySerializer(category, context={'request': request}).data
 
         # Category Products
         products_qs = self.get_annotated_products_queryset(tenant).filter(category=category)
         
         # Apply other filters from query params
+        # Price filters use the summary min price (same semantics as the product list)
         min_price = request.query_params.get('min_price')
         if min_price:
-            products_qs = products_qs.filter(variants__price__gte=min_price).distinct()
+            products_qs = products_qs.filter(summary__min_price__gte=min_price)
             
         max_price = request.query_params.get('max_price')
         if max_price:
-            products_qs = products_qs.filter(variants__price__lte=max_price).distinct()
+            products_qs = products_qs.filter(summary__min_price__lte=max_price)
             
         ordering = request.query_params.get('ordering')
         if ordering:
@@ -278,17 +222,14 @@ class StorefrontCategoryView(StorefrontBaseView):
             products_qs = products_qs.order_by('-created_at')
 
         products_data = ProductListSerializer(products_qs, many=True, context={'request': request}).data
+        cache_tags(category_tag(category.id), *(product_tag(product['id']) for product in products_data))
         
-        response_data = {
+        return {
             "tenant": tenant_data,
             "categories": categories_data,
             "category": category_data,
             "products": products_data
         }
-        
-        # Cache for 1 Hour (Signal Invalidation handles updates)
-        cache.set(cache_key, response_data, 3600)
-        return Response(response_data)
 
 class StorefrontProductDetailView(StorefrontBaseView):
     def get(self, request, *args, **kwargs):
@@ -301,38 +242,40 @@ class StorefrontProductDetailView(StorefrontBaseView):
 
         tenant_data, categories_data = self.get_common_data(request, tenant)
         
-        # Product Detail (Cache by Tenant + Slug)
-        product_cache_key = f"storefront_product_{tenant.id}_{product_slug}"
-        cached_product = cache.get(product_cache_key)
-        
-        if cached_product:
-            product_data = cached_product['product']
-            related_data = cached_product['related']
-        else:
-            product_qs = Product.objects.filter(tenant=tenant, slug=product_slug, deleted_at__isnull=True).prefetch_related(
-                models.Prefetch('variants', queryset=ProductVariant.objects.filter(is_active=True, deleted_at__isnull=True)),
-                models.Prefetch('images', queryset=ProductImage.objects.filter(deleted_at__isnull=True).order_by('sort_order'))
-            ).select_related('category')
-            
-            product = product_qs.first()
-            if not product:
-                return Response({"error": "Product not found"}, status=404)
-                
-            product_data = ProductDetailSerializer(product, context={'request': request}).data
-
-            # Related Products (Same category)
-            related_qs = self.get_annotated_products_queryset(tenant).filter(
-                category=product.category
-            ).exclude(id=product.id).order_by('-created_at')[:4]
-            
-            related_data = ProductListSerializer(related_qs, many=True, context={'request': request}).data
-            
-            # Cache for 1 Hour (Signal Invalidation handles updates)
-            cache.set(product_cache_key, {'product': product_data, 'related': related_data}, 3600)
+        # Product Detail (Cache by Tenant + Slug, marked stale through its cache tags)
+        cached_product = STOREFRONT_PRODUCT.get_or_set(
+            lambda: self.build_product_data(request, tenant, product_slug), tenant.id, slug=product_slug
+        )
+        if cached_product is None:
+            return Response({"error": "Product not found"}, status=404)
         
         return Response({
             "tenant": tenant_data,
             "categories": categories_data,
-            "product": product_data,
-            "related_products": related_data
-        })
\ No newline at end of file
+            "product": cached_product['product'],
+            "related_products": cached_product['related']
+        })
+
+    def build_product_data(self, request, tenant, product_slug):
+        product_qs = Product.objects.filter(tenant=tenant, slug=product_slug, deleted_at__isnull=True).prefetch_related(
+            models.Prefetch('variants', queryset=ProductVariant.objects.filter(is_active=True, deleted_at__isnull=True)),
+            models.Prefetch('images', queryset=ProductImage.objects.filter(deleted_at__isnull=True).order_by('sort_order'))
+        ).select_related('category')
+        
+        product = product_qs.first()
+        if not product:
+            return None
+            
+        product_data = ProductDetailSerializer(product, context={'request': request}).data
+
+        # Related Products (Same category)
+        related_qs = self.get_annotated_products_queryset(tenant).filter(
+            category=product.category
+        ).exclude(id=product.id).order_by('-created_at')[:4]
+        
+        related_data = ProductListSerializer(related_qs, many=True, context={'request': request}).data
+        cache_tags(
+            tenant_tag(tenant.id), product_tag(product.id), category_tag(product.category_id),
+            *(product_tag(related['id']) for related in related_data)
+        )
+        return {'product': product_data, 'related': related_data}
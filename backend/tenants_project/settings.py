@@ -46,6 +46,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'corsheaders',
@@ -63,6 +64,7 @@ MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'core.middleware.CacheVersionMemoMiddleware',  # Cache scope versions read once per request
     'core.middleware.DisableCSRFForAdminAPIMiddleware',  # BEFORE CsrfViewMiddleware - Exempt admin API from CSRF
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -198,6 +200,12 @@ DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'onboarding@resend.dev')
 ADMIN_EMAIL = os.getenv('ADMIN_EMAIL', 'dosmil487@gmail.com')
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
 
+# Transactional email delivery (orders.email_backends.LocMemBackend keeps messages in memory)
+TRANSACTIONAL_EMAIL_BACKEND = os.getenv('TRANSACTIONAL_EMAIL_BACKEND', 'orders.email_backends.ResendBackend')
+# Emails per second each tenant may send from the outbox worker (0 = unlimited)
+EMAIL_TENANT_RATE_LIMIT = float(os.getenv('EMAIL_TENANT_RATE_LIMIT', '10'))
+EMAIL_TENANT_BURST = int(os.getenv('EMAIL_TENANT_BURST', '100'))
+
 # Payment Gateway Settings
 PAYMENT_GATEWAYS = {
     'FLOW': {
@@ -219,6 +227,13 @@ PAYMENT_GATEWAYS = {
 # Payment URLs
 PAYMENT_WEBHOOK_URL = os.getenv('PAYMENT_WEBHOOK_URL', 'http://localhost:8000/api/storefront')
 
+# Order numbers reserved per worker in one round-trip (1 = allocate inside each checkout)
+ORDER_NUMBER_BLOCK_SIZE = int(os.getenv('ORDER_NUMBER_BLOCK_SIZE', '1'))
+
+# Minutes an unpaid order holds its reserved stock before release_expired_reservations
+# gives it back (tenants can override with Tenant.reservation_ttl_minutes)
+ORDER_RESERVATION_TTL_MINUTES = int(os.getenv('ORDER_RESERVATION_TTL_MINUTES', '60'))
+
 # Encryption key for sensitive credentials
 # Generate with: python -c "from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())"
 ENCRYPTION_KEY = os.getenv('ENCRYPTION_KEY', '4KwSmZAY4rOecsjfRAvnuz1z0eWJ3cL_aCHlJiTlhZ8=')